@@ -0,0 +1,21 @@
+"""Timings and memory measurements shared by the benchmarks"""
+
+import timeit
+import tracemalloc
+
+
+def best_time(function, repeat=5, number=1):
+    """The shortest time taken by one call of a function, in seconds"""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def peak_memory(function):
+    """The peak memory allocated by one call of a function, in MiB"""
+    # Tracing slows evaluation down, so it is never combined with timing
+    tracemalloc.start()
+
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,42 @@
+"""
+Benchmarks the throughput of invalid input
+
+    python benchmarks/errors.py
+
+Each expression is handled as a bot would: by rolling it and formatting the
+exception, and by validating it, which returns diagnostics without
+formatting their messages.
+"""
+
+from common import best_time
+
+import dice
+from dice.diagnostics import validate
+from dice.exceptions import DiceBaseException
+
+EXPRESSIONS = ["3d6 +", "1d", "3d0", "3d6d6", "hello", "((1d6", "4d6x1", "1/0"]
+
+
+def roll(expression):
+    try:
+        dice.roll(expression)
+    except DiceBaseException as e:
+        return e.pretty_print()
+
+
+def bench(function, repeat=5, number=200):
+    def run():
+        for expression in EXPRESSIONS:
+            function(expression)
+
+    return len(EXPRESSIONS) / best_time(run, repeat, number)
+
+
+def main():
+    print("%-16s %14s" % ("mode", "inputs/second"))
+    print("%-16s %14.0f" % ("roll", bench(roll)))
+    print("%-16s %14.0f" % ("validate", bench(validate)))
+
+
+if __name__ == "__main__":
+    main()
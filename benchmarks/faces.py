@@ -0,0 +1,35 @@
+"""
+Benchmarks rolling dice with custom faces
+
+    python benchmarks/faces.py
+
+Each expression is timed with the alias sampler, and with the same dice
+rolled one at a time by looking up a uniform roll in a list of faces.
+"""
+
+import random
+
+from common import best_time
+
+import dice
+
+EXPRESSIONS = ["10d{1,2,3,5,8}", "1000d{1:9,2:3,10}", "100000d{0:5,1:4,2,3}"]
+
+
+def main():
+    print("%-24s %10s %10s" % ("expression", "alias", "lookup"))
+    for expression in EXPRESSIONS:
+        template = dice.compile(expression)
+        element = dice.roll(expression, raw=True)
+        faces = [v for v, w in element.faces.faces for i in range(w)]
+        rnd = random.Random(0)
+        alias = best_time(lambda: template.roll(random=rnd), number=20)
+        lookup = best_time(
+            lambda: [faces[rnd.randrange(len(faces))] for i in range(element.amount)],
+            number=20,
+        )
+        print("%-24s %9.6fs %9.6fs" % (expression, alias, lookup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmarks evaluating operators in place
+
+    python benchmarks/in_place.py
+
+Each expression is timed and its peak memory measured when evaluated as
+usual, which copies the list of every operator, and with in_place=True.
+"""
+
+import random
+
+from common import best_time, peak_memory
+
+import dice
+
+EXPRESSIONS = ["(100000d6 .+ 2)s", "-100000d6h50000", "(100000d6a) .- 1"]
+
+
+def bench(expression, **kwargs):
+    rnd = random.Random(0)
+
+    def run():
+        dice.roll(expression, random=rnd, **kwargs)
+
+    return best_time(run), peak_memory(run)
+
+
+def main():
+    print("%-24s %18s %18s" % ("expression", "copied", "in place"))
+    for expression in EXPRESSIONS:
+        copied = bench(expression)
+        in_place = bench(expression, in_place=True)
+        print(
+            "%-24s %8.4fs %6.1fMiB %8.4fs %6.1fMiB"
+            % ((expression,) + copied + in_place)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Benchmarks the distributions of keep-highest, keep-lowest and keep-middle
+
+    python benchmarks/keep.py
+
+Each pool's distribution is computed by dice.stats, which places sorted
+faces one at a time instead of enumerating every outcome.
+"""
+
+from common import best_time
+
+import dice.stats
+
+EXPRESSIONS = ["4d6h3", "2d20l1", "5d10m3", "10d6h5", "20d10l10", "50d6h25", "50d20m10"]
+
+
+def bench(expression, repeat=3):
+    element = dice.stats.parse(expression)
+    return best_time(lambda: dice.stats.distribution(element), repeat)
+
+
+def main():
+    print("%-16s %10s" % ("expression", "time"))
+    for expression in EXPRESSIONS:
+        print("%-16s %9.4fs" % (expression, bench(expression)))
+
+
+if __name__ == "__main__":
+    main()
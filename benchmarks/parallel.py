@@ -0,0 +1,44 @@
+"""
+Benchmarks evaluating independent parts of an expression in parallel
+
+    python benchmarks/parallel.py
+
+Each expression is timed when evaluated as usual and with parallel=True,
+using a process pool with a worker for each CPU.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from common import best_time
+
+import dice
+
+EXPRESSIONS = [
+    "100000d6t, 100000d6t, 100000d6t, 100000d6t",
+    "(200000d10 .+ 1) e 8, (200000d10 .+ 1) e 8",
+    "100000d6x, 100000d6x",
+]
+
+
+def bench(expression, **kwargs):
+    return best_time(lambda: dice.roll(expression, **kwargs), repeat=1)
+
+
+def main():
+    workers = os.cpu_count() or 1
+    print("%i CPUs" % workers)
+    print("%-46s %9s %9s" % ("expression", "serial", "parallel"))
+
+    with ProcessPoolExecutor(workers) as executor:
+        # Start the workers before timing
+        list(executor.map(abs, range(workers)))
+
+        for expression in EXPRESSIONS:
+            serial = bench(expression)
+            parallel = bench(expression, parallel=True, executor=executor)
+            print("%-46s %8.3fs %8.3fs" % (expression, serial, parallel))
+
+
+if __name__ == "__main__":
+    main()
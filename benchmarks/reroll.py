@@ -0,0 +1,34 @@
+"""
+Benchmarks rerolling large pools of dice
+
+    python benchmarks/reroll.py
+
+Each expression is timed with the bulk sampler and with seed_compat, which
+rerolls one die at a time as older versions did.
+"""
+
+import random
+
+from common import best_time
+
+import dice
+
+EXPRESSIONS = ["10000d6r", "10000d6r3", "10000d6rr", "100000d6rr3"]
+
+
+def bench(expression, repeat=5, **kwargs):
+    template = dice.compile(expression)
+    rnd = random.Random(0)
+    return best_time(lambda: template.roll(random=rnd, **kwargs), repeat)
+
+
+def main():
+    print("%-16s %10s %10s" % ("expression", "bulk", "compat"))
+    for expression in EXPRESSIONS:
+        bulk = bench(expression)
+        compat = bench(expression, seed_compat=True)
+        print("%-16s %9.4fs %9.4fs" % (expression, bulk, compat))
+
+
+if __name__ == "__main__":
+    main()
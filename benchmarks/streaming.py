@@ -0,0 +1,35 @@
+"""
+Benchmarks streaming huge pools of dice
+
+    python benchmarks/streaming.py
+
+Each expression is timed and its peak memory measured when evaluated as
+usual and with stream=True.
+"""
+
+from common import best_time, peak_memory
+
+import dice
+
+EXPRESSIONS = ["1000000d6t", "(1000000d6 .+ 1) e 5", "-1000000d{1:3,2,6}t"]
+
+
+def bench(expression, **kwargs):
+    def run():
+        dice.roll(expression, **kwargs)
+
+    return best_time(run, repeat=1), peak_memory(run)
+
+
+def main():
+    print("%-24s %18s %18s" % ("expression", "list", "stream"))
+    for expression in EXPRESSIONS:
+        full = bench(expression)
+        streamed = bench(expression, stream=True)
+        print(
+            "%-24s %8.3fs %6.1fMiB %8.3fs %6.1fMiB" % ((expression,) + full + streamed)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Benchmarks rolling wild dice
+
+    python benchmarks/wild.py
+
+Each expression is timed with the bulk sampler and with seed_compat, which
+rolls one die at a time as older versions did.
+"""
+
+import random
+
+from common import best_time
+
+import dice
+
+EXPRESSIONS = ["5w6", "20w6", "1000w6", "100000w6"]
+
+
+def bench(expression, repeat=5, number=20, **kwargs):
+    template = dice.compile(expression)
+    rnd = random.Random(0)
+    return best_time(lambda: template.roll(random=rnd, **kwargs), repeat, number)
+
+
+def main():
+    print("%-16s %10s %10s" % ("expression", "bulk", "compat"))
+    for expression in EXPRESSIONS:
+        bulk = bench(expression)
+        compat = bench(expression, seed_compat=True)
+        print("%-16s %9.6fs %9.6fs" % (expression, bulk, compat))
+
+
+if __name__ == "__main__":
+    main()
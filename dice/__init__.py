@@ -2,8 +2,22 @@
 
 from pyparsing import ParseBaseException
 
+import dice.batch
+import dice.diagnostics
 import dice.elements
+import dice.extremes
 import dice.grammar
+import dice.incremental
+import dice.parallel
+import dice.parser
+import dice.profiling
+import dice.render
+import dice.replay
+import dice.serialize
+import dice.stats
+import dice.streaming
+import dice.template
+import dice.trace
 import dice.utilities
 from dice.constants import DiceExtreme
 from dice.exceptions import DiceBaseException, DiceException, DiceFatalException
@@ -12,10 +26,27 @@ __all__ = [
     "roll",
     "roll_min",
     "roll_max",
+    "compile",
+    "roll_batch",
+    "batch",
+    "diagnostics",
     "elements",
+    "extremes",
     "grammar",
+    "incremental",
+    "parallel",
+    "parser",
+    "profiling",
+    "render",
+    "replay",
+    "serialize",
+    "stats",
+    "streaming",
+    "template",
+    "trace",
     "utilities",
     "command",
+    "server",
     "DiceBaseException",
     "DiceException",
     "DiceFatalException",
@@ -31,26 +62,58 @@ def roll(string, **kwargs):
 
 
 def roll_min(string, **kwargs):
-    """Parses and evaluates the minimum of a dice expression"""
+    """Parses and evaluates a dice expression with every die at its lowest value"""
     return _roll(string, force_extreme=DiceExtreme.EXTREME_MIN, **kwargs)
 
 
 def roll_max(string, **kwargs):
-    """Parses and evaluates the maximum of a dice expression"""
+    """Parses and evaluates a dice expression with every die at its highest value"""
     return _roll(string, force_extreme=DiceExtreme.EXTREME_MAX, **kwargs)
 
 
-def parse_expression(string):
-    return dice.grammar.expression.parseString(string, parseAll=True)
+def roll_batch(expressions, repeat=1, random=None, **kwargs):
+    """Parses and evaluates many expressions, capturing errors per item"""
+    return dice.batch.roll_batch(expressions, repeat=repeat, random=random, **kwargs)
 
 
-def _roll(string, single=True, raw=False, return_kwargs=False, **kwargs):
+def compile(string):
+    """Parses a dice expression once, returning a reusable Template"""
+    return dice.template.compile(string)
+
+
+def parse_expression(string, parser=None, copy=True):
+    if parser is not None:
+        return parser.parse(string, copy)
+    return dice.grammar.parse_string(string)
+
+
+def _roll(
+    string,
+    single=True,
+    raw=False,
+    return_kwargs=False,
+    parser=None,
+    **kwargs,
+):
+    stats = dice.profiling.active()
+
+    if stats is not None:
+        dice.trace.observe(kwargs, stats)
+
     try:
-        ast = parse_expression(string)
+        # Trees are only returned raw; otherwise results are kept outside of
+        # them, so a parser's cached trees can be evaluated without a copy
+        with dice.profiling.phase("parse"):
+            ast = parse_expression(string, parser, copy=raw)
+
         elements = list(ast)
 
         if not raw:
-            elements = [element.evaluate_cached(**kwargs) for element in elements]
+            kwargs.setdefault("results", {})
+            evaluate = dice.template.evaluator(kwargs)
+
+            with dice.profiling.phase("evaluate"):
+                elements = [evaluate(element, **kwargs) for element in elements]
 
         if single:
             elements = dice.utilities.single(elements)
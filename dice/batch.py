@@ -0,0 +1,103 @@
+"""
+Evaluation of many expressions at once
+
+roll_batch() compiles each distinct expression once, evaluates every item
+with the same random engine, and yields a BatchResult per item. Errors are
+captured on the item instead of being raised, so a malformed expression
+does not abort the rest of the batch. Errors other than DiceBaseException,
+such as an expression nested too deeply to parse, are captured as a
+DiceFatalException with the code "invalid".
+"""
+
+from dice.constants import TEMPLATE_CACHE_SIZE
+from dice.diagnostics import Diagnostic
+from dice.exceptions import DiceBaseException, DiceFatalException
+from dice.template import Template
+from dice.utilities import classname
+
+
+class BatchResult:
+    """The results of rolling one expression from a batch"""
+
+    __slots__ = ("index", "expression", "results", "error")
+
+    def __init__(self, index, expression, results=None, error=None):
+        self.index = index
+        self.expression = expression
+        self.results = results if results is not None else []
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def diagnostic(self):
+        """The error as a Diagnostic, or None if the expression succeeded"""
+        return None if self.ok else Diagnostic.from_exception(self.error)
+
+    @property
+    def result(self):
+        """The first result, or None if the expression failed"""
+        return self.results[0] if self.ok and self.results else None
+
+    def __repr__(self):
+        if self.ok:
+            return "BatchResult({0}, {1!r}, {2})".format(
+                self.index, self.expression, ", ".join(map(str, self.results))
+            )
+        return "BatchResult({0}, {1!r}, error={2!r})".format(
+            self.index, self.expression, self.error
+        )
+
+
+def captured(expression, exc):
+    """Returns an error raised by an expression as a DiceBaseException"""
+    if isinstance(exc, DiceBaseException):
+        return exc
+
+    error = DiceFatalException(expression, 0, "%s: %s" % (classname(exc), exc))
+    error.code = "invalid"
+    error.__cause__ = exc
+    return error
+
+
+def roll_batch(
+    expressions, repeat=1, random=None, cache_size=TEMPLATE_CACHE_SIZE, **kwargs
+):
+    """
+    Rolls each expression ``repeat`` times, yielding a BatchResult for each.
+    The templates of the last ``cache_size`` distinct expressions are kept.
+    """
+    templates = {}
+
+    if random is not None:
+        kwargs["random"] = random
+
+    for index, expression in enumerate(expressions):
+        template = templates.get(expression)
+
+        if template is None:
+            try:
+                template = Template(expression)
+            except Exception as e:
+                template = captured(expression, e)
+
+            if len(templates) >= cache_size:
+                del templates[next(iter(templates))]
+
+            templates[expression] = template
+
+        if isinstance(template, DiceBaseException):
+            yield BatchResult(index, expression, error=template)
+            continue
+
+        item = BatchResult(index, expression)
+
+        try:
+            for i in range(repeat):
+                item.results.append(template.evaluate(**kwargs))
+        except Exception as e:
+            item.error = captured(expression, e)
+
+        yield item
@@ -1,20 +1,28 @@
 """
 Usage:
-    roll [--verbose] [--min | --max] [--max-dice=<dice>] [--] <expression>...
+    roll [--verbose] [--batch] [--min | --max] [--max-dice=<dice>]
+         [--max-items=<n>] [--summary=<style>] [--] <expression>...
 
 Options:
-    -m --min              Make all rolls the lowest possible result
-    -M --max              Make all rolls the highest possible result
+    -m --min              Roll every die at its lowest value
+    -M --max              Roll every die at its highest value
     -D --max-dice=<dice>  Set the maximum number of dice per element
+    -b --batch            Roll each expression separately
+    -L --max-items=<n>    Summarize longer lists in verbose output (0 for none)
+    -S --summary=<style>  Summarize lists as edges, counts or runs
     -h --help             Show this help text
     -v --verbose          Show additional output
     -V --version          Show the package version
 """
 
 import argparse
+import sys
 
 import dice
 import dice.exceptions
+import dice.render
+import dice.trace
+from dice.constants import VERBOSE_MAX_ITEMS
 
 __version__ = "dice v{0} by {1}.".format(dice.__version__, dice.__author__)
 
@@ -25,13 +33,13 @@ parser.add_argument(
     "-m",
     "--min",
     action="store_true",
-    help="Make all rolls the lowest possible result.",
+    help="Roll every die at its lowest value.",
 )
 parser.add_argument(
     "-M",
     "--max",
     action="store_true",
-    help="Make all rolls the highest possible result.",
+    help="Roll every die at its highest value.",
 )
 parser.add_argument(
     "-D",
@@ -41,6 +49,29 @@ parser.add_argument(
     metavar="N",
     help="Set the maximum number of dice per element.",
 )
+parser.add_argument(
+    "-b",
+    "--batch",
+    action="store_true",
+    help="Roll each expression separately.",
+)
+parser.add_argument(
+    "-L",
+    "--max-items",
+    action="store",
+    type=int,
+    default=VERBOSE_MAX_ITEMS,
+    metavar="N",
+    help="Summarize lists longer than N items in verbose output (0 for none).",
+)
+parser.add_argument(
+    "-S",
+    "--summary",
+    action="store",
+    choices=dice.render.STYLES,
+    default="edges",
+    help="How to summarize long lists.",
+)
 parser.add_argument(
     "-v", "--verbose", action="store_true", help="Show additional output."
 )
@@ -58,11 +89,47 @@ parser.add_argument(
 )
 
 
+def render_options(args):
+    """The options of dice.render for the verbose output"""
+    return {"max_items": args.max_items or None, "style": args.summary}
+
+
+def main_batch(args, f_kwargs):
+    """Roll each expression separately, reporting errors for each one"""
+    if args.min:
+        f_kwargs["force_extreme"] = dice.DiceExtreme.EXTREME_MIN
+    elif args.max:
+        f_kwargs["force_extreme"] = dice.DiceExtreme.EXTREME_MAX
+
+    failed = False
+
+    for item in dice.roll_batch(args.expression, **f_kwargs):
+        if not item.ok:
+            print("Whoops! Something went wrong:")
+            print(item.error.pretty_print())
+            failed = True
+        elif args.verbose:
+            result = dice.render.render(item.result, **render_options(args))
+            print("%s: %s" % (item.expression, result))
+        else:
+            dice.render.write(sys.stdout, item.result)
+            print()
+
+    if failed:
+        exit(1)
+
+
 def main(args=None):
     """Run roll() from a command line interface"""
     args = parser.parse_args(args=args)
     f_kwargs = {}
 
+    if args.max_dice:
+        f_kwargs["max_dice"] = args.max_dice
+
+    if args.batch:
+        return main_batch(args, f_kwargs)
+
     if args.min:
         f_roll = dice.roll_min
     elif args.max:
@@ -70,22 +137,27 @@ def main(args=None):
     else:
         f_roll = dice.roll
 
-    if args.max_dice:
-        f_kwargs["max_dice"] = args.max_dice
+    if args.verbose:
+        f_kwargs["trace"] = trace = dice.trace.Trace()
 
     f_expr = " ".join(args.expression)
 
     try:
-        roll, kwargs = f_roll(f_expr, raw=True, return_kwargs=True, **f_kwargs)
+        result = f_roll(f_expr, **f_kwargs)
+
+        options = render_options(args) if args.verbose else {}
 
         if args.verbose:
             print("Result: ", end="")
 
-        print(str(roll.evaluate_cached(**kwargs)))
+        with dice.profiling.phase("render"):
+            dice.render.write(sys.stdout, result, **options)
+            print()
 
         if args.verbose:
             print("Breakdown:")
-            print(dice.utilities.verbose_print(roll, **kwargs))
+            trace.write_text(sys.stdout, **options)
+            print()
     except dice.exceptions.DiceBaseException as e:
         print("Whoops! Something went wrong:")
         print(e.pretty_print())
@@ -7,3 +7,12 @@ class DiceExtreme:
 MAX_ROLL_DICE = 2**20
 MAX_EXPLOSIONS = 2**8
 VERBOSE_INDENT = 2
+TEMPLATE_CACHE_SIZE = 1024
+PARSER_CACHE_SIZE = 256
+PACKRAT_CACHE_SIZE = 4096
+ALIAS_CACHE_SIZE = 256
+STREAM_CHUNK_SIZE = 2**16
+MAX_STREAM_DICE = 2**40
+PARALLEL_MIN_DICE = 2**14
+RENDER_CHUNK_SIZE = 2**12
+VERBOSE_MAX_ITEMS = 32
@@ -0,0 +1,356 @@
+"""
+Structured errors
+
+A Diagnostic describes one error in an expression: a short code, the span
+of the input it refers to and a message template. The message is only
+formatted when it is displayed, so collecting diagnostics for a flood of
+invalid input costs little more than recognizing it as invalid.
+
+validate() returns the diagnostics of an expression instead of raising.
+Besides syntax errors, it finds every error that evaluating the expression
+is certain to raise, such as exploding one-sided dice or dividing by zero,
+from the element tree alone:
+
+    >>> [d.code for d in dice.diagnostics.validate("3d0")]
+    ['invalid-dice']
+    >>> [d.code for d in dice.diagnostics.validate("4d6x1 + 2 / (1 - 1)")]
+    ['explode-threshold', 'division-by-zero']
+
+The checks for each kind of element are registered with checks_of.register().
+"""
+
+import functools
+
+from pyparsing import ParseBaseException, ParseException
+
+import dice.extremes
+import dice.grammar
+from dice.constants import MAX_ROLL_DICE
+from dice.elements import (
+    Add,
+    Div,
+    Element,
+    Explode,
+    ForceReroll,
+    Highest,
+    Integer,
+    Lowest,
+    Middle,
+    Modulo,
+    Mul,
+    RandomElement,
+    Reroll,
+    Sort,
+    Sub,
+    SuccessFail,
+    Successes,
+    Total,
+    Variable,
+)
+from dice.exceptions import DiceBaseException, DiceFatalException, Message
+from dice.utilities import walk
+
+# Elements that always evaluate to a single number
+SCALARS = (int, Total, Add, Sub, Mul, Div, Modulo, Successes, SuccessFail)
+
+
+class Diagnostic:
+    """An error in an expression, with its message formatted lazily"""
+
+    __slots__ = ("code", "string", "location", "end", "template", "args")
+
+    def __init__(self, code, string, location, end=None, template="", args=()):
+        self.code = code
+        self.string = string
+        self.location = location
+        self.end = location if end is None else end
+        self.template = template
+        self.args = tuple(args)
+
+    @classmethod
+    def from_exception(cls, exc):
+        """Describes a pyparsing or dice exception"""
+        if not isinstance(exc, DiceBaseException):
+            exc = DiceBaseException.from_other(exc)
+
+        # The description the error is raised with, as in pretty_print()
+        string, location, description = exc.args[:3]
+
+        if isinstance(description, Message):
+            template, args = description.template, description.args
+        else:
+            template, args = str(description), ()
+
+        code = exc.code
+
+        if code is None:
+            code = "syntax" if isinstance(exc, ParseException) else "invalid"
+
+        return cls(code, string, location, template=template, args=args)
+
+    @property
+    def span(self):
+        """The (start, end) offsets of the error in the expression"""
+        return self.location, self.end
+
+    @property
+    def message(self):
+        return str(Message(self.template, *self.args))
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return "Diagnostic({0!r}, {1!r}, {2!r})".format(
+            self.code, self.span, self.message
+        )
+
+    def to_dict(self):
+        return {
+            "code": self.code,
+            "message": self.message,
+            "location": self.location,
+            "end": self.end,
+        }
+
+    def exception(self):
+        """Returns a DiceFatalException for this error"""
+        exc = DiceFatalException(
+            self.string, self.location, Message(self.template, *self.args)
+        )
+        exc.code = self.code
+        return exc
+
+    def pretty_print(self):
+        return self.exception().pretty_print()
+
+
+def diagnostic(code, element, template, *args, location=None):
+    """A Diagnostic for an element, as raised by its fatal() method"""
+    if location is None:
+        location = element.location
+
+    end = max(location, getattr(element, "end", location))
+    return Diagnostic(code, element.string, location, end, template, args)
+
+
+def bounds(element, **kwargs):
+    """The Extremes of an element, or None if they cannot be found"""
+    try:
+        return dice.extremes.extremes_of(element, **kwargs)
+    except NotImplementedError:
+        return None
+
+
+def constant(element, **kwargs):
+    """The value of an element that is always the same number, or None"""
+    ext = bounds(element, **kwargs)
+
+    if ext is None or ext.is_list or ext.lo != ext.hi:
+        return None
+
+    return ext.lo
+
+
+@functools.singledispatch
+def checks_of(element, **kwargs):
+    """Yields the Diagnostics of one element, not including its operands"""
+    return ()
+
+
+@checks_of.register(Variable)
+def _(element, **kwargs):
+    bindings = kwargs.get("bindings")
+
+    if bindings is not None and element.name not in bindings:
+        yield diagnostic(
+            "unbound-variable",
+            element,
+            "No value bound to variable '%s'",
+            element.name,
+        )
+
+
+@checks_of.register(RandomElement)
+def _(element, **kwargs):
+    amount = bounds(element.amount, **kwargs)
+    max_dice = kwargs.get("max_dice", MAX_ROLL_DICE)
+
+    if amount is None:
+        return
+
+    if amount.lo > max_dice:
+        yield diagnostic(
+            "too-many-dice", element, "Too many dice! (max is %i)" % max_dice
+        )
+    elif amount.hi < 0:
+        template = "Cannot roll less than zero dice!"
+        args = ()
+
+        if not isinstance(element.amount, int) and amount.lo == amount.hi:
+            template += " (%s evaluated to %s)"
+            args = (element.amount, amount.lo)
+
+        yield diagnostic("negative-dice", element, template, *args)
+    elif amount.lo > 0:
+        min_value = constant(element.min_value, **kwargs)
+        max_value = constant(element.max_value, **kwargs)
+
+        if min_value is not None and max_value is not None and min_value > max_value:
+            yield diagnostic(
+                "invalid-range",
+                element,
+                "Roll must have a valid range (got %s - %s, "
+                "which evaluated to %i - %i). Are you trying to "
+                "use a fudge roll as the sides?",
+                element.min_value,
+                element.max_value,
+                min_value,
+                max_value,
+            )
+
+
+@checks_of.register(Div)
+@checks_of.register(Modulo)
+def _(element, **kwargs):
+    for operand in element.original_operands[1:]:
+        if constant(operand, **kwargs) == 0:
+            template = "Division by zero"
+            args = ()
+
+            if not isinstance(operand, int):
+                template += " (%s evaluated to 0)"
+                args = (operand,)
+
+            yield diagnostic(
+                "division-by-zero", element, template, *args, location=operand.location
+            )
+            return
+
+
+def roll_operand(element, verb, **kwargs):
+    """Yields a Diagnostic if the operand of element can never be a roll"""
+    operand = element.original_operands[0]
+
+    if isinstance(operand, SCALARS):
+        yield diagnostic("not-a-roll", element, "Cannot " + verb + " %s", operand)
+
+
+@checks_of.register(Explode)
+def _(element, **kwargs):
+    yield from roll_operand(element, "explode", **kwargs)
+    roll = element.original_operands[0]
+
+    if not isinstance(roll, RandomElement):
+        return
+
+    min_value = constant(roll.min_value, **kwargs)
+    max_value = constant(roll.max_value, **kwargs)
+
+    if min_value is None or max_value is None:
+        return
+    elif min_value == max_value:
+        yield diagnostic(
+            "explode-one-sided", element, "Cannot explode a roll of one-sided dice."
+        )
+        return
+    elif len(element.original_operands) < 2:
+        return
+
+    thresh = element.original_operands[1]
+    ext = bounds(thresh, **kwargs)
+
+    if ext is not None and not ext.is_list and ext.hi <= min_value:
+        template = (
+            "Refusing to explode with threshold less than or equal to "
+            "the lowest possible roll."
+        )
+        args = ()
+
+        if type(thresh) is not Integer and ext.lo == ext.hi:
+            template += " (%s evaluated to %s)"
+            args = (thresh, ext.lo)
+
+        yield diagnostic(
+            "explode-threshold", element, template, *args, location=thresh.location
+        )
+
+
+@checks_of.register(Reroll)
+@checks_of.register(ForceReroll)
+def _(element, **kwargs):
+    return roll_operand(element, "reroll", **kwargs)
+
+
+@checks_of.register(Successes)
+@checks_of.register(SuccessFail)
+def _(element, **kwargs):
+    roll = element.original_operands[0]
+
+    if not isinstance(roll, RandomElement) or isinstance(roll.max_value, RandomElement):
+        return
+
+    max_value = constant(roll.max_value, **kwargs)
+    thresh = bounds(element.original_operands[1], **kwargs)
+
+    if max_value is None or thresh is None or thresh.is_list:
+        return
+
+    if thresh.lo > max_value:
+        if isinstance(element, Successes):
+            template = "Success threshold higher than roll result."
+        else:
+            template = "Success threshold higher than maximum roll result."
+
+        yield diagnostic("success-threshold", element, template)
+
+
+@checks_of.register(Highest)
+@checks_of.register(Lowest)
+@checks_of.register(Middle)
+def _(element, **kwargs):
+    if isinstance(element.original_operands[0], SCALARS):
+        yield diagnostic(
+            "not-a-list",
+            element,
+            "Can't take the %s values of a scalar!" % element.NAME,
+        )
+
+
+@checks_of.register(Sort)
+def _(element, **kwargs):
+    operand = element.original_operands[0]
+
+    if isinstance(operand, SCALARS):
+        yield diagnostic("not-a-list", element, "Cannot sort %s!", operand)
+
+
+def check(elements, **kwargs):
+    """
+    Returns the Diagnostics of every error that evaluating a list of element
+    trees is certain to raise, ordered by location. ``bindings`` are used
+    to check variables, and ``max_dice`` as when rolling.
+    """
+    found = []
+
+    for element in walk(elements):
+        if isinstance(element, Element) and hasattr(element, "location"):
+            found.extend(checks_of(element, **kwargs))
+
+    return sorted(found, key=lambda x: x.span)
+
+
+def validate(string, parser=None, **kwargs):
+    """
+    Returns a list of the Diagnostics of an expression, empty if it is valid.
+    See check() for the keyword arguments.
+    """
+    try:
+        if parser is not None:
+            elements = parser.parse(string, copy=False)
+        else:
+            elements = dice.grammar.parse_string(string)
+    except ParseBaseException as e:
+        return [Diagnostic.from_exception(e)]
+
+    return check(elements, **kwargs)
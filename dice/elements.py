@@ -1,13 +1,23 @@
 """Objects used in the evaluation of the parse tree"""
 
+import contextlib
+import contextvars
+import math
 import random
 import operator
 from pyparsing import ParseFatalException
 from copy import copy
 
 from dice.constants import MAX_EXPLOSIONS, MAX_ROLL_DICE, DiceExtreme
-from dice.exceptions import DiceFatalException
-from dice.utilities import classname, add_even_sub_odd, dice_switch
+from dice.exceptions import DiceFatalException, Message
+from dice.render import render_items
+from dice.utilities import (
+    classname,
+    add_even_sub_odd,
+    alias_table,
+    binomial_variate,
+    dice_switch,
+)
 
 
 class Element:
@@ -25,12 +35,41 @@ class Element:
         self.string = string
         self.location = location
         self.tokens = tokens
+        self.end = location
+
+        for token in tokens:
+            if isinstance(token, Element) and hasattr(token, "end"):
+                self.end = max(self.end, token.end)
+            elif isinstance(token, str):
+                self.end = max(self.end, location + len(token))
+
         return self
 
-    def fatal(self, description, location=None, offset=0, cls=DiceFatalException):
+    def fatal(
+        self,
+        description,
+        *args,
+        location=None,
+        offset=0,
+        cls=DiceFatalException,
+        code=None,
+    ):
+        """
+        Returns an exception for this element. The description is formatted
+        with args only if the message is displayed.
+        """
         if location is None:
             location = self.location
-        return cls(self.string, location + offset, description)
+
+        if args:
+            description = Message(description, *args)
+
+        exc = cls(self.string, location + offset, description)
+
+        if code is not None:
+            exc.code = code
+
+        return exc
 
     def evaluate(self, **kwargs):
         """Evaluate the current object - a no-op by default"""
@@ -44,7 +83,7 @@ class Element:
             if cache:
                 obj = obj.evaluate_cached(**kwargs)
             else:
-                obj = obj.evaluate(cache=cache, **kwargs)
+                obj = obj.evaluate_traced(cache=cache, **kwargs)
 
         if cls is not None and type(obj) != cls:
             obj = cls(obj)
@@ -57,11 +96,37 @@ class Element:
 
     def evaluate_cached(self, **kwargs):
         """Wraps evaluate(), caching results"""
+        results = kwargs.get("results")
+
+        # Results are kept outside of the element when it is shared by
+        # several evaluations (see dice.template)
+        if results is not None:
+            if id(self) not in results:
+                results[id(self)] = self.evaluate_traced(cache=True, **kwargs)
+            return results[id(self)]
+
         if not hasattr(self, "result"):
-            self.result = self.evaluate(cache=True, **kwargs)
+            self.result = self.evaluate_traced(cache=True, **kwargs)
 
         return self.result
 
+    def evaluate_traced(self, **kwargs):
+        """Wraps evaluate(), reporting to the observer passed as ``trace``"""
+        trace = kwargs.get("trace")
+
+        if trace is None:
+            return self.evaluate(**kwargs)
+
+        token = trace.enter(self)
+        result = None
+
+        try:
+            result = self.evaluate(**kwargs)
+        finally:
+            trace.exit(token, result)
+
+        return result
+
 
 class Integer(int, Element):
     """A wrapper around the int class"""
@@ -75,27 +140,158 @@ class String(str, Element):
     pass
 
 
+class Variable(Element):
+    """A named value, looked up in the bindings passed to evaluate()"""
+
+    @classmethod
+    def parse(cls, string, location, tokens):
+        name = tokens[0][1:-1].strip()
+        return cls(name).set_parse_attributes(string, location, tokens)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "{0}({1!r})".format(classname(self), self.name)
+
+    def __str__(self):
+        return "{%s}" % self.name
+
+    def evaluate(self, **kwargs):
+        bindings = kwargs.get("bindings") or {}
+
+        if self.name not in bindings:
+            raise self.fatal(
+                "No value bound to variable '%s'", self.name, code="unbound-variable"
+            )
+
+        value = bindings[self.name]
+
+        if isinstance(value, Element):
+            return self.evaluate_object(value, **kwargs)
+
+        try:
+            return Integer(value)
+        except (TypeError, ValueError):
+            raise self.fatal(
+                "Variable '%s' must be bound to an integer (got %r)"
+                % (self.name, value)
+            )
+
+
 class IntegerList(list, Element):
-    "Augments the standard list with an __int__ operator"
+    """
+    Augments the standard list with an __int__ operator
+
+    The total of the items is kept up to date as items are appended or
+    extended, and recomputed lazily after any other change.
+    """
+
+    # The total of the items, or None if it has to be recomputed
+    _total = None
+
+    def __init__(self, iterable=()):
+        super().__init__(iterable)
+
+        if isinstance(iterable, IntegerList):
+            self._total = iterable._total
+        elif not self:
+            self._total = 0
+        else:
+            self._total = None
+
+    @property
+    def total(self):
+        if self._total is None:
+            self._total = sum(self)
+        return self._total
+
+    def __getstate__(self):
+        # copy() and pickle restore the state before the items
+        state = self.__dict__.copy()
+        state.pop("_total", None)
+        return state
 
     def __str__(self):
-        ret = "[%s]" % ", ".join(map(str, self))
+        return self.render()
+
+    def render(self, max_items=None, style="edges"):
+        """
+        Renders the items, summarized if there are more than max_items
+        (see dice.render)
+        """
+        return render_items(self, max_items, style) + self.total_suffix()
+
+    def total_suffix(self):
         if hasattr(self, "sum") and len(self) > 1:
-            ret += " -> %i" % self
-        return ret
+            return " -> %i" % self.total
+        return ""
 
     def copy(self):
         return type(self)(self)
 
     def clear(self):
-        self[:] = []
+        super().clear()
+        self._total = 0
+
+    def append(self, value):
+        super().append(value)
+        if self._total is not None:
+            self._total += value
+
+    def extend(self, values):
+        if isinstance(values, IntegerList):
+            added = values._total
+        else:
+            values = list(values)
+            added = None
+
+        super().extend(values)
+
+        if self._total is not None:
+            self._total += sum(values) if added is None else added
+
+    def __iadd__(self, values):
+        self.extend(values)
+        return self
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._total = None
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._total = None
+
+    def __imul__(self, n):
+        self._total = None
+        return super().__imul__(n)
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._total = None
+
+    def pop(self, index=-1):
+        self._total = None
+        return super().pop(index)
+
+    def remove(self, value):
+        super().remove(value)
+        self._total = None
 
     def __int__(self):
-        ret = sum(self)
+        ret = self.total
         self.sum = ret
         return ret
 
 
+def total(iterable):
+    """Sums an iterable, reusing the kept total of an IntegerList"""
+    if isinstance(iterable, IntegerList):
+        return iterable.total
+    return sum(iterable)
+
+
 class Roll(IntegerList):
     """Represents a randomized result from a random element"""
 
@@ -106,10 +302,16 @@ class Roll(IntegerList):
 
         if integer_min > integer_max:
             raise ValueError(
-                "Roll must have a valid range (got %s - %s, "
-                "which evaluated to %i - %i). Are you trying to "
-                "use a fudge roll as the sides?"
-                % (min_value, max_value, integer_min, integer_max)
+                Message(
+                    "Roll must have a valid range (got %s - %s, "
+                    "which evaluated to %i - %i). Are you trying to "
+                    "use a fudge roll as the sides?",
+                    min_value,
+                    max_value,
+                    integer_min,
+                    integer_max,
+                ),
+                "invalid-range",
             )
         rnd_engine = kwargs.get("random", random)
         return rnd_engine.randint(integer_min, integer_max)
@@ -121,12 +323,17 @@ class Roll(IntegerList):
         max_dice = kwargs.get("max_dice", MAX_ROLL_DICE)
 
         if amount > max_dice:
-            raise ValueError("Too many dice! (max is %i)" % max_dice)
+            raise ValueError("Too many dice! (max is %i)" % max_dice, "too-many-dice")
         elif amount < 0:
-            raise ValueError("Cannot roll less than zero dice!")
+            raise ValueError("Cannot roll less than zero dice!", "negative-dice")
 
         return [cls.roll_single(min_value, max_value, **kwargs) for i in range(amount)]
 
+    def sample(self, amount, min_value, max_value, **kwargs):
+        """Draws ``amount`` values between min_value and max_value at once"""
+        rnd_engine = kwargs.get("random", random)
+        return self.random_element.sample(amount, min_value, max_value, rnd_engine)
+
     def do_roll_single(self, min_value=None, max_value=None, **kwargs):
         element = self.random_element
 
@@ -143,8 +350,34 @@ class Roll(IntegerList):
         try:
             return self.roll_single(min_value, max_value, **kwargs)
         except ValueError as e:
-            exc = self.random_element.fatal(e.args[0])
-            raise exc
+            code = e.args[1] if len(e.args) > 1 else None
+            raise self.random_element.fatal(e.args[0], code=code)
+
+    def reroll_below(self, thresh, min_value=None, **kwargs):
+        """
+        Replaces every die at or below thresh in place, drawing all the new
+        values at once. min_value narrows the range of the new values.
+        """
+        element = self.random_element
+        positions = [i for i, x in enumerate(self) if x <= thresh]
+
+        if not positions:
+            return self
+
+        if self.force_extreme is DiceExtreme.EXTREME_MIN:
+            values = [element.min_value] * len(positions)
+        elif self.force_extreme is DiceExtreme.EXTREME_MAX:
+            values = [element.max_value] * len(positions)
+        else:
+            if min_value is None:
+                min_value = self.evaluate_object(element.min_value, Integer, **kwargs)
+            max_value = self.evaluate_object(element.max_value, Integer, **kwargs)
+            values = self.sample(len(positions), min_value, max_value, **kwargs)
+
+        for i, value in zip(positions, values):
+            self[i] = value
+
+        return self
 
     def do_roll(self, amount=None, min_value=None, max_value=None, **kwargs):
         element = self.random_element
@@ -158,7 +391,8 @@ class Roll(IntegerList):
         try:
             return self.roll(amount, min_value, max_value, **kwargs)
         except ValueError as e:
-            exc = self.random_element.fatal(e.args[0])
+            code = e.args[1] if len(e.args) > 1 else None
+            exc = self.random_element.fatal(e.args[0], code=code)
             exc.__cause__ = None
             raise exc
 
@@ -166,25 +400,27 @@ class Roll(IntegerList):
         self.random_element = element
         self.force_extreme = kwargs.get("force_extreme")
 
-        amount = self.evaluate_object(element.amount, Integer, **kwargs)
-        min_value = self.evaluate_object(element.min_value, Integer, **kwargs)
-        max_value = self.evaluate_object(element.max_value, Integer, **kwargs)
-
         if rolled is None:
+            amount = self.evaluate_object(element.amount, Integer, **kwargs)
+            min_value = self.evaluate_object(element.min_value, Integer, **kwargs)
+            max_value = self.evaluate_object(element.max_value, Integer, **kwargs)
+
             max_dice = kwargs.get("max_dice", MAX_ROLL_DICE)
 
             if amount > max_dice:
                 msg = "Too many dice! (max is %i)" % max_dice
-                exc = self.random_element.fatal(msg)
+                exc = self.random_element.fatal(msg, code="too-many-dice")
                 exc.__cause__ = None
                 raise exc
             elif amount < 0:
                 msg = "Cannot roll less than zero dice!"
+                args = ()
 
                 if not isinstance(element.amount, int):
-                    msg += " (%s evaluated to %s)" % (element.amount, amount)
+                    msg += " (%s evaluated to %s)"
+                    args = (element.amount, amount)
 
-                exc = self.random_element.fatal(msg)
+                exc = self.random_element.fatal(msg, *args, code="negative-dice")
                 exc.__cause__ = None
                 raise exc
 
@@ -209,7 +445,14 @@ class Roll(IntegerList):
 
 
 class WildRoll(Roll):
-    """Represents a roll of wild dice"""
+    """
+    Represents a roll of wild dice
+
+    The last die is the wild die: it explodes while it rolls the highest
+    value, and if it rolls the lowest value without exploding, it and the
+    highest other die are removed, and one more die decides whether every
+    die is lost. A chain of max_explosions extra dice or more raises an error.
+    """
 
     @classmethod
     def roll(cls, amount, min_value, max_value, **kwargs):
@@ -221,13 +464,26 @@ class WildRoll(Roll):
             return []
 
         rnd_engine = kwargs.get("random", random)
-        rolls = [rnd_engine.randint(min_value, max_value) for i in range(amount)]
+
+        if min_value > max_value:
+            raise ValueError(
+                Message(
+                    "Roll must have a valid range (got %s - %s)", min_value, max_value
+                ),
+                "invalid-range",
+            )
+        elif kwargs.get("seed_compat"):
+            rolls = cls.roll_compat(amount, min_value, max_value, rnd_engine)
+        elif min_value == max_value:
+            return [min_value] * amount
+        else:
+            rolls = cls.roll_chain(amount, min_value, max_value, rnd_engine)
 
         if min_value == max_value:
             return rolls  # Continue as if dice were normal
 
-        while rolls[-1] == max_value:
-            rolls.append(rnd_engine.randint(min_value, max_value))
+        if len(rolls) - amount >= kwargs.get("max_explosions", MAX_EXPLOSIONS):
+            raise ValueError("Too many explosions!", "too-many-explosions")
 
         if len(rolls) == amount and rolls[-1] == min_value:  # failure
             rolls[-1] = 0
@@ -238,6 +494,29 @@ class WildRoll(Roll):
 
         return rolls
 
+    @staticmethod
+    def roll_compat(amount, min_value, max_value, rnd_engine):
+        """Rolls one die at a time, as older versions did"""
+        rolls = [rnd_engine.randint(min_value, max_value) for i in range(amount)]
+
+        while min_value != max_value and rolls[-1] == max_value:
+            rolls.append(rnd_engine.randint(min_value, max_value))
+
+        return rolls
+
+    @staticmethod
+    def roll_chain(amount, min_value, max_value, rnd_engine):
+        """
+        Draws the other dice at once, then the wild die's chain: a geometric
+        number of highest values followed by one lower value.
+        """
+        faces = max_value - min_value + 1
+        rolls = rnd_engine.choices(range(min_value, max_value + 1), k=amount - 1)
+        explosions = int(math.log(1.0 - rnd_engine.random()) / -math.log(faces))
+        rolls.extend([max_value] * explosions)
+        rolls.append(rnd_engine.randint(min_value, max_value - 1))
+        return rolls
+
 
 class ExplodedRoll(Roll):
     """Represents an exploded roll"""
@@ -252,25 +531,31 @@ class RandomElement(Element):
     DICE_MAP = {}
     SEPARATOR = None
 
+    # The kind of Roll that rerolled dice are kept in
+    REROLL_CLASS = Roll
+
     @classmethod
-    def register_dice(cls, new_cls):
+    def register_dice(cls, new_cls, dice_map=None):
+        if dice_map is None:
+            dice_map = cls.DICE_MAP
+
         if not issubclass(new_cls, RandomElement):
             raise TypeError("can only register subclasses of RandomElement")
         elif not new_cls.SEPARATOR:
             raise TypeError("must specify separator")
-        elif new_cls.SEPARATOR in cls.DICE_MAP:
+        elif new_cls.SEPARATOR in dice_map:
             raise RuntimeError("Separator %s already registered" % new_cls.SEPARATOR)
-        cls.DICE_MAP[new_cls.SEPARATOR] = new_cls
+        dice_map[new_cls.SEPARATOR] = new_cls
         return new_cls
 
     @classmethod
-    def parse_unary(cls, string, location, tokens):
-        return cls.parse(string, location, [1] + list(tokens))
+    def parse_unary(cls, string, location, tokens, dice_map=None):
+        return cls.parse(string, location, [1] + list(tokens), dice_map)
 
     @classmethod
-    def parse(cls, string, location, tokens):
+    def parse(cls, string, location, tokens, dice_map=None):
         if len(tokens) > 3:
-            raise ParseFatalException(
+            exc = ParseFatalException(
                 string,
                 tokens[3].location,
                 (
@@ -278,10 +563,12 @@ class RandomElement(Element):
                     "expression with parentheses."
                 ),
             )
+            exc.code = "stacked-dice"
+            raise exc
 
         amount, kind, dice_type = tokens
         try:
-            ret = dice_switch(amount, dice_type, kind)
+            ret = dice_switch(amount, dice_type, kind, dice_map)
             return ret.set_parse_attributes(string, location, tokens)
         except ValueError as e:
             if len(e.args) > 1:
@@ -290,7 +577,9 @@ class RandomElement(Element):
                 # unused as of yet
                 # elif isinstance(e.args[1], Element):
                 #     location = e.args[1].location
-            raise ParseFatalException(string, location, e.args[0])
+            exc = ParseFatalException(string, location, e.args[0])
+            exc.code = "invalid-dice"
+            raise exc
 
     @classmethod
     def from_iterable(cls, iterable):
@@ -327,6 +616,18 @@ class RandomElement(Element):
     def evaluate(self, **kwargs):
         return Roll(self, **kwargs)
 
+    def sample(self, amount, min_value, max_value, rnd_engine=random):
+        """Draws ``amount`` values between min_value and max_value"""
+        return rnd_engine.choices(range(min_value, max_value + 1), k=amount)
+
+    def chance(self, min_value, max_value, low, high):
+        """
+        The probability of a value between low and high, when drawing values
+        between min_value and max_value
+        """
+        faces = max_value - min_value + 1
+        return max(0, min(high, max_value) - max(low, min_value) + 1) / faces
+
 
 @RandomElement.register_dice
 class Dice(RandomElement):
@@ -369,7 +670,13 @@ class FudgeDice(Dice):
     SEPARATOR = "u"
 
     def __init__(self, amount, value):
-        super().__init__(amount, value, -value)
+        try:
+            min_value = -value
+        except TypeError:
+            # Elements such as variables are negated when they are evaluated
+            min_value = Negate(value)
+
+        super().__init__(amount, value, min_value)
 
     def __repr__(self):
         p = "{0!r}, {1!r}".format(self.amount, self.max_value)
@@ -380,11 +687,183 @@ class FudgeDice(Dice):
         return "{}({})".format(classname(self), p)
 
 
+class Faces(Element):
+    """The faces of a custom die, as (value, weight) pairs"""
+
+    @classmethod
+    def parse(cls, string, location, tokens):
+        faces = []
+
+        for face in tokens[0].strip()[1:-1].split(","):
+            value, _, weight = face.partition(":")
+            faces.append((int(value), int(weight) if weight.strip() else 1))
+
+        try:
+            return cls(*faces).set_parse_attributes(string, location, tokens)
+        except ValueError as e:
+            exc = ParseFatalException(string, location, e.args[0])
+            exc.code = "invalid-dice"
+            raise exc
+
+    def __init__(self, *faces):
+        self.faces = tuple(
+            (
+                (int(face[0]), int(face[1]))
+                if isinstance(face, (tuple, list))
+                else (int(face), 1)
+            )
+            for face in faces
+        )
+
+        if not self.faces:
+            raise ValueError("A die must have at least one face")
+        elif any(weight < 1 for value, weight in self.faces):
+            raise ValueError("Faces must have a weight of one or more")
+
+        weights = {}
+
+        for value, weight in self.faces:
+            weights[value] = weights.get(value, 0) + weight
+
+        # Each value once, in order, with the total weight of its faces
+        self.weighted = tuple(sorted(weights.items()))
+
+    def between(self, low, high):
+        """The weighted values between low and high"""
+        return tuple(x for x in self.weighted if low <= x[0] <= high)
+
+    def __neg__(self):
+        return type(self)(*((-value, weight) for value, weight in self.faces))
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.faces == other.faces
+
+    def __hash__(self):
+        return hash(self.faces)
+
+    def __repr__(self):
+        p = ", ".join(
+            repr(value) if weight == 1 else repr((value, weight))
+            for value, weight in self.faces
+        )
+        return "{}({})".format(classname(self), p)
+
+    def __str__(self):
+        return "{%s}" % ",".join(
+            str(value) if weight == 1 else "%i:%i" % (value, weight)
+            for value, weight in self.faces
+        )
+
+
+class FaceRoll(Roll):
+    """Represents a roll of dice with custom faces"""
+
+    def do_roll(self, amount=None, min_value=None, max_value=None, **kwargs):
+        element = self.random_element
+        if amount is None:
+            amount = element.amount
+        if min_value is None:
+            min_value = element.min_value
+        if max_value is None:
+            max_value = element.max_value
+
+        amount = self.evaluate_object(amount, Integer, **kwargs)
+        min_value = self.evaluate_object(min_value, Integer, **kwargs)
+        max_value = self.evaluate_object(max_value, Integer, **kwargs)
+        return self.sample(amount, min_value, max_value, **kwargs)
+
+    def do_roll_single(self, min_value=None, max_value=None, **kwargs):
+        if self.force_extreme is not None:
+            return super().do_roll_single(min_value, max_value, **kwargs)
+        return self.do_roll(1, min_value, max_value, **kwargs)[0]
+
+
+class FaceDice(RandomElement):
+    """
+    A group of dice with custom faces, like d{2,3,5,7}. A face may be given
+    a weight, so d{1:3,2} rolls 1 three times as often as 2.
+
+    Dice are drawn with an alias table, which takes one random number per
+    die however many faces there are. Tables are cached by their faces.
+    """
+
+    SEPARATOR = "d"
+    REROLL_CLASS = FaceRoll
+
+    def __init__(self, amount, faces):
+        if not isinstance(faces, Faces):
+            faces = Faces(*faces)
+
+        values = [value for value, weight in faces.weighted]
+        super().__init__(amount, min(values), max(values))
+        self.faces = faces
+        self.original_operands = (amount, faces)
+
+    def __neg__(self):
+        new = super().__neg__()
+        new.faces = -self.faces
+        new.original_operands = (self.amount, new.faces)
+        return new
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.faces == other.faces
+
+    def __repr__(self):
+        return "{0}({1!r}, {2!r})".format(classname(self), self.amount, self.faces)
+
+    def __str__(self):
+        return "{0!s}{1}{2!s}".format(self.amount, self.SEPARATOR, self.faces)
+
+    def evaluate(self, **kwargs):
+        return FaceRoll(self, **kwargs)
+
+    def sample(self, amount, min_value, max_value, rnd_engine=random):
+        if not amount:
+            return []
+        table = alias_table(self.faces.between(min_value, max_value))
+        return table.sample(rnd_engine, amount)
+
+    def chance(self, min_value, max_value, low, high):
+        total = sum(
+            weight for value, weight in self.faces.between(min_value, max_value)
+        )
+        low, high = max(low, min_value), min(high, max_value)
+        hits = sum(weight for value, weight in self.faces.between(low, high))
+        return hits / total
+
+
+def owns_results(kwargs):
+    """
+    Whether an evaluation may change the results of operators in place: it
+    must ask to with ``in_place``, and keep no results in a cache or trace
+    """
+    return (
+        bool(kwargs.get("in_place"))
+        and not kwargs.get("cache")
+        and kwargs.get("trace") is None
+    )
+
+
+# Whether the operator being applied owns the results of its operands
+_owns_operands = contextvars.ContextVar("dice_owns_operands", default=False)
+
+
+@contextlib.contextmanager
+def owning(owned):
+    """Sets whether operators applied in the block own their first operand"""
+    token = _owns_operands.set(owned)
+
+    try:
+        yield
+    finally:
+        _owns_operands.reset(token)
+
+
 class Operator(Element):
     PASS_KWARGS = ()
 
     def __init__(self, *operands):
-        self.operands = self.original_operands = operands
+        self.original_operands = operands
 
     def __repr__(self):
         return "{0}({1})".format(
@@ -401,10 +880,12 @@ class Operator(Element):
         return [eval_wrapper(o) for o in operands]
 
     def evaluate(self, **kwargs):
-        if not kwargs.get("cache", False):
-            self.operands = self.original_operands
-
-        self.operands = self.preprocess_operands(*self.operands, **kwargs)
+        # Elements may be shared by concurrent evaluations (see dice.template),
+        # so the state of an evaluation is kept out of the element
+        operands = self.preprocess_operands(*self.original_operands, **kwargs)
+        owned = owns_results(kwargs) and isinstance(
+            self.original_operands[0], (Operator, RandomElement)
+        )
 
         function_kw = {}
 
@@ -413,36 +894,55 @@ class Operator(Element):
                 function_kw[k] = kwargs[k]
 
         try:
-            try:
-                self.rhs_index = -1
-                value = self.function(*self.operands)
-            except TypeError:
-                value = self.operands[0]
+            with owning(owned):
+                try:
+                    value = self.function(*operands, **function_kw)
+                except TypeError:
+                    value = operands[0]
 
-                for i, o in enumerate(self.operands[1:]):
-                    self.rhs_index = i
-                    value = self.function(value, o)
+                    for o in operands[1:]:
+                        value = self.function(value, o, **function_kw)
 
-            if hasattr(self.__class__, "output_cls"):
-                return self.evaluate_object(value, self.output_cls, **kwargs)
+                if hasattr(self.__class__, "output_cls"):
+                    return self.evaluate_object(value, self.output_cls, **kwargs)
 
-            return value
+                return value
 
         except ZeroDivisionError:
-            zero = self.operands[1:].index(0) + 1
+            zero = operands[1:].index(0) + 1
             zero_op = self.original_operands[zero]
             offset = zero_op.location - self.location
             msg = "Division by zero"
+            args = ()
 
             if not isinstance(zero_op, int):
-                msg += " (%s evaluated to 0)" % zero_op
+                msg += " (%s evaluated to 0)"
+                args = (zero_op,)
 
-            raise self.fatal(msg, offset=offset)
+            raise self.fatal(msg, *args, offset=offset, code="division-by-zero")
 
     @property
     def function(self):
         raise NotImplementedError("Operator subclass has no function")
 
+    def writable(self, value, cls=None):
+        """
+        Returns the value of the first operand, to be changed in place: the
+        value itself if this evaluation owns it, or else a copy. Lists are
+        converted to cls if it is given.
+        """
+        if not isinstance(value, IntegerList):
+            return value if cls is None else cls(value)
+
+        if not _owns_operands.get():
+            return value.copy() if cls is None else cls(value)
+
+        # Lists of the same layout can change class without being copied
+        if cls is not None and type(value) is not cls:
+            value.__class__ = cls
+
+        return value
+
 
 class IntegerOperator(Operator):
     def preprocess_operands(self, *operands, **kwargs):
@@ -489,15 +989,78 @@ class Modulo(IntegerOperator):
 
 
 class AddEvenSubOdd(Operator):
-    function = add_even_sub_odd
+    def function(self, operand):
+        return add_even_sub_odd(self, self.writable(operand))
 
 
 class Total(Operator):
     output_cls = Integer
-    function = sum
+    function = staticmethod(total)
+
+
+def wants_breakdown(kwargs):
+    """Whether an evaluation must evaluate every element, e.g. for a trace"""
+    if kwargs.get("breakdown"):
+        return True
+
+    trace = kwargs.get("trace")
+    return trace is not None and getattr(trace, "breakdown", True)
+
+
+class SuccessCounter(RHSIntegerOperator):
+    """Base class of operators counting the dice of a pool against a threshold"""
+
+    output_cls = Integer
+
+    def sampled_pool(self, **kwargs):
+        """
+        Returns (amount, min_value, max_value, thresh) if the count can be
+        drawn directly instead of rolling every die, or None. Counts are only
+        drawn with ``sample_pools``, since the dice then have no results to
+        show in a breakdown.
+        """
+        if (
+            len(self.original_operands) != 2
+            or not kwargs.get("sample_pools")
+            or wants_breakdown(kwargs)
+            or kwargs.get("force_extreme") is not None
+            or kwargs.get("seed_compat")
+        ):
+            return None
+
+        roll, thresh = self.original_operands
+
+        if type(roll) not in (Dice, FudgeDice):
+            return None
+        elif isinstance(roll.max_value, RandomElement):
+            return None
+
+        amount = self.evaluate_object(roll.amount, Integer, **kwargs)
+        min_value = self.evaluate_object(roll.min_value, Integer, **kwargs)
+        max_value = self.evaluate_object(roll.max_value, Integer, **kwargs)
+        thresh = self.evaluate_object(thresh, Integer, **kwargs)
+
+        # Errors are left to the full evaluation to report
+        if not 0 <= amount <= kwargs.get("max_dice", MAX_ROLL_DICE):
+            return None
+        elif min_value > max_value or thresh > max_value:
+            return None
+
+        return amount, min_value, max_value, thresh
+
+
+class Successes(SuccessCounter):
+    def evaluate(self, **kwargs):
+        pool = self.sampled_pool(**kwargs)
+
+        if pool is None:
+            return super().evaluate(**kwargs)
 
+        amount, min_value, max_value, thresh = pool
+        die = self.original_operands[0]
+        p = die.chance(min_value, max_value, thresh, max_value)
+        return Integer(binomial_variate(kwargs.get("random", random), amount, p))
 
-class Successes(RHSIntegerOperator):
     def function(self, iterable, thresh):
         if not isinstance(iterable, IntegerList):
             iterable = (iterable,)
@@ -511,12 +1074,36 @@ class Successes(RHSIntegerOperator):
                 )
 
             if thresh > iterable.random_element.max_value:
-                raise self.fatal("Success threshold higher than roll result.")
+                raise self.fatal(
+                    "Success threshold higher than roll result.",
+                    code="success-threshold",
+                )
 
         return sum(x >= thresh for x in iterable)
 
 
-class SuccessFail(RHSIntegerOperator):
+class SuccessFail(SuccessCounter):
+    def evaluate(self, **kwargs):
+        pool = self.sampled_pool(**kwargs)
+
+        if pool is None:
+            return super().evaluate(**kwargs)
+
+        amount, min_value, max_value, thresh = pool
+        rnd_engine = kwargs.get("random", random)
+        die = self.original_operands[0]
+        p = die.chance(min_value, max_value, thresh, max_value)
+        q = die.chance(min_value, max_value, min_value, min(min_value, thresh - 1))
+
+        # Successes are drawn first, then failures among the other dice
+        successes = binomial_variate(rnd_engine, amount, p)
+        failures = 0
+
+        if p < 1:
+            failures = binomial_variate(rnd_engine, amount - successes, q / (1 - p))
+
+        return Integer(successes - failures)
+
     def function(self, iterable, thresh):
         result = 0
         if not isinstance(iterable, IntegerList):
@@ -532,7 +1119,8 @@ class SuccessFail(RHSIntegerOperator):
 
             if thresh > iterable.random_element.max_value:
                 raise self.fatal(
-                    "Success threshold higher than maximum roll " "result."
+                    "Success threshold higher than maximum roll result.",
+                    code="success-threshold",
                 )
 
         if isinstance(iterable, Roll):
@@ -556,18 +1144,24 @@ class Again(RHSIntegerOperator):
 
         if rhs is None:
             if not isinstance(lhs, Roll):
-                raise self.fatal("%s is not a random element" % lhs)
+                raise self.fatal("%s is not a random element", lhs)
 
             rhs = lhs.random_element.max_value
 
-        ret = lhs.copy()
-        ret.clear()
+        ret = self.writable(lhs)
+        i = len(ret)
+        j = i + ret.count(rhs)
+        ret.extend([rhs] * (j - i))
 
-        for elem in lhs:
-            ret.append(elem)
+        # Values are moved from the back, repeating the matching ones
+        while i:
+            i -= 1
+            j -= 1
+            ret[j] = ret[i]
 
-            if elem == rhs:
-                ret.append(elem)
+            if ret[i] == rhs:
+                j -= 1
+                ret[j] = ret[i]
 
         return ret
 
@@ -575,9 +1169,9 @@ class Again(RHSIntegerOperator):
 class Sort(Operator):
     def function(self, iterable):
         if not isinstance(iterable, IntegerList):
-            raise self.fatal("Cannot sort %s!" % iterable)
+            raise self.fatal("Cannot sort %s!", iterable)
 
-        iterable = iterable.copy()
+        iterable = self.writable(iterable)
         iterable.sort()
         return iterable
 
@@ -600,7 +1194,7 @@ class Array(Operator):
 
         for x in args:
             try:
-                x = sum(x)
+                x = total(x)
             except TypeError:
                 pass
             ret.append(x)
@@ -609,49 +1203,60 @@ class Array(Operator):
 
 
 # TODO: stable removal instead of sort -> slice -> shuffle
-class Lowest(RHSIntegerOperator):
+class KeepOperator(RHSIntegerOperator):
+    """Base class of operators keeping some of the sorted values of a list"""
+
     PASS_KWARGS = ("random",)
+    NAME = None
+
+    @classmethod
+    def kept(cls, num, n=None):
+        """The range of positions kept from num sorted values"""
+        raise NotImplementedError
 
     def function(self, iterable, n=None, **kwargs):
         if not isinstance(iterable, IntegerList):
-            raise self.fatal("Can't take the lowest values of a scalar!")
-
-        if n is None:
-            n = len(iterable) - 1
+            raise self.fatal("Can't take the %s values of a scalar!" % self.NAME)
 
-        iterable = iterable.copy()
+        kept = self.kept(len(iterable), n)
+        iterable = self.writable(iterable)
         iterable.sort()
-        iterable[n:] = []
+        del iterable[kept.stop :]
+        del iterable[: kept.start]
         kwargs.get("random", random).shuffle(iterable)
         return iterable
 
 
-class Highest(RHSIntegerOperator):
-    PASS_KWARGS = ("random",)
-
-    def function(self, iterable, n=None, **kwargs):
-        if not isinstance(iterable, IntegerList):
-            raise self.fatal("Can't take the highest values of a scalar!")
+class Lowest(KeepOperator):
+    NAME = "lowest"
 
+    @classmethod
+    def kept(cls, num, n=None):
         if n is None:
-            n = len(iterable) - 1
+            n = num - 1
 
-        iterable = iterable.copy()
-        iterable.sort()
-        iterable[:-n] = []
-        kwargs.get("random", random).shuffle(iterable)
-        return iterable
+        return range(num)[:n]
 
 
-class Middle(RHSIntegerOperator):
-    PASS_KWARGS = ("random",)
+class Highest(KeepOperator):
+    NAME = "highest"
 
-    def function(self, iterable, n=None, **kwargs):
-        if not isinstance(iterable, IntegerList):
-            raise self.fatal("Can't take the middle values of a scalar!")
+    @classmethod
+    def kept(cls, num, n=None):
+        if n is None:
+            n = num - 1
 
-        num = len(iterable)
+        # Everything before the last n values is removed, so that n == 0
+        # keeps every value
+        positions = range(num)
+        return positions[len(positions[:-n]) :]
 
+
+class Middle(KeepOperator):
+    NAME = "middle"
+
+    @classmethod
+    def kept(cls, num, n=None):
         if n is None:
             n = (num - 2) if num > 2 else 1
         elif n <= 0:
@@ -661,26 +1266,37 @@ class Middle(RHSIntegerOperator):
         upper = num_remove // 2
         lower = num_remove - upper
 
-        iterable = iterable.copy()
-        iterable.sort()
-        iterable[:lower], iterable[-upper:] = [], []
-        kwargs.get("random", random).shuffle(iterable)
-        return iterable
+        # The lowest values are removed first, then the highest, so that
+        # upper == 0 removes every value
+        return range(num)[lower:][:-upper]
+
+
+# Passed to operators that roll dice again after their operands are evaluated
+ROLL_KWARGS = ("random", "cache", "results", "bindings", "seed_compat")
 
 
 class Explode(RHSIntegerOperator):
-    def function(self, roll, thresh=None):
+    PASS_KWARGS = ROLL_KWARGS
+
+    def function(self, roll, thresh=None, **kwargs):
         if not isinstance(roll, Roll):
-            raise self.fatal("Cannot explode {0}".format(roll))
-        elif thresh is None:
-            thresh = roll.random_element.max_value
+            raise self.fatal("Cannot explode %s", roll)
 
-        if roll.random_element.min_value == roll.random_element.max_value:
-            raise self.fatal("Cannot explode a roll of one-sided dice.")
+        element = roll.random_element
+        min_value = self.evaluate_object(element.min_value, Integer, **kwargs)
+        max_value = self.evaluate_object(element.max_value, Integer, **kwargs)
+
+        if thresh is None:
+            thresh = max_value
+
+        if min_value == max_value:
+            raise self.fatal(
+                "Cannot explode a roll of one-sided dice.", code="explode-one-sided"
+            )
 
-        elif thresh <= roll.random_element.min_value:
+        elif thresh <= min_value:
             offset = 0
-            orig_thresh = self.original_operands[self.rhs_index]
+            orig_thresh = self.original_operands[-1]
 
             if thresh is not None:
                 offset = orig_thresh.location - self.location
@@ -690,32 +1306,97 @@ class Explode(RHSIntegerOperator):
                 "the lowest possible roll."
             )
 
+            args = ()
+
             if type(orig_thresh) is not Integer:
-                msg += " (%s evaluated to %s)" % (orig_thresh, thresh)
+                msg += " (%s evaluated to %s)"
+                args = (orig_thresh, thresh)
+
+            raise self.fatal(msg, *args, offset=offset, code="explode-threshold")
+
+        if kwargs.get("seed_compat"):
+            extra = self.explode_rounds(roll, thresh, **kwargs)
+        else:
+            extra = self.explode_chains(roll, thresh, min_value, max_value, **kwargs)
 
-            raise self.fatal(msg, offset=offset)
+        ret = ExplodedRoll(element, rolled=roll)
+        ret.extend(extra)
+        return ret
 
+    def explode_rounds(self, roll, thresh, **kwargs):
+        """Rolls each round of explosions in turn, as older versions did"""
         explosions = 0
-        result = list(roll)
+        result = []
         rerolled = roll
 
         while rerolled:
             explosions += 1
 
             if explosions >= MAX_EXPLOSIONS:
-                raise self.fatal("Too many explosions!")
+                raise self.fatal("Too many explosions!", code="too-many-explosions")
 
             num_rerolls = sum(x >= thresh for x in rerolled)
-            rerolled = roll.do_roll(num_rerolls)
+            rerolled = roll.do_roll(num_rerolls, **kwargs)
             result.extend(rerolled)
 
-        return ExplodedRoll(roll.random_element, rolled=result)
+        return result
+
+    def explode_chains(self, roll, thresh, min_value, max_value, **kwargs):
+        """
+        Samples every explosion at once, giving the same distribution as
+        explode_rounds().
+
+        Each die at or above the threshold starts a chain of extra dice, all
+        at or above the threshold except the last. The length of a chain is
+        drawn from a geometric distribution, then the faces of all chains are
+        drawn in bulk. Extra dice are ordered by round, as if each round of
+        explosions had been rolled in turn.
+        """
+        rnd_engine = kwargs.get("random", random)
+        starters = sum(x >= thresh for x in roll)
+
+        if not starters:
+            return []
+
+        # The probability that an extra die explodes again
+        p = roll.random_element.chance(min_value, max_value, thresh, max_value)
+        log_p = math.log(p)
+        lengths = [
+            1 + int(math.log(1.0 - rnd_engine.random()) / log_p)
+            for i in range(starters)
+        ]
+
+        # The first round is rolled even if no dice explode
+        if max(lengths) + 1 >= MAX_EXPLOSIONS:
+            raise self.fatal("Too many explosions!", code="too-many-explosions")
+
+        highs = iter(roll.sample(sum(lengths) - starters, thresh, max_value, **kwargs))
+        lows = iter(roll.sample(starters, min_value, thresh - 1, **kwargs))
+        result = []
+        depth = 1
+
+        while lengths:
+            remaining = []
+
+            for length in lengths:
+                if length > depth:
+                    result.append(next(highs))
+                    remaining.append(length)
+                else:
+                    result.append(next(lows))
+
+            lengths = remaining
+            depth += 1
+
+        return result
 
 
 class Reroll(RHSIntegerOperator):
-    def function(self, roll, thresh=None):
+    PASS_KWARGS = ROLL_KWARGS
+
+    def function(self, roll, thresh=None, **kwargs):
         if not isinstance(roll, Roll):
-            raise self.fatal("Cannot reroll {0}".format(roll))
+            raise self.fatal("Cannot reroll %s", roll)
 
         elem = roll.random_element
 
@@ -726,21 +1407,26 @@ class Reroll(RHSIntegerOperator):
             )
 
         if thresh is None:
-            thresh = elem.min_value
+            thresh = self.evaluate_object(elem.min_value, Integer, **kwargs)
 
-        roll = Roll(elem, rolled=roll, force_extreme=roll.force_extreme)
+        roll = elem.REROLL_CLASS(elem, rolled=roll, force_extreme=roll.force_extreme)
 
-        for i, x in enumerate(roll):
-            if x <= thresh:
-                roll[i] = roll.do_roll_single()
+        if kwargs.get("seed_compat"):
+            for i, x in enumerate(roll):
+                if x <= thresh:
+                    roll[i] = roll.do_roll_single(**kwargs)
+        else:
+            roll.reroll_below(thresh, **kwargs)
 
         return roll
 
 
 class ForceReroll(RHSIntegerOperator):
-    def function(self, roll, thresh=None, force_min=False):
+    PASS_KWARGS = ROLL_KWARGS
+
+    def function(self, roll, thresh=None, force_min=False, **kwargs):
         if not isinstance(roll, Roll):
-            raise self.fatal("Cannot reroll {0}".format(roll))
+            raise self.fatal("Cannot reroll %s", roll)
 
         elem = roll.random_element
 
@@ -750,16 +1436,21 @@ class ForceReroll(RHSIntegerOperator):
                 location=elem.max_value.location,
             )
 
+        max_value = self.evaluate_object(elem.max_value, Integer, **kwargs)
+
         if thresh is None:
-            thresh = elem.min_value
+            thresh = self.evaluate_object(elem.min_value, Integer, **kwargs)
 
-        max_min = min((elem.max_value, thresh + 1))
+        max_min = min((max_value, thresh + 1))
 
-        roll = Roll(elem, rolled=roll, force_extreme=roll.force_extreme)
+        roll = elem.REROLL_CLASS(elem, rolled=roll, force_extreme=roll.force_extreme)
 
-        for i, x in enumerate(roll):
-            if x <= thresh:
-                roll[i] = roll.do_roll_single(min_value=max_min)
+        if kwargs.get("seed_compat"):
+            for i, x in enumerate(roll):
+                if x <= thresh:
+                    roll[i] = roll.do_roll_single(min_value=max_min, **kwargs)
+        else:
+            roll.reroll_below(thresh, min_value=max_min, **kwargs)
 
         return roll
 
@@ -779,7 +1470,10 @@ class Negate(Operator):
         return super().__new__(cls)
 
     def function(self, operand):
-        operand = IntegerList(operand)
+        if not isinstance(operand, IntegerList):
+            return Integer(-operand)
+
+        operand = self.writable(operand)
 
         for i, x in enumerate(operand):
             operand[i] = -x
@@ -791,7 +1485,7 @@ class ArrayAdd(RHSIntegerOperator):
     def function(self, iterable, scalar):
         try:
             scalar = int(scalar)
-            iterable = IntegerList(iterable)
+            iterable = self.writable(iterable, IntegerList)
 
             for i, x in enumerate(iterable):
                 iterable[i] = x + scalar
@@ -805,7 +1499,7 @@ class ArraySub(RHSIntegerOperator):
     def function(self, iterable, scalar):
         try:
             scalar = int(scalar)
-            iterable = IntegerList(iterable)
+            iterable = self.writable(iterable, IntegerList)
 
             for i, x in enumerate(iterable):
                 iterable[i] = x - scalar
@@ -1,28 +1,78 @@
 from pyparsing import ParseException, ParseFatalException
 
 
+class Message:
+    """
+    An error message, formatted only when it is displayed.
+
+    Messages often include elements or lists of dice, which can be large;
+    most errors are never displayed, so ``template % args`` is deferred
+    until the message is converted to a string.
+    """
+
+    __slots__ = ("template", "args")
+
+    def __init__(self, template, *args):
+        self.template = template
+        self.args = args
+
+    def __str__(self):
+        if not self.args:
+            return self.template
+        return self.template % self.args
+
+    def __repr__(self):
+        return "Message({0!r})".format(str(self))
+
+    def __eq__(self, other):
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __len__(self):
+        return len(str(self))
+
+
 class DiceBaseException(Exception):
+    # A short identifier of the kind of error, e.g. "too-many-dice"
+    code = None
+
     @classmethod
     def from_other(cls, other):
         if isinstance(other, ParseException):
-            return DiceException(*other.args)
+            exc = DiceException(*other.args)
         elif isinstance(other, ParseFatalException):
-            return DiceFatalException(*other.args)
-        raise NotImplementedError(
-            "DiceBaseException can only wrap ParseException or ParseFatalException"
-        )
+            exc = DiceFatalException(*other.args)
+        else:
+            raise NotImplementedError(
+                "DiceBaseException can only wrap ParseException or ParseFatalException"
+            )
+
+        if getattr(other, "code", None) is not None:
+            exc.code = other.code
+
+        return exc
 
     def pretty_print(self):
         string, location, description = self.args
-        lines = string.split("\n")
+        description = str(description)
 
         if len(description) < (self.col - 1):
             line = (description + " ^").rjust(self.col)
         else:
             line = "^ ".rjust(self.col + 1) + description
 
-        lines.insert(self.lineno + 1, line)
-        return "\n".join(lines)
+        # The marker goes after the line following the error, or at the end
+        end = string.find("\n", location)
+
+        if end != -1:
+            end = string.find("\n", end + 1)
+
+        if end == -1:
+            return string + "\n" + line
+
+        return string[:end] + "\n" + line + string[end:]
 
 
 class DiceException(DiceBaseException, ParseException):
@@ -0,0 +1,414 @@
+"""
+Lowest and highest possible results of an expression
+
+extremes() finds the bounds of an expression's result from its element
+tree, without rolling or building any lists of dice:
+
+    >>> dice.extremes.extremes("1048576d6t - 2")
+    Extremes(1048574, 6291454)
+
+List results are described by the bounds of their length and of each item,
+as well as of their total. Elements are handled by functions registered with
+extremes_of.register(); anything else raises NotImplementedError, and
+callers fall back to evaluating the expression.
+"""
+
+import functools
+
+import dice.stats
+import dice.utilities
+from dice.constants import MAX_EXPLOSIONS, MAX_ROLL_DICE, DiceExtreme
+from dice.elements import (
+    Add,
+    Array,
+    Div,
+    Element,
+    Explode,
+    Extend,
+    ForceReroll,
+    Highest,
+    Integer,
+    IntegerList,
+    Lowest,
+    Middle,
+    Mul,
+    Negate,
+    RandomElement,
+    Reroll,
+    Sort,
+    Sub,
+    Successes,
+    Total,
+    Variable,
+    WildDice,
+)
+
+
+class Extremes:
+    """The bounds of a result, and of its length and items if it is a list"""
+
+    __slots__ = ("lo", "hi", "count", "items")
+
+    def __init__(self, lo, hi, count=None, items=None):
+        self.lo = lo
+        self.hi = hi
+        self.count = count
+        self.items = items
+
+    @classmethod
+    def pool(cls, count, items, totals=None):
+        """A list with a length and items between the given bounds"""
+        if totals is None:
+            totals = products(count, items)
+        return cls(min(totals), max(totals), count, items)
+
+    @property
+    def is_list(self):
+        return self.count is not None
+
+    def as_items(self):
+        """The items of a list, or the value of a scalar as one item"""
+        if self.is_list:
+            return self.count, self.items
+        return (1, 1), (self.lo, self.hi)
+
+    def __eq__(self, other):
+        return isinstance(other, Extremes) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__
+        )
+
+    def __repr__(self):
+        if self.is_list:
+            return "Extremes({0}, {1}, count={2}, items={3})".format(
+                self.lo, self.hi, self.count, self.items
+            )
+        return "Extremes({0}, {1})".format(self.lo, self.hi)
+
+
+def products(a, b):
+    return [x * y for x in a for y in b]
+
+
+def constant(element, description, **kwargs):
+    ext = extremes_of(element, **kwargs)
+
+    if ext.is_list or ext.lo != ext.hi:
+        raise NotImplementedError("%s must be a constant" % description)
+
+    return ext.lo
+
+
+@functools.singledispatch
+def extremes_of(element, **kwargs):
+    """Returns the Extremes of an element's result"""
+    raise NotImplementedError(
+        "Cannot find the extremes of %s" % element.__class__.__name__
+    )
+
+
+@extremes_of.register(int)
+def _(element, **kwargs):
+    return Extremes(int(element), int(element))
+
+
+@extremes_of.register(IntegerList)
+def _(element, **kwargs):
+    values = list(map(int, element))
+    items = (min(values), max(values)) if values else (0, 0)
+    return Extremes(sum(values), sum(values), (len(values), len(values)), items)
+
+
+@extremes_of.register(Variable)
+def _(element, **kwargs):
+    bindings = kwargs.get("bindings") or {}
+
+    if element.name not in bindings:
+        raise NotImplementedError("Unbound variable")
+
+    value = bindings[element.name]
+
+    if not isinstance(value, Element):
+        try:
+            value = Integer(value)
+        except (TypeError, ValueError):
+            raise NotImplementedError("Variable is not an integer")
+
+    return extremes_of(value, **kwargs)
+
+
+@extremes_of.register(RandomElement)
+def _(element, **kwargs):
+    amount = extremes_of(element.amount, **kwargs)
+    min_value = extremes_of(element.min_value, **kwargs)
+    max_value = extremes_of(element.max_value, **kwargs)
+
+    # Lists are used as their totals; invalid rolls are left for evaluation
+    if amount.lo < 0 or amount.hi > kwargs.get("max_dice", MAX_ROLL_DICE):
+        raise NotImplementedError("Invalid amount of dice")
+    elif min_value.hi > max_value.lo:
+        raise NotImplementedError("Invalid range of dice")
+
+    return Extremes.pool((amount.lo, amount.hi), (min_value.lo, max_value.hi))
+
+
+@extremes_of.register(WildDice)
+def _(element, **kwargs):
+    raise NotImplementedError("Wild dice can explode without limit")
+
+
+@extremes_of.register(Total)
+def _(element, **kwargs):
+    ext = extremes_of(element.original_operands[0], **kwargs)
+    return Extremes(ext.lo, ext.hi)
+
+
+@extremes_of.register(Negate)
+def _(element, **kwargs):
+    ext = extremes_of(element.original_operands[0], **kwargs)
+
+    if not ext.is_list:
+        return Extremes(-ext.hi, -ext.lo)
+
+    return Extremes(-ext.hi, -ext.lo, ext.count, (-ext.items[1], -ext.items[0]))
+
+
+def fold(element, function, **kwargs):
+    operands = [extremes_of(x, **kwargs) for x in element.original_operands]
+    lo, hi = operands[0].lo, operands[0].hi
+
+    for operand in operands[1:]:
+        lo, hi = function((lo, hi), (operand.lo, operand.hi))
+
+    return Extremes(lo, hi)
+
+
+@extremes_of.register(Add)
+def _(element, **kwargs):
+    return fold(element, lambda a, b: (a[0] + b[0], a[1] + b[1]), **kwargs)
+
+
+@extremes_of.register(Sub)
+def _(element, **kwargs):
+    return fold(element, lambda a, b: (a[0] - b[1], a[1] - b[0]), **kwargs)
+
+
+@extremes_of.register(Mul)
+def _(element, **kwargs):
+    def mul(a, b):
+        values = products(a, b)
+        return min(values), max(values)
+
+    return fold(element, mul, **kwargs)
+
+
+@extremes_of.register(Div)
+def _(element, **kwargs):
+    def div(a, b):
+        if b[0] <= 0 <= b[1]:
+            raise NotImplementedError("Divisor may be zero")
+
+        # Floor division is monotonic in each operand when the divisor
+        # keeps its sign, so the bounds are found at the corners
+        values = [x // y for x in a for y in b]
+        return min(values), max(values)
+
+    return fold(element, div, **kwargs)
+
+
+def kept(element, **kwargs):
+    """The operand of Highest or Lowest and the number of values kept"""
+    ext = extremes_of(element.original_operands[0], **kwargs)
+
+    if not ext.is_list:
+        raise NotImplementedError("Operand must be a list")
+    elif len(element.original_operands) < 2:
+        # One fewer than the length of the list is kept, except that
+        # Highest and Lowest treat lists of one value differently
+        if ext.count[0] < 2:
+            raise NotImplementedError("List may be too short")
+        return ext, (ext.count[0] - 1, ext.count[1] - 1)
+
+    n = constant(element.original_operands[1], "The number of values", **kwargs)
+
+    if n <= 0:
+        raise NotImplementedError("Unusual number of values")
+
+    return ext, (min(n, ext.count[0]), min(n, ext.count[1]))
+
+
+@extremes_of.register(Highest)
+@extremes_of.register(Lowest)
+def _(element, **kwargs):
+    ext, count = kept(element, **kwargs)
+    return Extremes.pool(count, ext.items)
+
+
+@extremes_of.register(Sort)
+def _(element, **kwargs):
+    ext = extremes_of(element.original_operands[0], **kwargs)
+
+    if not ext.is_list:
+        raise NotImplementedError("Operand must be a list")
+
+    return ext
+
+
+def dice_bounds(element, **kwargs):
+    """The bounds of the faces of the dice an operator is applied to"""
+    roll = element.original_operands[0]
+
+    if not isinstance(roll, RandomElement):
+        raise NotImplementedError("Operand must be dice")
+
+    ext = extremes_of(roll, **kwargs)
+    return ext, ext.items[0], ext.items[1]
+
+
+@extremes_of.register(Reroll)
+def _(element, **kwargs):
+    return dice_bounds(element, **kwargs)[0]
+
+
+@extremes_of.register(ForceReroll)
+def _(element, **kwargs):
+    ext, min_value, max_value = dice_bounds(element, **kwargs)
+    thresh = min_value
+
+    if len(element.original_operands) > 1:
+        thresh = constant(element.original_operands[1], "The threshold", **kwargs)
+
+    if min_value <= thresh:
+        min_value = min(max_value, thresh + 1)
+
+    return Extremes.pool(ext.count, (min_value, max_value))
+
+
+@extremes_of.register(Explode)
+def _(element, **kwargs):
+    ext, min_value, max_value = dice_bounds(element, **kwargs)
+    thresh = max_value
+
+    if len(element.original_operands) > 1:
+        thresh = constant(element.original_operands[1], "The threshold", **kwargs)
+
+    if min_value == max_value or thresh <= min_value:
+        raise NotImplementedError("Invalid explosion")
+
+    if thresh > max_value:
+        return ext
+
+    # Each die adds up to ``cap`` dice at or above the threshold, and ends
+    # with one die below it
+    cap = MAX_EXPLOSIONS - 2
+    single = (
+        min(min_value, cap * thresh + min_value),
+        max(thresh - 1, cap * max_value + thresh - 1),
+    )
+    count = (ext.count[0], ext.count[1] * (cap + 1))
+    return Extremes.pool(count, (min_value, max_value), products(ext.count, single))
+
+
+@extremes_of.register(Successes)
+def _(element, **kwargs):
+    ext = extremes_of(element.original_operands[0], **kwargs)
+    thresh = constant(element.original_operands[1], "The threshold", **kwargs)
+    count, items = ext.as_items()
+
+    # Evaluating rolls with too high a threshold raises an error
+    if thresh > items[1]:
+        raise NotImplementedError("Threshold higher than every value")
+
+    lo = count[0] if items[0] >= thresh else 0
+    hi = count[1] if items[1] >= thresh else 0
+    return Extremes(lo, hi)
+
+
+@extremes_of.register(Array)
+def _(element, **kwargs):
+    totals = [extremes_of(x, **kwargs) for x in element.original_operands]
+    items = (min(x.lo for x in totals), max(x.hi for x in totals))
+    count = (len(totals), len(totals))
+    lo, hi = sum(x.lo for x in totals), sum(x.hi for x in totals)
+    return Extremes(lo, hi, count, items)
+
+
+@extremes_of.register(Extend)
+def _(element, **kwargs):
+    parts = [extremes_of(x, **kwargs) for x in element.original_operands]
+    counts = [x.as_items()[0] for x in parts]
+    items = [x.as_items()[1] for x in parts]
+    return Extremes(
+        sum(x.lo for x in parts),
+        sum(x.hi for x in parts),
+        (sum(c[0] for c in counts), sum(c[1] for c in counts)),
+        (min(i[0] for i in items), max(i[1] for i in items)),
+    )
+
+
+def extremes(expression, **kwargs):
+    """Returns the Extremes of an expression string or element tree"""
+    return extremes_of(dice.stats.parse(expression), **kwargs)
+
+
+# Elements whose result never decreases when one of their operands increases
+INCREASING = (Add, Total, Highest, Lowest, Middle, Array, Extend)
+
+
+def has_dice(element, **kwargs):
+    """Whether an element may roll dice"""
+    bindings = kwargs.get("bindings") or {}
+
+    for child in dice.utilities.walk([element]):
+        if isinstance(child, RandomElement):
+            return True
+        elif isinstance(child, Variable) and isinstance(
+            bindings.get(child.name), Element
+        ):
+            return True
+
+    return False
+
+
+def increasing(element, **kwargs):
+    """
+    Whether the result of an element only grows with each of its dice, so
+    that forcing every die to its lowest or highest value gives its lowest
+    or highest possible result
+    """
+    if not has_dice(element, **kwargs):
+        return True
+    elif isinstance(element, RandomElement):
+        operands = (element.amount, element.min_value, element.max_value)
+        return not any(has_dice(x, **kwargs) for x in operands)
+    elif isinstance(element, (Sub, Successes)):
+        first, rest = element.original_operands[0], element.original_operands[1:]
+        return increasing(first, **kwargs) and not any(
+            has_dice(x, **kwargs) for x in rest
+        )
+    elif isinstance(element, INCREASING):
+        return all(increasing(x, **kwargs) for x in element.original_operands)
+
+    return False
+
+
+def evaluate_extreme(element, **kwargs):
+    """
+    Evaluates an element with kwargs["force_extreme"] set, as if every die
+    was rolled at its lowest or highest value.
+
+    Scalar results that only grow with each die are found from the element
+    tree alone, without rolling. Anything else, including invalid
+    expressions and traced evaluations, is evaluated with the dice forced.
+    """
+    if "trace" not in kwargs and increasing(element, **kwargs):
+        try:
+            ext = extremes_of(element, **kwargs)
+        except NotImplementedError:
+            ext = None
+
+        if ext is not None and not ext.is_list:
+            if kwargs["force_extreme"] is DiceExtreme.EXTREME_MIN:
+                return Integer(ext.lo)
+            return Integer(ext.hi)
+
+    return element.evaluate_cached(**kwargs)
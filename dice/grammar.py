@@ -6,7 +6,9 @@ that get in the way of development and debugging. See the dice.utilities
 module for more information.
 """
 
-import warnings
+import functools
+import re
+import threading
 
 from pyparsing import (
     CaselessLiteral,
@@ -14,7 +16,8 @@ from pyparsing import (
     Literal,
     OneOrMore,
     Or,
-    ParserElement,
+    ParseBaseException,
+    Regex,
     StringStart,
     StringEnd,
     Suppress,
@@ -41,6 +44,7 @@ from dice.elements import (
     Array,
     Extend,
     Explode,
+    Faces,
     Reroll,
     ForceReroll,
     Negate,
@@ -49,14 +53,155 @@ from dice.elements import (
     ArraySub,
     RandomElement,
     Again,
+    Variable,
+    String,
 )
 
+from dice.constants import PACKRAT_CACHE_SIZE
 from dice.utilities import wrap_string
 
-# Enables pyparsing's packrat parsing, which is much faster
-# for the type of parsing being done in this library.
-warnings.warn("Enabled pyparsing packrat parsing", ImportWarning)
-ParserElement.enablePackrat()
+_missing = object()
+
+
+class Failure:
+    """A failed parse kept in a Memo, raised again when it is looked up"""
+
+    __slots__ = ("cls", "args", "attrs")
+
+    def __init__(self, exc):
+        # The exception itself would keep its traceback alive
+        self.cls = exc.__class__
+        self.args = exc.args
+        self.attrs = getattr(exc, "__dict__", None)
+
+    def exception(self):
+        exc = self.cls(*self.args)
+
+        if self.attrs:
+            exc.__dict__.update(self.attrs)
+
+        return exc
+
+
+class Memo:
+    """
+    Packrat memoization for one grammar.
+
+    pyparsing's enablePackrat() switches on a single memo shared by every
+    grammar in the process. A Memo is installed on the elements of one
+    grammar only, holds at most ``size`` results, keeps a separate memo for
+    each thread and counts its hits and misses. It is cleared when a parse
+    starts, and also when it ends if ``clear_after_parse`` is set, so no
+    parse results stay referenced between parses.
+    """
+
+    def __init__(self, size=PACKRAT_CACHE_SIZE, clear_after_parse=True):
+        self.size = size
+        self.clear_after_parse = clear_after_parse
+        self.local = threading.local()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.parses = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def cache(self):
+        cache = getattr(self.local, "cache", None)
+
+        if cache is None:
+            cache = self.local.cache = {}
+
+        return cache
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        self.cache.clear()
+
+    def to_dict(self):
+        return {
+            "size": self.size,
+            "parses": self.parses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def parse(self, element, instring, loc, do_actions=True, callPreParse=True, **kw):
+        """Replaces ParserElement._parse for memoized elements"""
+        # pyparsing 2 names the argument doActions
+        do_actions = kw.get("doActions", do_actions)
+        cache = self.cache
+        key = (element, instring, loc, callPreParse, do_actions)
+        value = cache.get(key, _missing)
+
+        if value is not _missing:
+            self.hits += 1
+
+            if type(value) is Failure:
+                raise value.exception()
+
+            return value[0], value[1].copy()
+
+        self.misses += 1
+
+        try:
+            loc, tokens = element._parseNoCache(instring, loc, do_actions, callPreParse)
+        except ParseBaseException as e:
+            # The exception is only rebuilt if the failure is looked up
+            self.store(cache, key, Failure(e))
+            raise
+
+        self.store(cache, key, (loc, tokens.copy()))
+        return loc, tokens
+
+    def store(self, cache, key, value):
+        # Entries are evicted oldest first
+        while len(cache) >= self.size:
+            del cache[next(iter(cache))]
+            self.evictions += 1
+
+        cache[key] = value
+
+    def parse_string(self, element, *args, **kwargs):
+        """Replaces ParserElement._parse for the top level element"""
+        self.parses += 1
+        self.clear()
+
+        try:
+            return self.parse(element, *args, **kwargs)
+        finally:
+            if self.clear_after_parse:
+                self.clear()
+
+    def install(self, expression):
+        """Memoizes every element of a grammar, which is streamlined first"""
+        expression.streamline()
+        seen = set()
+        stack = [expression]
+
+        while stack:
+            element = stack.pop()
+
+            if id(element) in seen:
+                continue
+
+            seen.add(id(element))
+            element._parse = functools.partial(self.parse, element)
+            stack.extend(getattr(element, "exprs", ()))
+
+            if getattr(element, "expr", None) is not None:
+                stack.append(element.expr)
+
+        expression._parse = functools.partial(self.parse_string, expression)
+        return expression
 
 
 def operatorPrecedence(base, operators):
@@ -120,59 +265,201 @@ def operatorPrecedence(base, operators):
     return expression
 
 
+def build_expression(dice_map=None, memo=None):
+    """
+    Builds the grammar for an expression in dice notation.
+
+    Dice kinds are looked up in ``dice_map``, RandomElement.DICE_MAP by
+    default. Every call returns new parser elements, so grammars built for
+    different registries share no state. The grammar is memoized with
+    ``memo``, or a new Memo if none is given.
+    """
+    if memo is None:
+        memo = Memo()
+
+    if dice_map is None:
+        parse_dice = RandomElement.parse
+        parse_unary_dice = RandomElement.parse_unary
+        dice_map = RandomElement.DICE_MAP
+    else:
+
+        def parse_dice(string, location, tokens):
+            return RandomElement.parse(string, location, tokens, dice_map)
+
+        def parse_unary_dice(string, location, tokens):
+            return RandomElement.parse_unary(string, location, tokens, dice_map)
+
+    # An integer value
+    integer = Word(nums)
+    integer.setParseAction(Integer.parse)
+    integer.setName("integer")
+
+    # A named variable, bound to a value when the expression is evaluated
+    variable = Regex(r"\{\s*[A-Za-z_][A-Za-z0-9_]*\s*\}")
+    variable.setParseAction(Variable.parse)
+    variable.setName("variable")
+
+    dice_element = Or(
+        wrap_string(CaselessLiteral, x, suppress=False) for x in dice_map.keys()
+    )
+    # The faces of a custom die, each with an optional weight
+    faces = Regex(r"\{\s*-?\d+(?:\s*:\s*\d+)?(?:\s*,\s*-?\d+(?:\s*:\s*\d+)?)*\s*\}")
+    faces.setParseAction(Faces.parse)
+    faces.setName("faces")
+
+    special = (
+        wrap_string(Literal, "%", suppress=False)
+        | wrap_string(CaselessLiteral, "f", suppress=False)
+        | faces
+    )
+
+    # An expression in dice notation
+    expression = (
+        StringStart()
+        + operatorPrecedence(
+            integer | variable,
+            [
+                (dice_element, 2, opAssoc.LEFT, parse_dice, special),
+                (dice_element, 1, opAssoc.RIGHT, parse_unary_dice, special),
+                (wrap_string(CaselessLiteral, "x"), 2, opAssoc.LEFT, Explode.parse),
+                (wrap_string(CaselessLiteral, "x"), 1, opAssoc.LEFT, Explode.parse),
+                (
+                    wrap_string(CaselessLiteral, "rr"),
+                    2,
+                    opAssoc.LEFT,
+                    ForceReroll.parse,
+                ),
+                (
+                    wrap_string(CaselessLiteral, "rr"),
+                    1,
+                    opAssoc.LEFT,
+                    ForceReroll.parse,
+                ),
+                (wrap_string(CaselessLiteral, "r"), 2, opAssoc.LEFT, Reroll.parse),
+                (wrap_string(CaselessLiteral, "r"), 1, opAssoc.LEFT, Reroll.parse),
+                (wrap_string(Word, "^hH", exact=1), 2, opAssoc.LEFT, Highest.parse),
+                (wrap_string(Word, "^hH", exact=1), 1, opAssoc.LEFT, Highest.parse),
+                (wrap_string(Word, "vlL", exact=1), 2, opAssoc.LEFT, Lowest.parse),
+                (wrap_string(Word, "vlL", exact=1), 1, opAssoc.LEFT, Lowest.parse),
+                (wrap_string(Word, "oOmM", exact=1), 2, opAssoc.LEFT, Middle.parse),
+                (wrap_string(Word, "oOmM", exact=1), 1, opAssoc.LEFT, Middle.parse),
+                (wrap_string(CaselessLiteral, "a"), 2, opAssoc.LEFT, Again.parse),
+                (wrap_string(CaselessLiteral, "a"), 1, opAssoc.LEFT, Again.parse),
+                (wrap_string(CaselessLiteral, "e"), 2, opAssoc.LEFT, Successes.parse),
+                (wrap_string(CaselessLiteral, "f"), 2, opAssoc.LEFT, SuccessFail.parse),
+                (wrap_string(CaselessLiteral, "t"), 1, opAssoc.LEFT, Total.parse),
+                (wrap_string(CaselessLiteral, "s"), 1, opAssoc.LEFT, Sort.parse),
+                (wrap_string(Literal, "+-"), 1, opAssoc.RIGHT, AddEvenSubOdd.parse),
+                (wrap_string(Literal, "+"), 1, opAssoc.RIGHT, Identity.parse),
+                (wrap_string(Literal, "-"), 1, opAssoc.RIGHT, Negate.parse),
+                (wrap_string(Literal, ".+"), 2, opAssoc.LEFT, ArrayAdd.parse),
+                (wrap_string(Literal, ".-"), 2, opAssoc.LEFT, ArraySub.parse),
+                (wrap_string(Literal, "%"), 2, opAssoc.LEFT, Modulo.parse),
+                (wrap_string(Literal, "/"), 2, opAssoc.LEFT, Div.parse),
+                (wrap_string(Literal, "*"), 2, opAssoc.LEFT, Mul.parse),
+                (wrap_string(Literal, "-"), 2, opAssoc.LEFT, Sub.parse),
+                (wrap_string(Literal, "+"), 2, opAssoc.LEFT, Add.parse),
+                (wrap_string(Literal, ","), 2, opAssoc.LEFT, Array.parse),
+                (wrap_string(Literal, "|"), 2, opAssoc.LEFT, Extend.parse),
+            ],
+        )
+        + StringEnd()
+    )
+    expression.setName("expression")
+    return memo.install(expression)
+
+
 # An integer value
 integer = Word(nums)
 integer.setParseAction(Integer.parse)
 integer.setName("integer")
 
-dice_separators = RandomElement.DICE_MAP.keys()
-dice_element = Or(
-    wrap_string(CaselessLiteral, x, suppress=False) for x in dice_separators
-)
-special = wrap_string(Literal, "%", suppress=False) | wrap_string(
-    CaselessLiteral, "f", suppress=False
-)
+# The grammar for the dice kinds registered when this module is imported
+memo = Memo()
+expression = build_expression(memo=memo)
 
-# An expression in dice notation
-expression = (
-    StringStart()
-    + operatorPrecedence(
-        integer,
-        [
-            (dice_element, 2, opAssoc.LEFT, RandomElement.parse, special),
-            (dice_element, 1, opAssoc.RIGHT, RandomElement.parse_unary, special),
-            (wrap_string(CaselessLiteral, "x"), 2, opAssoc.LEFT, Explode.parse),
-            (wrap_string(CaselessLiteral, "x"), 1, opAssoc.LEFT, Explode.parse),
-            (wrap_string(CaselessLiteral, "rr"), 2, opAssoc.LEFT, ForceReroll.parse),
-            (wrap_string(CaselessLiteral, "rr"), 1, opAssoc.LEFT, ForceReroll.parse),
-            (wrap_string(CaselessLiteral, "r"), 2, opAssoc.LEFT, Reroll.parse),
-            (wrap_string(CaselessLiteral, "r"), 1, opAssoc.LEFT, Reroll.parse),
-            (wrap_string(Word, "^hH", exact=1), 2, opAssoc.LEFT, Highest.parse),
-            (wrap_string(Word, "^hH", exact=1), 1, opAssoc.LEFT, Highest.parse),
-            (wrap_string(Word, "vlL", exact=1), 2, opAssoc.LEFT, Lowest.parse),
-            (wrap_string(Word, "vlL", exact=1), 1, opAssoc.LEFT, Lowest.parse),
-            (wrap_string(Word, "oOmM", exact=1), 2, opAssoc.LEFT, Middle.parse),
-            (wrap_string(Word, "oOmM", exact=1), 1, opAssoc.LEFT, Middle.parse),
-            (wrap_string(CaselessLiteral, "a"), 2, opAssoc.LEFT, Again.parse),
-            (wrap_string(CaselessLiteral, "a"), 1, opAssoc.LEFT, Again.parse),
-            (wrap_string(CaselessLiteral, "e"), 2, opAssoc.LEFT, Successes.parse),
-            (wrap_string(CaselessLiteral, "f"), 2, opAssoc.LEFT, SuccessFail.parse),
-            (wrap_string(CaselessLiteral, "t"), 1, opAssoc.LEFT, Total.parse),
-            (wrap_string(CaselessLiteral, "s"), 1, opAssoc.LEFT, Sort.parse),
-            (wrap_string(Literal, "+-"), 1, opAssoc.RIGHT, AddEvenSubOdd.parse),
-            (wrap_string(Literal, "+"), 1, opAssoc.RIGHT, Identity.parse),
-            (wrap_string(Literal, "-"), 1, opAssoc.RIGHT, Negate.parse),
-            (wrap_string(Literal, ".+"), 2, opAssoc.LEFT, ArrayAdd.parse),
-            (wrap_string(Literal, ".-"), 2, opAssoc.LEFT, ArraySub.parse),
-            (wrap_string(Literal, "%"), 2, opAssoc.LEFT, Modulo.parse),
-            (wrap_string(Literal, "/"), 2, opAssoc.LEFT, Div.parse),
-            (wrap_string(Literal, "*"), 2, opAssoc.LEFT, Mul.parse),
-            (wrap_string(Literal, "-"), 2, opAssoc.LEFT, Sub.parse),
-            (wrap_string(Literal, "+"), 2, opAssoc.LEFT, Add.parse),
-            (wrap_string(Literal, ","), 2, opAssoc.LEFT, Array.parse),
-            (wrap_string(Literal, "|"), 2, opAssoc.LEFT, Extend.parse),
-        ],
-    )
-    + StringEnd()
+
+# The shapes of most expressions: XdY, optionally keeping the highest or
+# lowest K dice and adding or subtracting Z. Whitespace and digits are
+# matched as pyparsing's defaults match them.
+SIMPLE_EXPRESSION = re.compile(
+    r"[ \t\r\n]*(?P<amount>[0-9]+)?[ \t\r\n]*(?P<kind>[dD])[ \t\r\n]*"
+    r"(?P<sides>[0-9]+)"
+    r"(?:[ \t\r\n]*(?P<keep>[hH^lLv])(?:[ \t\r\n]*(?P<n>[0-9]+))?)?"
+    r"(?:[ \t\r\n]*(?P<op>[-+])[ \t\r\n]*(?P<k>[0-9]+))?[ \t\r\n]*\Z"
 )
-expression.setName("expression")
+
+
+def parse_simple(string, dice_map=None):
+    """
+    Builds the element tree of a simple expression without the grammar.
+
+    Returns None if the string is not one of the shapes matched by
+    SIMPLE_EXPRESSION, or if building its elements fails, so that the full
+    grammar parses it (and reports any error) instead. The tree is the same
+    as the one the grammar builds, down to the parse attributes.
+    """
+    # pyparsing expands tabs before parsing, which changes locations
+    string = string.expandtabs()
+    match = SIMPLE_EXPRESSION.match(string)
+
+    if match is None:
+        return None
+
+    if dice_map is None:
+        dice_map = RandomElement.DICE_MAP
+
+    # Other kinds starting with "d" could match a longer separator
+    if any(k.lower().startswith("d") != (k == "d") for k in dice_map):
+        return None
+    elif "d" not in dice_map:
+        return None
+
+    def integer(name):
+        return Integer.parse(string, match.start(name), [match.group(name)])
+
+    try:
+        kind = String.parse(string, match.start("kind"), ["d"])
+
+        if match.group("amount") is not None:
+            location = match.start("amount")
+            tokens = [integer("amount"), kind, integer("sides")]
+            element = RandomElement.parse(string, location, tokens, dice_map)
+        else:
+            location = match.start("kind")
+            tokens = [kind, integer("sides")]
+            element = RandomElement.parse_unary(string, location, tokens, dice_map)
+
+        keep = match.group("keep")
+
+        if keep is not None:
+            tokens = [element]
+
+            if match.group("n") is not None:
+                tokens.append(integer("n"))
+
+            cls = Highest if keep in "^hH" else Lowest
+            element = cls.parse(string, location, tokens)
+
+        if match.group("op") is not None:
+            cls = Add if match.group("op") == "+" else Sub
+            element = cls.parse(string, location, [element, integer("k")])
+    except ParseBaseException:
+        return None
+
+    return [element]
+
+
+def parse_string(string, grammar=None, dice_map=None):
+    """
+    Parses an expression into a list of element trees, trying parse_simple()
+    before the grammar (dice.grammar.expression by default).
+    """
+    elements = parse_simple(string, dice_map)
+
+    if elements is None:
+        if grammar is None:
+            grammar = expression
+        elements = list(grammar.parseString(string, parseAll=True))
+
+    return elements
@@ -0,0 +1,157 @@
+"""
+Incremental parsing for interactive editing
+
+The lowest precedence operators, ``,`` (Array) and ``|`` (Extend), split an
+expression into segments that can be parsed independently. An
+IncrementalParser keeps the parsed tree of each segment it has seen, so an
+edit only re-parses the segments whose text changed; the unchanged subtrees
+are reused and moved to their new location in the string. An edit that
+does not parse raises an error and leaves the parser at the last string
+that did.
+"""
+
+from copy import deepcopy
+
+from pyparsing import ParseBaseException
+
+import dice.grammar
+from dice.elements import Array, Extend
+from dice.exceptions import DiceBaseException
+from dice.utilities import children
+
+# The maximum number of segment trees kept by a parser
+CACHE_SIZE = 256
+
+SEPARATORS = ",|"
+
+
+def split_segments(string):
+    """Splits a string on top-level separators, returning spans and separators"""
+    segments, separators = [], []
+    depth = start = 0
+
+    for i, char in enumerate(string):
+        if char in "({":
+            depth += 1
+        elif char in ")}":
+            depth -= 1
+        elif depth == 0 and char in SEPARATORS:
+            segments.append((start, i))
+            separators.append(char)
+            start = i + 1
+
+    segments.append((start, len(string)))
+    return segments, separators
+
+
+def relocate(tree, string, offset):
+    """Moves a tree parsed from a substring to its place in a larger string"""
+    seen = set()
+    stack = [tree]
+
+    while stack:
+        element = stack.pop()
+
+        if id(element) in seen:
+            continue
+
+        seen.add(id(element))
+
+        if hasattr(element, "location"):
+            element.string = string
+            element.location += offset
+            element.end += offset
+
+        stack.extend(children(element))
+
+
+def strip_tokens(tree):
+    """Drops pyparsing's tokens, which are only needed while parsing"""
+    stack = [tree]
+
+    while stack:
+        element = stack.pop()
+        if getattr(element, "tokens", None):
+            element.tokens = ()
+        stack.extend(children(element))
+
+    return tree
+
+
+class IncrementalParser:
+    """Parses a string, then re-parses it cheaply after each edit"""
+
+    def __init__(self, string="", cache_size=CACHE_SIZE):
+        self.string = string
+        self.cache = {}
+        self.cache_size = cache_size
+        self.tree = None
+
+        if string:
+            self.parse(string)
+
+    def parse_segment(self, text):
+        if text not in self.cache:
+            tree = dice.grammar.parse_string(text)[0]
+
+            if len(self.cache) >= self.cache_size:
+                del self.cache[next(iter(self.cache))]
+
+            self.cache[text] = strip_tokens(tree)
+
+        return deepcopy(self.cache[text])
+
+    def parse(self, string):
+        """Parses a whole string, reusing any segments seen before"""
+        segments, separators = split_segments(string)
+        elements = []
+
+        for start, end in segments:
+            try:
+                element = self.parse_segment(string[start:end])
+            except ParseBaseException as e:
+                error = DiceBaseException.from_other(e)
+
+                # The error is located in the segment, not the whole string
+                moved = error.__class__(string, start + error.loc, error.args[2])
+                moved.code = error.code
+                raise moved
+
+            relocate(element, string, start)
+            elements.append(element)
+
+        self.tree = [self.combine(string, segments, separators, elements)]
+        self.string = string
+        return self.tree
+
+    def edit(self, offset, removed, inserted):
+        """Replaces ``removed`` characters at ``offset`` with ``inserted``"""
+        if not 0 <= offset <= offset + removed <= len(self.string):
+            raise ValueError("Edit is outside of the current string")
+
+        string = self.string[:offset] + inserted + self.string[offset + removed :]
+        return self.parse(string)
+
+    @staticmethod
+    def combine(string, segments, separators, elements):
+        """Rebuilds the Array and Extend elements joining the segments"""
+
+        def build(cls, operands, first):
+            if len(operands) == 1:
+                return operands[0]
+
+            start = segments[first][0]
+            text = string[start : segments[first][1]]
+            location = start + len(text) - len(text.lstrip())
+            return cls(*operands).set_parse_attributes(string, location, operands)
+
+        groups, group, first = [], [elements[0]], 0
+
+        for i, separator in enumerate(separators):
+            if separator == "|":
+                groups.append((build(Array, group, first), first))
+                group, first = [], i + 1
+            group.append(elements[i + 1])
+
+        groups.append((build(Array, group, first), first))
+        return build(Extend, [g for g, _ in groups], groups[0][1])
@@ -0,0 +1,151 @@
+"""
+Parallel evaluation of independent subtrees
+
+The operands of Array (``,``) and Extend (``|``) do not depend on each
+other. evaluate() sends the operands that roll at least ``min_dice`` dice to
+an executor, a pool of worker processes by default, and evaluates the rest
+of the tree as usual with their results merged back in order:
+
+    >>> dice.roll("100000d1t, 100000d1t, 3", parallel=True)
+    [100000, 100000, 3]
+
+Each operand is rolled with its own random engine, seeded from the
+caller's, so results depend on the seed but not on the number of workers.
+The number of dice is estimated from the bounds of each amount (see
+dice.extremes); nothing is sent unless at least two operands are heavy
+enough to be worth the cost of a worker, and the default pool is not used
+on a single CPU.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import dice.serialize
+from dice.constants import PARALLEL_MIN_DICE
+from dice.elements import Array, Element, Extend, RandomElement, wants_breakdown
+from dice.extremes import extremes_of
+from dice.utilities import children, walk
+
+# Evaluation options sent to workers; others, such as traces, stay local
+WORKER_KWARGS = (
+    "bindings",
+    "max_dice",
+    "max_explosions",
+    "seed_compat",
+    "force_extreme",
+    "in_place",
+)
+
+_executor = None
+
+
+def default_executor():
+    """Returns a process pool with a worker for each CPU, created once"""
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+
+    return _executor
+
+
+def cost(element, **kwargs):
+    """
+    The most dice an element rolls, not counting explosions, or 0 if the
+    number cannot be found from the element tree
+    """
+    dice_count = 0
+    seen = set()
+
+    for child in walk([element]):
+        if not isinstance(child, RandomElement) or id(child) in seen:
+            continue
+
+        seen.add(id(child))
+
+        try:
+            amount = extremes_of(child.amount, **kwargs)
+        except NotImplementedError:
+            return 0
+
+        dice_count += max(0, amount.hi)
+
+    return dice_count
+
+
+def heavy_subtrees(element, min_dice=PARALLEL_MIN_DICE, **kwargs):
+    """Returns the operands of Array and Extend that roll at least min_dice dice"""
+    found = []
+    stack = [element]
+
+    while stack:
+        current = stack.pop()
+
+        if not isinstance(current, (Array, Extend)):
+            stack.extend(reversed(children(current)))
+            continue
+
+        for operand in current.original_operands:
+            if isinstance(operand, (Array, Extend)):
+                stack.append(operand)
+            elif isinstance(operand, Element) and cost(operand, **kwargs) >= min_dice:
+                found.append(operand)
+            else:
+                stack.append(operand)
+
+    return found
+
+
+def evaluate_remote(node, source, seed, kwargs):
+    """Evaluates a serialized element in a worker"""
+    element = dice.serialize.load_element(node, source)
+
+    if seed is None:
+        kwargs["random"] = random.SystemRandom()
+    else:
+        kwargs["random"] = random.Random(seed)
+
+    return element.evaluate_traced(**kwargs)
+
+
+def evaluate(element, executor=None, min_dice=PARALLEL_MIN_DICE, **kwargs):
+    """
+    Evaluates an element, sending its heavy independent subtrees to
+    ``executor`` (default_executor() by default). Evaluations that need
+    every element, such as traces, are not sent.
+    """
+    if wants_breakdown(kwargs):
+        return element.evaluate_cached(**kwargs)
+
+    subtrees = heavy_subtrees(element, min_dice, **kwargs)
+
+    if len(subtrees) < 2:
+        return element.evaluate_cached(**kwargs)
+
+    if executor is None:
+        if (os.cpu_count() or 1) < 2:
+            return element.evaluate_cached(**kwargs)
+
+        executor = default_executor()
+
+    rnd_engine = kwargs.get("random", random)
+    system = isinstance(rnd_engine, random.SystemRandom)
+    worker_kwargs = {k: kwargs[k] for k in WORKER_KWARGS if k in kwargs}
+    source = getattr(element, "string", None)
+    futures = []
+
+    for subtree in subtrees:
+        node = dice.serialize.dump_element(subtree, spans=True)
+        seed = None if system else rnd_engine.getrandbits(64)
+        futures.append(
+            executor.submit(evaluate_remote, node, source, seed, dict(worker_kwargs))
+        )
+
+    kwargs.setdefault("results", {})
+    results = kwargs["results"]
+
+    for subtree, future in zip(subtrees, futures):
+        results[id(subtree)] = future.result()
+
+    return element.evaluate_cached(**kwargs)
@@ -0,0 +1,80 @@
+"""
+Independent parsers with their own dice kinds
+
+A Parser owns a copy of the dice registry, a grammar built from it, its own
+packrat memo and a cache of parsed expressions, so parsers used by
+different threads or tenants share no mutable state and need no locks:
+
+    >>> parser = dice.parser.Parser()
+    >>> parser.register_dice(MyDice)
+    >>> dice.roll("3m6", parser=parser)
+
+A Parser is not itself safe to share between threads; local_parser()
+returns one for the current thread, built from the global registry.
+"""
+
+import threading
+from copy import deepcopy
+
+from pyparsing import ParseBaseException
+
+from dice.constants import PARSER_CACHE_SIZE
+from dice.elements import RandomElement
+from dice.exceptions import DiceBaseException
+from dice.grammar import Memo, build_expression, parse_string
+from dice.incremental import strip_tokens
+
+_local = threading.local()
+
+
+class Parser:
+    """Parses dice expressions with its own registry of dice kinds"""
+
+    def __init__(self, dice_map=None, cache_size=PARSER_CACHE_SIZE, memo=None):
+        if dice_map is None:
+            dice_map = RandomElement.DICE_MAP
+
+        self.dice_map = dict(dice_map)
+        self.cache = {}
+        self.cache_size = cache_size
+        self.memo = Memo() if memo is None else memo
+        self.expression = build_expression(self.dice_map, self.memo)
+
+    def register_dice(self, new_cls):
+        """Adds a dice kind to this parser only"""
+        RandomElement.register_dice(new_cls, self.dice_map)
+        self.expression = build_expression(self.dice_map, self.memo)
+        self.cache.clear()
+        return new_cls
+
+    def parse(self, string, copy=True):
+        """
+        Returns a new list of element trees for an expression, or with
+        ``copy=False`` the cached list, which must not be changed: it may
+        only be evaluated with a ``results`` mapping (see dice.template).
+        """
+        if string not in self.cache:
+            try:
+                elements = parse_string(string, self.expression, self.dice_map)
+            except ParseBaseException as e:
+                raise DiceBaseException.from_other(e)
+
+            if len(self.cache) >= self.cache_size:
+                del self.cache[next(iter(self.cache))]
+
+            self.cache[string] = [strip_tokens(x) for x in elements]
+
+        if not copy:
+            return self.cache[string]
+
+        return deepcopy(self.cache[string])
+
+
+def local_parser():
+    """Returns the Parser of the current thread, creating it if needed"""
+    parser = getattr(_local, "parser", None)
+
+    if parser is None:
+        parser = _local.parser = Parser()
+
+    return parser
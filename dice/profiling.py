@@ -0,0 +1,168 @@
+"""
+Opt-in profiling of parsing and evaluation
+
+    >>> with dice.profiling.profile() as stats:
+    ...     dice.roll("10d6x + 4d6h3")
+    >>> print(stats.to_prometheus())
+
+While a profile is active, the time and net memory blocks allocated by each phase
+(parse, compile, evaluate, render) and each element type are recorded, along
+with the number of dice rolled. When no profile is active phase() returns a
+shared no-op context manager and no observer is added to evaluations.
+"""
+
+import contextlib
+import contextvars
+import json
+import sys
+import time
+
+import dice.elements
+from dice.utilities import classname
+
+_active = contextvars.ContextVar("dice_profile", default=None)
+_disabled = contextlib.nullcontext()
+
+
+class Counter:
+    """Accumulated calls, seconds and allocated memory blocks"""
+
+    __slots__ = ("calls", "seconds", "blocks")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.blocks = 0
+
+    def add(self, seconds, blocks):
+        self.calls += 1
+        self.seconds += seconds
+        self.blocks += blocks
+
+    def to_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds, "blocks": self.blocks}
+
+
+class Stats:
+    """Collects timings while a profile is active, as an evaluation observer"""
+
+    # Profiles time the same evaluation that would run without them
+    breakdown = False
+
+    def __init__(self):
+        self.phases = {}
+        self.nodes = {}
+        self.dice = 0
+        self.stack = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            counter = self.phases.setdefault(name, Counter())
+            counter.add(time.perf_counter() - start, sys.getallocatedblocks() - blocks)
+
+    def enter(self, element):
+        # The last two items collect the time and blocks used by children
+        self.stack.append([time.perf_counter(), sys.getallocatedblocks(), 0.0, 0])
+        return element
+
+    def exit(self, element, result):
+        start, blocks, child_seconds, child_blocks = self.stack.pop()
+        seconds = time.perf_counter() - start
+        blocks = sys.getallocatedblocks() - blocks
+
+        if self.stack:
+            self.stack[-1][2] += seconds
+            self.stack[-1][3] += blocks
+
+        # Elements are counted by the time spent in them, excluding children
+        counter = self.nodes.setdefault(classname(element), Counter())
+        counter.add(seconds - child_seconds, blocks - child_blocks)
+
+        if isinstance(element, dice.elements.RandomElement) and result is not None:
+            self.dice += len(result)
+
+    def to_dict(self):
+        return {
+            "phases": {k: v.to_dict() for k, v in self.phases.items()},
+            "nodes": {k: v.to_dict() for k, v in self.nodes.items()},
+            "dice": self.dice,
+        }
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="dice"):
+        """Formats the statistics in the Prometheus text exposition format"""
+        lines = []
+
+        def metric(name, label, counters, attr, help_text, kind="counter"):
+            name = "%s_%s" % (prefix, name)
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            for key, counter in sorted(counters.items()):
+                value = getattr(counter, attr)
+                lines.append('%s{%s="%s"} %s' % (name, label, key, value))
+
+        metric("phase_calls_total", "phase", self.phases, "calls", "Phase runs")
+        metric("phase_seconds_total", "phase", self.phases, "seconds", "Time in phase")
+        metric(
+            "phase_allocated_blocks",
+            "phase",
+            self.phases,
+            "blocks",
+            "Net change in allocated memory blocks during phase",
+            "gauge",
+        )
+        metric("node_calls_total", "kind", self.nodes, "calls", "Evaluated elements")
+        metric(
+            "node_seconds_total",
+            "kind",
+            self.nodes,
+            "seconds",
+            "Time evaluating elements, excluding their children",
+        )
+        metric(
+            "node_allocated_blocks",
+            "kind",
+            self.nodes,
+            "blocks",
+            "Net change in allocated memory blocks, excluding children",
+            "gauge",
+        )
+
+        name = "%s_dice_rolled_total" % prefix
+        lines.append("# HELP %s Dice rolled by random elements" % name)
+        lines.append("# TYPE %s counter" % name)
+        lines.append("%s %s" % (name, self.dice))
+        return "\n".join(lines) + "\n"
+
+
+def active():
+    """Returns the Stats of the active profile, or None"""
+    return _active.get()
+
+
+def phase(name):
+    """Times a phase of work if a profile is active"""
+    stats = _active.get()
+    if stats is None:
+        return _disabled
+    return stats.phase(name)
+
+
+@contextlib.contextmanager
+def profile(stats=None):
+    """Records statistics for everything evaluated inside the block"""
+    if stats is None:
+        stats = Stats()
+
+    token = _active.set(stats)
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
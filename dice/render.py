@@ -0,0 +1,102 @@
+"""
+Compact rendering of large results
+
+A roll of a hundred thousand dice prints as a list of a hundred thousand
+numbers. render() summarizes lists longer than ``max_items`` instead, in
+one of three styles:
+
+    >>> roll = dice.roll("1000d6")
+    >>> print(dice.render.render(roll, max_items=6))
+    [3, 1, 6, ... 994 more ..., 2, 2, 5]
+    >>> print(dice.render.render(roll, max_items=6, style="counts"))
+    {1: 171, 2: 162, 3: 168, 4: 170, 5: 159, 6: 170}
+    >>> print(dice.render.render(dice.roll("1000d6s"), max_items=6, style="runs"))
+    [1*171, 2*162, 3*168, 4*170, 5*159, 6*170]
+
+Summaries longer than ``max_items`` items are cut the same way. write()
+renders to a file object, writing whole lists a chunk at a time rather than
+building one large string.
+"""
+
+import itertools
+from collections import Counter
+
+import dice.elements
+from dice.constants import RENDER_CHUNK_SIZE
+
+STYLES = ("edges", "counts", "runs")
+
+
+def edges(items, max_items):
+    """Renders the first and last items of a sequence"""
+    head = max(1, max_items // 2)
+    tail = max(0, max_items - head)
+    hidden = len(items) - head - tail
+
+    if hidden <= 0:
+        return ", ".join(map(str, items))
+
+    parts = list(map(str, items[:head]))
+    parts.append("... %i more ..." % hidden)
+    parts.extend(map(str, items[len(items) - tail :]))
+    return ", ".join(parts)
+
+
+def counts(values):
+    """Items of the number of times each value occurs, by value"""
+    return ["%s: %i" % x for x in sorted(Counter(values).items())]
+
+
+def runs(values):
+    """Items of the values, with runs of equal values as value*length"""
+    items = []
+
+    for value, run in itertools.groupby(values):
+        length = sum(1 for _ in run)
+        items.append(str(value) if length == 1 else "%s*%i" % (value, length))
+
+    return items
+
+
+def render_items(values, max_items=None, style="edges"):
+    """
+    Renders a list of values in brackets, summarized in the given style if
+    it has more than max_items items
+    """
+    if max_items is None or len(values) <= max_items:
+        return "[%s]" % ", ".join(map(str, values))
+    elif style == "edges":
+        return "[%s]" % edges(values, max_items)
+    elif style == "counts":
+        return "{%s}" % edges(counts(values), max_items)
+    elif style == "runs":
+        return "[%s]" % edges(runs(values), max_items)
+
+    raise ValueError("Unknown style %r, expected one of %s" % (style, STYLES))
+
+
+def render(value, max_items=None, style="edges"):
+    """Renders a result, summarizing it if it is a long list"""
+    if isinstance(value, dice.elements.IntegerList):
+        return value.render(max_items, style)
+
+    return str(value)
+
+
+def write(file, value, max_items=None, style="edges", chunk_size=RENDER_CHUNK_SIZE):
+    """Renders a result to a file object, a chunk of items at a time"""
+    if not isinstance(value, dice.elements.IntegerList) or (
+        max_items is not None and len(value) > max_items
+    ):
+        file.write(render(value, max_items, style))
+        return
+
+    file.write("[")
+
+    for start in range(0, len(value), chunk_size):
+        if start:
+            file.write(", ")
+
+        file.write(", ".join(map(str, value[start : start + chunk_size])))
+
+    file.write("]" + value.total_suffix())
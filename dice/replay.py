@@ -0,0 +1,285 @@
+"""
+Recording and replaying random draws
+
+record() evaluates a compiled expression (see dice.template) with a random
+engine that logs every number it draws, along with the element that drew
+it. The DrawLog holds plain arrays, twelve bytes per draw, and can be stored
+with to_bytes(). replay() evaluates the expression again with the numbers
+from the log instead of a random engine, so the result of a disputed roll
+and its breakdown can be regenerated on demand:
+
+    >>> result, log = dice.replay.record("4d6h3")
+    >>> trace = dice.trace.Trace()
+    >>> dice.replay.replay(log, trace=trace) == result
+    True
+
+Every die is drawn for a recording, as for a trace, rather than taking
+shortcuts such as drawing a count of successes, so that replays can be
+traced. Variable bindings are not part of the log and must be passed to
+replay() again.
+"""
+
+import random
+import struct
+import sys
+from array import array
+
+import dice.template
+import dice.trace
+from dice.utilities import walk
+
+# Magic number and lengths of the expression, draws and floats
+HEADER = struct.Struct("<4sIII")
+MAGIC = b"DRW1"
+
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+
+def as_template(expression):
+    if isinstance(expression, dice.template.Template):
+        return expression
+    return dice.template.compile(expression)
+
+
+def node_ids(elements):
+    """Numbers every element of a list of element trees, in walk() order"""
+    ids = {}
+
+    for element in walk(elements):
+        ids.setdefault(id(element), len(ids))
+
+    return ids
+
+
+class DrawLog:
+    """
+    The numbers drawn evaluating an expression, in order
+
+    ``nodes`` holds the id of the element that made each draw, shifted left
+    by one with the low bit set for floats. Floats are kept in ``floats`` and
+    integers, in 64 bit words, in ``words``.
+    """
+
+    __slots__ = ("expression", "nodes", "words", "floats")
+
+    def __init__(self, expression, nodes=None, words=None, floats=None):
+        self.expression = expression
+        self.nodes = array("I") if nodes is None else nodes
+        self.words = array("Q") if words is None else words
+        self.floats = array("d") if floats is None else floats
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __eq__(self, other):
+        return isinstance(other, DrawLog) and all(
+            getattr(self, k) == getattr(other, k) for k in self.__slots__
+        )
+
+    def __repr__(self):
+        return "DrawLog({0!r}, {1} draws)".format(self.expression, len(self))
+
+    def draws(self):
+        """Yields the (node id, number) of each draw"""
+        words = iter(self.words)
+        floats = iter(self.floats)
+
+        for node in self.nodes:
+            if node & 1:
+                yield node >> 1, next(floats)
+            else:
+                yield node >> 1, next(words)
+
+    def to_bytes(self):
+        expression = self.expression.encode("utf-8")
+        arrays = [self.nodes, self.words, self.floats]
+
+        if sys.byteorder == "big":
+            arrays = [array(x.typecode, x) for x in arrays]
+
+            for x in arrays:
+                x.byteswap()
+
+        header = HEADER.pack(MAGIC, len(expression), len(self.nodes), len(self.floats))
+        return b"".join([header, expression] + [x.tobytes() for x in arrays])
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Not a draw log")
+
+        magic, length, count, float_count = HEADER.unpack_from(data)
+
+        if magic != MAGIC:
+            raise ValueError("Not a draw log")
+
+        layout = [("I", count), ("Q", count - float_count), ("d", float_count)]
+        size = HEADER.size + length
+        size += sum(array(typecode).itemsize * n for typecode, n in layout)
+
+        if float_count > count or len(data) != size:
+            raise ValueError("The draw log is truncated or corrupt")
+
+        offset = HEADER.size
+        expression = bytes(data[offset : offset + length]).decode("utf-8")
+        offset += length
+        arrays = []
+
+        for typecode, size in layout:
+            x = array(typecode)
+            end = offset + size * x.itemsize
+            x.frombytes(data[offset:end])
+            offset = end
+
+            if sys.byteorder == "big":
+                x.byteswap()
+
+            arrays.append(x)
+
+        return cls(expression, *arrays)
+
+
+class DrawObserver(random.Random):
+    """
+    A random engine that also observes the evaluation, so that it knows
+    which element each number is drawn for
+    """
+
+    breakdown = True
+
+    def __init__(self, elements):
+        super().__init__()
+        self.ids = node_ids(elements)
+        self.stack = []
+
+    def enter(self, element):
+        self.stack.append(element)
+
+    def exit(self, token, result):
+        self.stack.pop()
+
+    @property
+    def node(self):
+        """The id of the innermost element being evaluated that has one"""
+        for element in reversed(self.stack):
+            node = self.ids.get(id(element))
+
+            if node is not None:
+                return node
+
+        return 0
+
+
+class Recorder(DrawObserver):
+    """Draws numbers from another random engine, logging them"""
+
+    def __init__(self, template, source=None):
+        super().__init__(template.elements)
+        self.source = random.Random() if source is None else source
+        self.log = DrawLog(template.string)
+
+    def random(self):
+        value = self.source.random()
+        self.log.nodes.append(self.node << 1 | 1)
+        self.log.floats.append(value)
+        return value
+
+    def getrandbits(self, k):
+        value = self.source.getrandbits(k)
+        node = self.node << 1
+
+        for shift in range(0, max(k, 1), WORD_BITS):
+            self.log.nodes.append(node)
+            self.log.words.append((value >> shift) & WORD_MASK)
+
+        return value
+
+
+class Replayer(DrawObserver):
+    """Returns the numbers of a DrawLog in order, checking where they are drawn"""
+
+    def __init__(self, template, log):
+        super().__init__(template.elements)
+        self.template = template
+        self.log = log
+        self.position = 0
+        self.words = iter(log.words)
+        self.floats = iter(log.floats)
+
+    def mismatch(self):
+        # Draws left over are reported at the start of the expression
+        element = self.stack[-1] if self.stack else self.template.elements[0]
+
+        if not hasattr(element, "location"):
+            return ValueError("The draw log does not match the expression")
+
+        return element.fatal(
+            "The draw log does not match the expression", code="replay-mismatch"
+        )
+
+    def next_node(self, is_float):
+        if self.position >= len(self.log.nodes):
+            raise self.mismatch()
+
+        expected = self.log.nodes[self.position]
+
+        if expected != self.node << 1 | is_float:
+            raise self.mismatch()
+
+        self.position += 1
+
+    def next_number(self, numbers):
+        try:
+            return next(numbers)
+        except StopIteration:
+            raise self.mismatch()
+
+    def random(self):
+        self.next_node(1)
+        return self.next_number(self.floats)
+
+    def getrandbits(self, k):
+        value = 0
+
+        for shift in range(0, max(k, 1), WORD_BITS):
+            self.next_node(0)
+            value |= self.next_number(self.words) << shift
+
+        return value
+
+    def finish(self):
+        if self.position != len(self.log.nodes):
+            raise self.mismatch()
+
+
+def record(expression, bindings=None, source=None, **kwargs):
+    """
+    Evaluates an expression string or Template, drawing numbers from
+    ``source`` (a new random.Random by default). Returns the result and the
+    DrawLog of the evaluation.
+    """
+    template = as_template(expression)
+    recorder = Recorder(template, source)
+    kwargs["random"] = recorder
+    dice.trace.observe(kwargs, recorder)
+    result = template.evaluate(bindings, **kwargs)
+    return result, recorder.log
+
+
+def replay(log, bindings=None, template=None, **kwargs):
+    """
+    Evaluates the expression of a DrawLog again with the numbers drawn when
+    it was recorded. Pass a ``trace`` to regenerate the breakdown of the
+    roll. Raises DiceFatalException with the code "replay-mismatch" if the
+    log does not match the expression and bindings.
+    """
+    if template is None:
+        template = as_template(log.expression)
+
+    replayer = Replayer(template, log)
+    kwargs["random"] = replayer
+    dice.trace.observe(kwargs, replayer)
+    result = template.evaluate(bindings, **kwargs)
+    replayer.finish()
+    return result
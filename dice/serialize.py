@@ -0,0 +1,254 @@
+"""
+Serialization of element trees and results
+
+Documents are plain mappings that can be encoded as JSON or, if the optional
+``msgpack`` package is installed, as MessagePack. Parse metadata (the
+``tokens`` pyparsing attaches to elements) is never included, and the source
+string and spans are only included when asked for.
+
+Schema (version 1):
+
+    document  := {"format": "dice", "version": 1, "type": "element" | "result",
+                  "data": element | result, ["source": str]}
+    element   := int
+               | {"k": "Variable", "n": name, ["s": [start, end]]}
+               | {"k": "Faces", "f": [[value, weight]...], ["s": [start, end]]}
+               | {"k": kind, "o": [element...], ["min": element],
+                  ["max": element], ["s": [start, end]]}
+    result    := int
+               | {"k": "IntegerList", "d": dice}
+               | {"k": roll kind, "d": dice, "e": element, ["x": extreme]}
+    dice      := [int...] | {"q": base64 string} | {"q": bytes}
+
+A packed dice array (``{"q": ...}``) holds little-endian signed 64-bit
+integers. In MessagePack documents the bytes are stored as-is, and
+dice_array() returns a memoryview over them without copying.
+"""
+
+import base64
+import json
+import sys
+from array import array
+
+import dice.elements
+from dice.elements import (
+    Element,
+    Faces,
+    Integer,
+    IntegerList,
+    RandomElement,
+    Roll,
+    Variable,
+)
+
+try:
+    import msgpack
+except ImportError:  # nocover
+    msgpack = None
+
+FORMAT = "dice"
+VERSION = 1
+
+# Dice arrays at least this long are packed by default
+PACK_THRESHOLD = 64
+
+
+def element_class(kind):
+    for cls in RandomElement.DICE_MAP.values():
+        if cls.__name__ == kind:
+            return cls
+
+    cls = getattr(dice.elements, kind, None)
+
+    if not (isinstance(cls, type) and issubclass(cls, Element)):
+        raise ValueError("Unknown element kind: %s" % kind)
+
+    return cls
+
+
+def dump_element(element, spans=False):
+    """Converts an element tree into plain values"""
+    if not isinstance(element, Element) or isinstance(element, Integer):
+        return int(element)
+    elif isinstance(element, Variable):
+        node = {"k": "Variable", "n": element.name}
+    elif isinstance(element, Faces):
+        node = {"k": "Faces", "f": [list(face) for face in element.faces]}
+    else:
+        node = {
+            "k": element.__class__.__name__,
+            "o": [dump_element(x, spans) for x in element.original_operands],
+        }
+
+    if isinstance(element, RandomElement):
+        default = element.__class__(*element.original_operands)
+
+        if default.min_value != element.min_value:
+            node["min"] = dump_element(element.min_value, spans)
+        if default.max_value != element.max_value:
+            node["max"] = dump_element(element.max_value, spans)
+
+    if spans and hasattr(element, "end"):
+        node["s"] = [element.location, element.end]
+
+    return node
+
+
+def load_element(node, source=None):
+    """Rebuilds an element tree from the output of dump_element()"""
+    if isinstance(node, int):
+        element, node = Integer(node), {}
+    elif node["k"] == "Variable":
+        element = Variable(node["n"])
+    elif node["k"] == "Faces":
+        element = Faces(*node["f"])
+    else:
+        cls = element_class(node["k"])
+        element = cls(*[load_element(x, source) for x in node["o"]])
+
+        if "min" in node:
+            element.min_value = load_element(node["min"], source)
+        if "max" in node:
+            element.max_value = load_element(node["max"], source)
+
+    # Negate() passes integers through, so the element may not be our own
+    if isinstance(element, Element):
+        location, end = node.get("s", (0, 0))
+        string = source if source is not None else str(element)
+        element.set_parse_attributes(string, location, ())
+        element.end = end
+
+    return element
+
+
+def pack_dice(values):
+    """Packs a list of dice into little-endian 64-bit integers"""
+    packed = array("q", values)
+    if sys.byteorder != "little":  # nocover
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def dice_array(data):
+    """Returns the dice in a dumped result, without copying packed bytes"""
+    if isinstance(data, dict):
+        data = data.get("d", data)
+    if isinstance(data, list):
+        return data
+
+    packed = data["q"]
+    if isinstance(packed, str):
+        packed = base64.b64decode(packed)
+
+    if sys.byteorder != "little":  # nocover
+        swapped = array("q", packed)
+        swapped.byteswap()
+        return memoryview(swapped)
+
+    return memoryview(packed).cast("q")
+
+
+def dump_dice(values, packed=None, binary=False):
+    if packed is None:
+        packed = len(values) >= PACK_THRESHOLD
+
+    if packed:
+        try:
+            data = pack_dice(values)
+        except OverflowError:
+            return [int(x) for x in values]
+        return {"q": data if binary else base64.b64encode(data).decode("ascii")}
+
+    return [int(x) for x in values]
+
+
+def dump_result(result, spans=False, packed=None, binary=False):
+    """Converts the result of an evaluation into plain values"""
+    if not isinstance(result, IntegerList):
+        return int(result)
+
+    node = {
+        "k": result.__class__.__name__,
+        "d": dump_dice(result, packed, binary),
+    }
+
+    if isinstance(result, Roll):
+        node["e"] = dump_element(result.random_element, spans)
+
+        if result.force_extreme is not None:
+            node["x"] = result.force_extreme
+
+    return node
+
+
+def load_result(node, source=None):
+    """Rebuilds a result from the output of dump_result()"""
+    if isinstance(node, int):
+        return Integer(node)
+
+    cls = element_class(node["k"])
+    values = dice_array(node)
+
+    if issubclass(cls, Roll):
+        element = load_element(node["e"], source)
+        return cls(element, rolled=list(values), force_extreme=node.get("x"))
+
+    return cls(values)
+
+
+def document(data, kind, source=None):
+    doc = {"format": FORMAT, "version": VERSION, "type": kind, "data": data}
+    if source is not None:
+        doc["source"] = source
+    return doc
+
+
+def dump(obj, source=None, spans=False, packed=None, binary=False):
+    """Converts an element tree or result into a versioned document"""
+    if isinstance(obj, (IntegerList, int)):
+        data = dump_result(obj, spans, packed, binary)
+        return document(data, "result", source)
+
+    return document(dump_element(obj, spans), "element", source)
+
+
+def load(doc):
+    """Rebuilds an element tree or result from a versioned document"""
+    if doc.get("format") != FORMAT:
+        raise ValueError("Not a serialized dice document")
+    elif doc.get("version") != VERSION:
+        raise ValueError("Unsupported document version: %s" % doc.get("version"))
+
+    source = doc.get("source")
+
+    if doc["type"] == "element":
+        return load_element(doc["data"], source)
+    elif doc["type"] == "result":
+        return load_result(doc["data"], source)
+
+    raise ValueError("Unknown document type: %s" % doc["type"])
+
+
+def require_msgpack():
+    if msgpack is None:
+        raise ImportError("The msgpack package is required for MessagePack support")
+    return msgpack
+
+
+def dumps(obj, format="json", **kwargs):
+    """Serializes an element tree or result as JSON or MessagePack"""
+    if format == "json":
+        return json.dumps(dump(obj, **kwargs), separators=(",", ":"))
+    elif format == "msgpack":
+        packer = require_msgpack()
+        return packer.packb(dump(obj, binary=True, **kwargs), use_bin_type=True)
+    raise ValueError("Unknown format: %s" % format)
+
+
+def loads(data, format="json"):
+    """Deserializes an element tree or result from JSON or MessagePack"""
+    if format == "json":
+        return load(json.loads(data))
+    elif format == "msgpack":
+        return load(require_msgpack().unpackb(data, raw=False))
+    raise ValueError("Unknown format: %s" % format)
@@ -0,0 +1,561 @@
+"""
+A pre-forking roll server speaking JSON lines
+
+    python -m dice.server --port 8790 --workers 4
+
+Each request is one JSON object on its own line, and each response is one
+line in the same order:
+
+    {"id": 1, "expr": "1d20 + {mod}", "bindings": {"mod": 3}}
+    {"id": 1, "result": 17}
+
+``op`` selects what to do: "roll" (the default), "min", "max",
+"distribution" or "metrics". Rolls may give a ``repeat`` count. Errors are
+returned as ``{"id": ..., "error": "..."}`` and the connection stays open.
+
+The listening socket is bound once and shared by forked workers, which
+share two blocks of memory: a cache of parsed expressions and
+distributions, serialized with dice.serialize, so an expression is only
+parsed by the first worker to see it; and the request counters and
+latency histogram of every worker, summed by the "metrics" op.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+from multiprocessing import shared_memory
+
+import dice.serialize
+import dice.stats
+from dice.constants import TEMPLATE_CACHE_SIZE, DiceExtreme
+from dice.diagnostics import Diagnostic
+from dice.elements import IntegerList
+from dice.exceptions import DiceBaseException
+from dice.template import Template
+from dice.utilities import classname
+
+# The number of entries and bytes per entry of the shared cache
+CACHE_SLOTS = 4096
+SLOT_SIZE = 4096
+
+# The most rolls a single request may ask for
+MAX_REPEAT = 1000
+
+# The longest a distribution may take to compute, in seconds
+DISTRIBUTION_SECONDS = 2.0
+
+# Upper bounds of the request latency histogram, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+EXTREMES = {"min": DiceExtreme.EXTREME_MIN, "max": DiceExtreme.EXTREME_MAX}
+
+
+class SharedCache:
+    """
+    A direct-mapped cache of bytes in shared memory
+
+    Each slot holds a header (sequence number, length, key hash) and the key
+    followed by the value. Writers take a lock and make the sequence number
+    odd while writing; readers take no lock and treat a slot whose sequence
+    number was odd or changed while it was copied as a miss.
+    """
+
+    HEADER = struct.Struct("<IIQ")
+    KEY_LENGTH = struct.Struct("<H")
+
+    def __init__(self, slots=CACHE_SLOTS, slot_size=SLOT_SIZE, lock=None):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.memory = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        self.lock = multiprocessing.Lock() if lock is None else lock
+
+    @staticmethod
+    def digest(key):
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def locate(self, key):
+        digest = self.digest(key)
+        return digest, (digest % self.slots) * self.slot_size
+
+    def get(self, key):
+        """Returns the bytes stored for a key, or None"""
+        digest, offset = self.locate(key)
+        buf = self.memory.buf
+        sequence, length, stored = self.HEADER.unpack_from(buf, offset)
+
+        if sequence & 1 or stored != digest or not length:
+            return None
+
+        start = offset + self.HEADER.size
+        payload = bytes(buf[start : start + length])
+
+        if self.HEADER.unpack_from(buf, offset)[0] != sequence:
+            return None
+
+        (key_length,) = self.KEY_LENGTH.unpack_from(payload)
+        value_start = self.KEY_LENGTH.size + key_length
+
+        if payload[self.KEY_LENGTH.size : value_start] != key:
+            return None
+
+        return payload[value_start:]
+
+    def set(self, key, value):
+        """Stores a value, replacing whatever used its slot; False if too large"""
+        payload = self.KEY_LENGTH.pack(len(key)) + key + value
+
+        if len(payload) > self.slot_size - self.HEADER.size:
+            return False
+
+        digest, offset = self.locate(key)
+        buf = self.memory.buf
+        start = offset + self.HEADER.size
+
+        with self.lock:
+            sequence, length, stored = self.HEADER.unpack_from(buf, offset)
+            self.HEADER.pack_into(buf, offset, sequence + 1, length, stored)
+            buf[start : start + len(payload)] = payload
+            self.HEADER.pack_into(buf, offset, sequence + 2, len(payload), digest)
+
+        return True
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+class SharedMetrics:
+    """Request counters of each worker in shared memory, summed when read"""
+
+    FIELDS = (
+        "requests",
+        "errors",
+        "local_hits",
+        "shared_hits",
+        "parses",
+        "latency_sum",
+    ) + tuple("latency_le_%s" % bound for bound in LATENCY_BUCKETS)
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.record = struct.Struct("<%id" % len(self.FIELDS))
+        self.index = {name: i for i, name in enumerate(self.FIELDS)}
+        size = max(self.record.size * workers, 1)
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.started = time.time()
+
+    def add(self, worker, name, value=1):
+        # Only one process writes to each worker's record, so no lock is needed
+        offset = worker * self.record.size + self.index[name] * 8
+        (current,) = struct.unpack_from("<d", self.memory.buf, offset)
+        struct.pack_into("<d", self.memory.buf, offset, current + value)
+
+    def observe(self, worker, seconds, error=False):
+        self.add(worker, "requests")
+        self.add(worker, "latency_sum", seconds)
+
+        if error:
+            self.add(worker, "errors")
+
+        for bound in LATENCY_BUCKETS:
+            if seconds <= bound:
+                self.add(worker, "latency_le_%s" % bound)
+
+    def totals(self):
+        totals = [0.0] * len(self.FIELDS)
+
+        for worker in range(self.workers):
+            record = self.record.unpack_from(self.memory.buf, worker * self.record.size)
+            totals = [a + b for a, b in zip(totals, record)]
+
+        return dict(zip(self.FIELDS, totals))
+
+    def to_dict(self):
+        totals = self.totals()
+        uptime = time.time() - self.started
+        requests = totals["requests"]
+
+        return {
+            "workers": self.workers,
+            "uptime": uptime,
+            "requests": int(requests),
+            "errors": int(totals["errors"]),
+            "local_hits": int(totals["local_hits"]),
+            "shared_hits": int(totals["shared_hits"]),
+            "parses": int(totals["parses"]),
+            "requests_per_second": requests / uptime if uptime else 0.0,
+            "mean_latency": totals["latency_sum"] / requests if requests else 0.0,
+            "latency_buckets": {
+                str(bound): int(totals["latency_le_%s" % bound])
+                for bound in LATENCY_BUCKETS
+            },
+        }
+
+    def to_prometheus(self, prefix="dice_server"):
+        """Formats the metrics in the Prometheus text exposition format"""
+        totals = self.totals()
+        lines = []
+
+        def metric(name, value, help_text, kind="counter"):
+            name = "%s_%s" % (prefix, name)
+            lines.append("# HELP %s %s" % (name, help_text))
+            lines.append("# TYPE %s %s" % (name, kind))
+            lines.append("%s %s" % (name, value))
+
+        metric("errors_total", int(totals["errors"]), "Requests that failed")
+        metric("parses_total", int(totals["parses"]), "Expressions parsed")
+        metric(
+            "shared_hits_total",
+            int(totals["shared_hits"]),
+            "Expressions loaded from the shared cache",
+        )
+
+        name = "%s_request_seconds" % prefix
+        lines.append("# HELP %s Time taken to answer requests" % name)
+        lines.append("# TYPE %s histogram" % name)
+
+        for bound in LATENCY_BUCKETS:
+            count = int(totals["latency_le_%s" % bound])
+            lines.append('%s_bucket{le="%s"} %s' % (name, bound, count))
+
+        lines.append('%s_bucket{le="+Inf"} %s' % (name, int(totals["requests"])))
+        lines.append("%s_sum %s" % (name, totals["latency_sum"]))
+        lines.append("%s_count %s" % (name, int(totals["requests"])))
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    """
+    Raises TimeoutError in the block once ``seconds`` have passed. There is
+    no limit off the main thread or where interval timers are unsupported.
+    """
+    if (
+        not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def expired(signum, frame):
+        raise TimeoutError()
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def json_result(result):
+    if isinstance(result, IntegerList):
+        return [int(x) for x in result]
+    return int(result)
+
+
+class RollService:
+    """Answers requests for one worker, using the shared cache"""
+
+    def __init__(
+        self,
+        cache,
+        metrics,
+        worker=0,
+        cache_size=TEMPLATE_CACHE_SIZE,
+        distribution_seconds=DISTRIBUTION_SECONDS,
+    ):
+        self.cache = cache
+        self.metrics = metrics
+        self.worker = worker
+        self.templates = {}
+        self.cache_size = cache_size
+        self.distribution_seconds = distribution_seconds
+
+    def template(self, expression):
+        """Returns a Template from the local cache, the shared cache or a parse"""
+        template = self.templates.get(expression)
+
+        if template is not None:
+            self.metrics.add(self.worker, "local_hits")
+            return template
+
+        key = b"tree:" + expression.encode()
+        data = self.cache.get(key)
+
+        if data is not None:
+            docs = json.loads(data)
+            elements = [dice.serialize.load(doc) for doc in docs]
+            template = Template.from_elements(expression, elements)
+            self.metrics.add(self.worker, "shared_hits")
+        else:
+            template = Template(expression)
+            self.metrics.add(self.worker, "parses")
+            docs = [
+                dice.serialize.dump(element, expression, spans=True)
+                for element in template.elements
+            ]
+            self.cache.set(key, json.dumps(docs, separators=(",", ":")).encode())
+
+        if len(self.templates) >= self.cache_size:
+            del self.templates[next(iter(self.templates))]
+
+        self.templates[expression] = template
+        return template
+
+    def distribution(self, expression):
+        """Returns [[value, probability], ...] from the shared cache or stats"""
+        key = b"dist:" + expression.encode()
+        data = self.cache.get(key)
+
+        if data is not None:
+            self.metrics.add(self.worker, "shared_hits")
+            return json.loads(data)
+
+        template = self.template(expression)
+
+        # Computing a distribution can take far longer than rolling it
+        try:
+            with time_limit(self.distribution_seconds):
+                dist = dice.stats.distribution_of(template.elements[0])
+        except TimeoutError:
+            msg = "Distribution takes longer than %g seconds to compute"
+            raise ValueError(msg % self.distribution_seconds)
+
+        pairs = [list(x) for x in dist.sorted()]
+        self.cache.set(key, json.dumps(pairs, separators=(",", ":")).encode())
+        return pairs
+
+    def roll(self, request, **kwargs):
+        template = self.template(request["expr"])
+        repeat = request.get("repeat")
+        bindings = request.get("bindings")
+
+        # Expressions that cannot succeed are rejected before rolling
+        if kwargs.get("force_extreme") is None:
+            diagnostics = template.check(bindings or {})
+
+            if diagnostics:
+                raise diagnostics[0].exception()
+
+        if repeat is None:
+            return json_result(template.roll(bindings, **kwargs))
+
+        if (
+            isinstance(repeat, bool)
+            or not isinstance(repeat, int)
+            or not 0 < repeat <= MAX_REPEAT
+        ):
+            raise ValueError("repeat must be between 1 and %i" % MAX_REPEAT)
+
+        return [json_result(template.roll(bindings, **kwargs)) for i in range(repeat)]
+
+    def handle(self, request):
+        """Returns the response to a decoded request"""
+        response = {"id": request.get("id")}
+        op = request.get("op", "roll")
+
+        try:
+            if op == "metrics":
+                response["result"] = self.metrics.to_dict()
+            elif "expr" not in request:
+                raise ValueError("Missing expression")
+            elif not isinstance(request["expr"], str):
+                raise ValueError("expr must be a string")
+            elif not isinstance(request.get("bindings", {}), (dict, type(None))):
+                raise ValueError("bindings must be an object")
+            elif op == "roll":
+                response["result"] = self.roll(request)
+            elif op in EXTREMES:
+                response["result"] = self.roll(request, force_extreme=EXTREMES[op])
+            elif op == "distribution":
+                response["result"] = self.distribution(request["expr"])
+            else:
+                raise ValueError("Unknown op: %s" % op)
+        except DiceBaseException as e:
+            response["error"] = str(e)
+            response["location"] = e.loc
+            response["code"] = Diagnostic.from_exception(e).code
+        except (NotImplementedError, TypeError, ValueError) as e:
+            response["error"] = str(e)
+        except Exception as e:
+            # Such as RecursionError, for expressions nested too deeply
+            response["error"] = "%s: %s" % (classname(e), e)
+            response["code"] = "invalid"
+
+        return response
+
+    def handle_line(self, line):
+        """Answers one line of the protocol, returning the encoded response"""
+        start = time.perf_counter()
+
+        try:
+            request = json.loads(line)
+
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object")
+        except ValueError as e:
+            response = {"id": None, "error": "Invalid request: %s" % e}
+        else:
+            response = self.handle(request)
+
+        data = json.dumps(response, separators=(",", ":")).encode() + b"\n"
+        seconds = time.perf_counter() - start
+        self.metrics.observe(self.worker, seconds, "error" in response)
+        return data
+
+    async def serve_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+                elif not line.strip():
+                    continue
+
+                writer.write(self.handle_line(line))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def bind(host="127.0.0.1", port=0, path=None):
+    """Creates the listening socket shared by all workers"""
+    if path is not None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+
+    sock.listen(128)
+    sock.setblocking(False)
+    return sock
+
+
+async def start_server(service, sock):
+    """Serves a bound socket with asyncio, returning the asyncio server"""
+    if sock.family == getattr(socket, "AF_UNIX", None):
+        return await asyncio.start_unix_server(service.serve_client, sock=sock)
+    return await asyncio.start_server(service.serve_client, sock=sock)
+
+
+def run_worker(sock, cache, metrics, worker):
+    service = RollService(cache, metrics, worker)
+
+    async def serve():
+        server = await start_server(service, sock)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def serve(host="127.0.0.1", port=0, path=None, workers=1, announce=None):
+    """Binds a socket and serves it, forking workers if there is more than one"""
+    sock = bind(host, port, path)
+    cache = SharedCache()
+    metrics = SharedMetrics(workers)
+    children = []
+
+    if announce is not None:
+        announce(sock.getsockname())
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        if workers <= 1 or not hasattr(os, "fork"):
+            run_worker(sock, cache, metrics, 0)
+            return
+
+        for worker in range(workers):
+            pid = os.fork()
+
+            if pid == 0:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                # Forked workers would otherwise roll the same numbers
+                random.seed()
+
+                try:
+                    run_worker(sock, cache, metrics, worker)
+                finally:
+                    os._exit(0)
+
+            children.append(pid)
+
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ChildProcessError, ProcessLookupError):
+                pass
+
+        sock.close()
+        cache.close()
+        cache.unlink()
+        metrics.close()
+        metrics.unlink()
+
+        if path is not None and os.path.exists(path):
+            os.unlink(path)
+
+
+parser = argparse.ArgumentParser(
+    prog="dice-server", description="Serve dice rolls as JSON lines."
+)
+parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+parser.add_argument("-p", "--port", type=int, default=8790, help="Port to listen on.")
+parser.add_argument("-u", "--unix", metavar="PATH", help="Listen on a Unix socket.")
+parser.add_argument(
+    "-w", "--workers", type=int, default=1, help="Number of worker processes."
+)
+
+
+def main(args=None):
+    """Run the roll server from a command line interface"""
+    args = parser.parse_args(args=args)
+
+    def announce(address):
+        if isinstance(address, tuple):
+            address = "%s:%s" % address[:2]
+        print("Listening on %s" % address, flush=True)
+
+    serve(args.host, args.port, args.unix, args.workers, announce)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
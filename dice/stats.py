@@ -0,0 +1,566 @@
+"""
+Exact probability distributions of dice expressions
+
+distribution() computes the probability of every possible value of an
+expression's result (lists are counted by their total), without rolling any
+dice:
+
+    >>> dist = dice.stats.distribution("3d6")
+    >>> dist.mean()
+    10.5
+
+Elements are handled by functions registered with distribution_of.register();
+elements without one raise NotImplementedError.
+"""
+
+import functools
+import math
+import operator
+
+from pyparsing import ParseBaseException
+
+import dice.grammar
+from dice.constants import MAX_EXPLOSIONS
+from dice.elements import (
+    Add,
+    Element,
+    Explode,
+    FaceDice,
+    Highest,
+    Lowest,
+    Middle,
+    Mul,
+    Negate,
+    RandomElement,
+    Sub,
+    SuccessFail,
+    Successes,
+    Total,
+    WildDice,
+)
+from dice.exceptions import DiceBaseException
+
+
+class Distribution(dict):
+    """Maps each possible value to its probability"""
+
+    @classmethod
+    def constant(cls, value):
+        return cls({value: 1.0})
+
+    @classmethod
+    def uniform(cls, min_value, max_value):
+        probability = 1.0 / (max_value - min_value + 1)
+        return cls((v, probability) for v in range(min_value, max_value + 1))
+
+    @classmethod
+    def weighted(cls, weighted):
+        """Values with probabilities proportional to their weights"""
+        total = sum(weight for value, weight in weighted)
+        return cls((value, weight / total) for value, weight in weighted)
+
+    @classmethod
+    def mixture(cls, weighted):
+        """Combines (probability, distribution) pairs into one distribution"""
+        ret = cls()
+        for weight, dist in weighted:
+            for value, p in dist.items():
+                ret[value] = ret.get(value, 0.0) + weight * p
+        return ret
+
+    @classmethod
+    def binomial(cls, n, p):
+        """The number of successes in n trials with probability p each"""
+        return cls.trinomial(n, p, 0.0)
+
+    @classmethod
+    def trinomial(cls, n, p, q):
+        """
+        The number of successes minus the number of failures in n trials,
+        each a success with probability p or a failure with probability q.
+        """
+        ret = cls()
+        log_n = math.lgamma(n + 1)
+        max_failures = n if q > 0 else 0
+
+        for successes in range(n + 1 if p > 0 else 1):
+            for failures in range(min(max_failures, n - successes) + 1):
+                others = n - successes - failures
+                log_p = (
+                    log_n
+                    - math.lgamma(successes + 1)
+                    - math.lgamma(failures + 1)
+                    - math.lgamma(others + 1)
+                    + log_power(p, successes)
+                    + log_power(q, failures)
+                    + log_power(1.0 - p - q, others)
+                )
+                if log_p == -math.inf:
+                    continue
+
+                value = successes - failures
+                ret[value] = ret.get(value, 0.0) + math.exp(log_p)
+
+        return ret
+
+    def combine(self, other, function):
+        """The distribution of function(x, y) for independent x and y"""
+        ret = type(self)()
+        for x, p in self.items():
+            for y, q in other.items():
+                value = function(x, y)
+                ret[value] = ret.get(value, 0.0) + p * q
+        return ret
+
+    def map(self, function):
+        ret = type(self)()
+        for x, p in self.items():
+            value = function(x)
+            ret[value] = ret.get(value, 0.0) + p
+        return ret
+
+    def __add__(self, other):
+        return self.combine(other, operator.add)
+
+    def __sub__(self, other):
+        return self.combine(other, operator.sub)
+
+    def __mul__(self, other):
+        return self.combine(other, operator.mul)
+
+    def __neg__(self):
+        return self.map(operator.neg)
+
+    def repeat(self, n):
+        """The distribution of the sum of n independent copies"""
+        ret = type(self).constant(0)
+        base = self
+
+        while n > 0:
+            if n & 1:
+                ret = ret + base
+            n >>= 1
+            if n:
+                base = base + base
+
+        return ret
+
+    def normalized(self):
+        total = sum(self.values())
+        return type(self)((v, p / total) for v, p in self.items())
+
+    def min(self):
+        return min(self)
+
+    def max(self):
+        return max(self)
+
+    def mean(self):
+        return sum(v * p for v, p in self.items())
+
+    def variance(self):
+        mean = self.mean()
+        return sum((v - mean) ** 2 * p for v, p in self.items())
+
+    def stdev(self):
+        return math.sqrt(self.variance())
+
+    def probability(self, value):
+        return self.get(value, 0.0)
+
+    def chance(self, low, high):
+        """The probability of a result between low and high"""
+        return sum(p for v, p in self.items() if low <= v <= high)
+
+    def between(self, low, high):
+        """The distribution of a result given that it is between low and high"""
+        return type(self)(
+            (v, p) for v, p in self.items() if low <= v <= high
+        ).normalized()
+
+    def cdf(self, value):
+        """The probability of a result less than or equal to value"""
+        return sum(p for v, p in self.items() if v <= value)
+
+    def sorted(self):
+        return sorted(self.items())
+
+
+def log_power(x, k):
+    """log(x ** k), with 0 ** 0 == 1"""
+    if k == 0:
+        return 0.0
+    elif x <= 0:
+        return -math.inf
+    return k * math.log(x)
+
+
+def constant_value(dist, element, description):
+    """Returns the only value of a distribution, or raises NotImplementedError"""
+    if len(dist) != 1:
+        raise NotImplementedError(
+            "%s of %s must not be random to compute a distribution"
+            % (description, element)
+        )
+    return next(iter(dist))
+
+
+def mixture_over(dist, function):
+    """The mixture of function(value) weighted by each value's probability"""
+    return Distribution.mixture((p, function(value)) for value, p in dist.items())
+
+
+def bounds(element):
+    """Distributions of the amount, min_value and max_value of dice"""
+    return (
+        distribution_of(element.amount),
+        distribution_of(element.min_value),
+        distribution_of(element.max_value),
+    )
+
+
+def pool(element, die):
+    """The distribution of the total of a pool, given a per-die function"""
+    amounts, min_values, max_values = bounds(element)
+
+    def with_sides(min_value, max_value):
+        single = die(min_value, max_value)
+        return mixture_over(amounts, single.repeat)
+
+    return mixture_over(
+        min_values,
+        lambda lo: mixture_over(max_values, lambda hi: with_sides(lo, hi)),
+    )
+
+
+@functools.singledispatch
+def distribution_of(element):
+    """Returns the Distribution of the total of an element's result"""
+    raise NotImplementedError(
+        "Cannot compute the distribution of %s" % element.__class__.__name__
+    )
+
+
+@distribution_of.register(int)
+def _(element):
+    return Distribution.constant(int(element))
+
+
+def faces(element):
+    """The Distribution of a single die with custom faces"""
+    return Distribution.weighted(element.faces.weighted)
+
+
+def dice_mixture(element, function):
+    """The mixture of function(die) over the Distributions of a single die"""
+    if isinstance(element, FaceDice):
+        return function(faces(element))
+
+    amounts, min_values, max_values = bounds(element)
+    return mixture_over(
+        min_values,
+        lambda lo: mixture_over(
+            max_values, lambda hi: function(Distribution.uniform(lo, hi))
+        ),
+    )
+
+
+@distribution_of.register(RandomElement)
+def _(element):
+    return pool(element, Distribution.uniform)
+
+
+@distribution_of.register(FaceDice)
+def _(element):
+    return mixture_over(distribution_of(element.amount), faces(element).repeat)
+
+
+def wild_distribution(amount, min_value, max_value, cap=MAX_EXPLOSIONS):
+    """
+    The distribution of the total of a roll of wild dice.
+
+    The wild die explodes k times with probability (1/faces)^k, then rolls
+    below the highest value. Rolling the lowest value without exploding
+    removes it and the highest other die, or every die one time in
+    ``faces``. Chains of ``cap`` extra dice or more raise an error when
+    rolled, so the distribution is conditioned on shorter chains.
+    """
+    die = Distribution.uniform(min_value, max_value)
+
+    if amount == 0:
+        return Distribution.constant(0)
+    elif min_value == max_value:
+        return die.repeat(amount)
+
+    faces = max_value - min_value + 1
+    lower = Distribution.uniform(min_value, max_value - 1)
+    weighted = []
+
+    if faces > 2:
+        weighted.append(
+            ((faces - 2) / faces, Distribution.uniform(min_value + 1, max_value - 1))
+        )
+
+    weight = (faces - 1) / faces
+
+    for k in range(1, cap):
+        weight /= faces
+
+        if weight < 1e-300:
+            break
+
+        weighted.append((weight, lower + Distribution.constant(k * max_value)))
+
+    others = die.repeat(amount - 1)
+    kept = Lowest.kept(amount - 1, amount - 2)
+    failure = Distribution.mixture(
+        [
+            (1 / faces, Distribution.constant(0)),
+            (1 - 1 / faces, kept_sum(amount - 1, die, kept)),
+        ]
+    )
+
+    return Distribution.mixture(
+        [(1.0, others + Distribution.mixture(weighted)), (1 / faces, failure)]
+    ).normalized()
+
+
+@distribution_of.register(WildDice)
+def _(element):
+    amounts, min_values, max_values = bounds(element)
+    min_value = constant_value(min_values, element, "The lowest face")
+    max_value = constant_value(max_values, element, "The highest face")
+    return mixture_over(amounts, lambda n: wild_distribution(n, min_value, max_value))
+
+
+@distribution_of.register(Total)
+def _(element):
+    return distribution_of(element.original_operands[0])
+
+
+@distribution_of.register(Negate)
+def _(element):
+    return -distribution_of(element.original_operands[0])
+
+
+def fold(element, function):
+    dists = [distribution_of(x) for x in element.original_operands]
+    return functools.reduce(function, dists)
+
+
+@distribution_of.register(Add)
+def _(element):
+    return fold(element, operator.add)
+
+
+@distribution_of.register(Sub)
+def _(element):
+    return fold(element, operator.sub)
+
+
+@distribution_of.register(Mul)
+def _(element):
+    return fold(element, operator.mul)
+
+
+def explode_distribution(
+    min_value, max_value, thresh, cap=MAX_EXPLOSIONS - 2, die=None
+):
+    """
+    The distribution of the total of one exploding die, which is uniform
+    between min_value and max_value unless its Distribution is given.
+
+    A die that explodes k times is the sum of k values at or above the
+    threshold and one below it. Chains longer than ``cap`` extra dice raise
+    an error when rolled, so the distribution is conditioned on not
+    exceeding it.
+    """
+    if die is None:
+        die = Distribution.uniform(min_value, max_value)
+
+    if thresh > max_value:
+        return die
+
+    p = die.chance(thresh, max_value)
+    highs = die.between(thresh, max_value)
+    low = die.between(min_value, thresh - 1)
+
+    weighted = []
+    chain = low
+    weight = 1.0 - p
+
+    for k in range(cap + 1):
+        if weight < 1e-300:
+            break
+        weighted.append((weight, chain))
+        chain = chain + highs
+        weight *= p
+
+    return Distribution.mixture(weighted).normalized()
+
+
+@distribution_of.register(Explode)
+def _(element):
+    roll = element.original_operands[0]
+
+    if not isinstance(roll, RandomElement):
+        raise NotImplementedError("Can only compute explosions of dice")
+    elif isinstance(roll, WildDice):
+        raise NotImplementedError("Cannot compute the distribution of wild dice")
+
+    if len(element.original_operands) > 1:
+        thresh = distribution_of(element.original_operands[1])
+        thresh = constant_value(thresh, element, "The threshold")
+    else:
+        thresh = None
+
+    def die(min_value, max_value, single=None):
+        if min_value == max_value:
+            raise NotImplementedError("Cannot explode one-sided dice")
+        t = max_value if thresh is None else thresh
+        if t <= min_value:
+            raise NotImplementedError("Explosion threshold is too low")
+        return explode_distribution(min_value, max_value, t, die=single)
+
+    if isinstance(roll, FaceDice):
+        single = die(int(roll.min_value), int(roll.max_value), faces(roll))
+        return mixture_over(distribution_of(roll.amount), single.repeat)
+
+    return pool(roll, die)
+
+
+def kept_sum(num, die, kept):
+    """
+    The distribution of the sum of the values at the ``kept`` positions when
+    ``num`` values drawn from ``die`` are sorted.
+
+    Faces are placed from lowest to highest: with j values placed, the
+    number of the remaining values showing the next face is binomial, and
+    the ones that fall within the kept positions are added to the sum. This
+    takes polynomial time in the number of values and faces, rather than
+    enumerating every outcome.
+    """
+    start, stop = kept.start, kept.stop
+
+    # Distributions of the kept sum, by the number of values placed
+    placed = {0: Distribution.constant(0)}
+    tail = 1.0
+    faces = sorted(die.items())
+
+    for i, (value, p) in enumerate(faces):
+        # The chance of this face, given the value is not any lower face
+        q = 1.0 if i == len(faces) - 1 else min(1.0, p / tail)
+        tail -= p
+        new = {}
+
+        for j, sums in placed.items():
+            rest = num - j
+
+            for k in range(rest + 1):
+                weight = math.comb(rest, k) * q**k * (1.0 - q) ** (rest - k)
+
+                if weight == 0.0:
+                    continue
+
+                shift = value * max(0, min(j + k, stop) - max(j, start))
+                target = new.setdefault(j + k, Distribution())
+
+                for total, w in sums.items():
+                    target[total + shift] = target.get(total + shift, 0.0) + w * weight
+
+        placed = new
+
+    return placed.get(num, Distribution.constant(0))
+
+
+@distribution_of.register(Highest)
+@distribution_of.register(Lowest)
+@distribution_of.register(Middle)
+def _(element):
+    roll = element.original_operands[0]
+
+    if not isinstance(roll, RandomElement):
+        raise NotImplementedError("Can only compute the kept values of dice")
+    elif isinstance(roll, WildDice):
+        raise NotImplementedError("Cannot compute the distribution of wild dice")
+
+    if len(element.original_operands) > 1:
+        n = distribution_of(element.original_operands[1])
+        n = constant_value(n, element, "The number of values")
+    else:
+        n = None
+
+    amounts = distribution_of(roll.amount)
+
+    def with_die(die):
+        return mixture_over(
+            amounts, lambda num: kept_sum(num, die, element.kept(num, n))
+        )
+
+    return dice_mixture(roll, with_die)
+
+
+def success_pool(element, counts):
+    """
+    The distribution of a success counting operator, given a function of the
+    number of dice, the Distribution of one die, the threshold and the
+    highest failing value returning the distribution of the count.
+    """
+    roll = element.original_operands[0]
+    thresh = distribution_of(element.original_operands[1])
+    thresh = constant_value(thresh, element, "The threshold")
+
+    if isinstance(roll, int):
+        # Scalars are counted as a single value, which fails on 1
+        return counts(1, Distribution.constant(int(roll)), thresh, 1)
+    elif not isinstance(roll, RandomElement):
+        raise NotImplementedError("Can only count successes of dice")
+    elif isinstance(roll, WildDice):
+        raise NotImplementedError("Cannot compute the distribution of wild dice")
+
+    amounts, min_values, max_values = bounds(roll)
+    min_value = constant_value(min_values, element, "The lowest face")
+    max_value = constant_value(max_values, element, "The highest face")
+
+    if thresh > max_value:
+        raise ValueError("Success threshold higher than roll result.")
+
+    if isinstance(roll, FaceDice):
+        die = faces(roll)
+    else:
+        die = Distribution.uniform(min_value, max_value)
+
+    return mixture_over(amounts, lambda n: counts(n, die, thresh, min_value))
+
+
+@distribution_of.register(Successes)
+def _(element):
+    def counts(n, die, thresh, fail_level):
+        return Distribution.binomial(n, die.chance(thresh, die.max()))
+
+    return success_pool(element, counts)
+
+
+@distribution_of.register(SuccessFail)
+def _(element):
+    def counts(n, die, thresh, fail_level):
+        p = die.chance(thresh, die.max())
+        q = die.chance(die.min(), min(fail_level, thresh - 1))
+        return Distribution.trinomial(n, p, q)
+
+    return success_pool(element, counts)
+
+
+def parse(expression):
+    if isinstance(expression, Element) or isinstance(expression, int):
+        return expression
+
+    try:
+        return dice.grammar.parse_string(expression)[0]
+    except ParseBaseException as e:
+        raise DiceBaseException.from_other(e)
+
+
+def distribution(expression):
+    """Returns the Distribution of an expression string or element tree"""
+    return distribution_of(parse(expression))
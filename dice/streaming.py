@@ -0,0 +1,220 @@
+"""
+Streaming evaluation of huge pools of dice
+
+A roll of a million dice is a list of a million integers, which most
+operators copy. evaluate() finds the result of an expression without ever
+holding a whole pool: dice are drawn in chunks of ``chunk_size``, which pass
+through the operators applied to each die (Negate, ``.+``, ``.-`` and
+``+-``) and are folded into a number by Total, Successes or SuccessFail.
+Streamed pools may hold up to ``max_stream_dice`` dice, with memory
+proportional to the chunk size:
+
+    >>> dice.roll("100000000d1t", stream=True)
+    100000000
+
+chunks() yields the chunks of an expression whose result is a list.
+Elements are handled by functions registered with chunks_of.register() and
+value_of.register(); anything else is evaluated as usual, as a single chunk.
+"""
+
+import functools
+import random
+
+from pyparsing import ParseBaseException
+
+import dice.grammar
+from dice.constants import MAX_STREAM_DICE, STREAM_CHUNK_SIZE, DiceExtreme
+from dice.elements import (
+    AddEvenSubOdd,
+    ArrayAdd,
+    ArraySub,
+    Element,
+    Integer,
+    IntegerList,
+    Negate,
+    RandomElement,
+    SuccessFail,
+    Successes,
+    Total,
+    WildDice,
+    owning,
+    owns_results,
+    total,
+    wants_breakdown,
+)
+from dice.exceptions import DiceBaseException
+from dice.utilities import walk
+
+
+def evaluate_operand(operand, **kwargs):
+    return Element.evaluate_object(operand, Integer, cache=True, **kwargs)
+
+
+@functools.singledispatch
+def chunks_of(element, **kwargs):
+    """Yields the result of an element as lists of at most chunk_size values"""
+    result = Element.evaluate_object(element, cache=True, **kwargs)
+    yield result if isinstance(result, IntegerList) else IntegerList([result])
+
+
+@chunks_of.register(WildDice)
+def _(element, **kwargs):
+    # The wild die depends on every other die
+    return chunks_of.dispatch(object)(element, **kwargs)
+
+
+@chunks_of.register(RandomElement)
+def _(element, **kwargs):
+    amount = evaluate_operand(element.amount, **kwargs)
+    max_dice = kwargs.get("max_stream_dice", MAX_STREAM_DICE)
+
+    if amount > max_dice:
+        msg = "Too many dice! (max is %i)" % max_dice
+        raise element.fatal(msg, code="too-many-dice")
+    elif amount < 0:
+        msg = "Cannot roll less than zero dice!"
+        args = ()
+
+        if not isinstance(element.amount, int):
+            msg += " (%s evaluated to %s)"
+            args = (element.amount, amount)
+
+        raise element.fatal(msg, *args, code="negative-dice")
+    elif amount == 0:
+        yield element.REROLL_CLASS(element, rolled=[])
+        return
+
+    min_value = evaluate_operand(element.min_value, **kwargs)
+    max_value = evaluate_operand(element.max_value, **kwargs)
+
+    if min_value > max_value:
+        raise element.fatal(
+            "Roll must have a valid range (got %s - %s, which evaluated to %i - %i)",
+            element.min_value,
+            element.max_value,
+            min_value,
+            max_value,
+            code="invalid-range",
+        )
+
+    chunk_size = kwargs.get("chunk_size", STREAM_CHUNK_SIZE)
+    force_extreme = kwargs.get("force_extreme")
+    rnd_engine = kwargs.get("random", random)
+
+    for start in range(0, amount, chunk_size):
+        n = min(chunk_size, amount - start)
+
+        if force_extreme is DiceExtreme.EXTREME_MIN:
+            values = [min_value] * n
+        elif force_extreme is DiceExtreme.EXTREME_MAX:
+            values = [max_value] * n
+        else:
+            values = element.sample(n, min_value, max_value, rnd_engine)
+
+        yield element.REROLL_CLASS(element, rolled=values, force_extreme=force_extreme)
+
+
+@chunks_of.register(Negate)
+@chunks_of.register(ArrayAdd)
+@chunks_of.register(ArraySub)
+@chunks_of.register(AddEvenSubOdd)
+def _(element, **kwargs):
+    operand = element.original_operands[0]
+    scalars = [evaluate_operand(x, **kwargs) for x in element.original_operands[1:]]
+
+    # Only sampled chunks are new lists; others may be cached or bound
+    owned = owns_results(kwargs) and isinstance(operand, RandomElement)
+    owned = owned and not isinstance(operand, WildDice)
+
+    for chunk in chunks_of(operand, **kwargs):
+        # Ownership is set around each call, since the caller runs between yields
+        with owning(owned):
+            if not scalars:
+                chunk = element.function(chunk)
+
+            for scalar in scalars:
+                chunk = element.function(chunk, scalar)
+
+        yield chunk
+
+
+@functools.singledispatch
+def value_of(element, **kwargs):
+    """Returns the result of an element that folds a list into a number"""
+    raise NotImplementedError("Cannot stream %s" % element.__class__.__name__)
+
+
+@value_of.register(Total)
+def _(element, **kwargs):
+    operand = element.original_operands[0]
+    return Integer(sum(total(chunk) for chunk in chunks_of(operand, **kwargs)))
+
+
+@value_of.register(Successes)
+@value_of.register(SuccessFail)
+def _(element, **kwargs):
+    if len(element.original_operands) != 2:
+        raise NotImplementedError("Can only stream a single threshold")
+
+    # Pools of plain dice are counted without rolling them
+    max_dice = kwargs.get("max_stream_dice", MAX_STREAM_DICE)
+    pool_kwargs = dict(kwargs, max_dice=max_dice, sample_pools=True)
+
+    if element.sampled_pool(**pool_kwargs) is not None:
+        return element.evaluate(**pool_kwargs)
+
+    operand, thresh = element.original_operands
+    thresh = evaluate_operand(thresh, **kwargs)
+    chunks = chunks_of(operand, **kwargs)
+    return Integer(sum(element.function(chunk, thresh) for chunk in chunks))
+
+
+def stream_values(element, **kwargs):
+    """
+    Streams every element of a tree that folds a list into a number,
+    innermost first, into kwargs["results"]
+    """
+    results = kwargs["results"]
+
+    for child in reversed(list(walk([element]))):
+        if not isinstance(child, Element) or id(child) in results:
+            continue
+
+        try:
+            results[id(child)] = value_of(child, **kwargs)
+        except NotImplementedError:
+            pass
+
+
+def streaming_kwargs(kwargs):
+    kwargs = dict(kwargs)
+    kwargs.setdefault("results", {})
+    kwargs.pop("cache", None)
+    return kwargs
+
+
+def evaluate(element, **kwargs):
+    """
+    Evaluates an element, streaming the pools folded into numbers. Results
+    that are lists are limited to max_dice dice as usual. Evaluations that
+    need every die, such as traces, are not streamed.
+    """
+    if wants_breakdown(kwargs):
+        return element.evaluate_cached(**kwargs)
+
+    kwargs = streaming_kwargs(kwargs)
+    stream_values(element, **kwargs)
+    return element.evaluate_cached(**kwargs)
+
+
+def chunks(expression, **kwargs):
+    """Yields the result of an expression string or element tree in chunks"""
+    if not isinstance(expression, Element):
+        try:
+            expression = dice.grammar.parse_string(expression)[0]
+        except ParseBaseException as e:
+            raise DiceBaseException.from_other(e)
+
+    kwargs = streaming_kwargs(kwargs)
+    stream_values(expression, **kwargs)
+    return chunks_of(expression, **kwargs)
@@ -0,0 +1,143 @@
+"""
+Precompiled expressions
+
+A Template is parsed once and can then be evaluated any number of times with
+different variable bindings, e.g. one template for "1d20 + {str_mod}" serves
+every character sheet:
+
+    >>> attack = dice.compile("1d20 + {str_mod} + {prof}")
+    >>> attack.roll({"str_mod": 3, "prof": 2})
+
+Results are kept in a mapping private to each evaluation instead of on the
+elements, so the parsed tree itself is never changed by evaluating it and
+one template, such as those cached by compile(), can be rolled by several
+threads at once.
+"""
+
+import functools
+
+from pyparsing import ParseBaseException
+
+import dice.diagnostics
+import dice.extremes
+import dice.grammar
+import dice.parallel
+import dice.profiling
+import dice.streaming
+import dice.trace
+import dice.utilities
+from dice.constants import TEMPLATE_CACHE_SIZE, DiceExtreme
+from dice.elements import Element, Variable
+from dice.exceptions import DiceBaseException
+
+
+def evaluator(kwargs):
+    """
+    Returns the function that evaluates an element for these kwargs, taking
+    the ``stream`` and ``parallel`` options out of them
+    """
+    stream = kwargs.pop("stream", False)
+    parallel = kwargs.pop("parallel", False)
+
+    if stream:
+        return dice.streaming.evaluate
+    elif kwargs.get("force_extreme") is not None:
+        return dice.extremes.evaluate_extreme
+    elif parallel:
+        return dice.parallel.evaluate
+    elif kwargs.get("in_place"):
+        # Results are not cached, so operators may reuse them
+        return Element.evaluate_traced
+
+    return Element.evaluate_cached
+
+
+class Template:
+    """A parsed expression, evaluated with a mapping of variable bindings"""
+
+    def __init__(self, string, parser=None):
+        self.string = string
+
+        try:
+            with dice.profiling.phase("compile"):
+                if parser is not None:
+                    self.elements = parser.parse(string, copy=False)
+                else:
+                    self.elements = dice.grammar.parse_string(string)
+        except ParseBaseException as e:
+            raise DiceBaseException.from_other(e)
+
+        self.find_variables()
+
+    @classmethod
+    def from_elements(cls, string, elements):
+        """Creates a template from already parsed elements, e.g. deserialized"""
+        template = cls.__new__(cls)
+        template.string = string
+        template.elements = list(elements)
+        template.find_variables()
+        return template
+
+    def find_variables(self):
+        self.variables = frozenset(
+            element.name
+            for element in dice.utilities.walk(self.elements)
+            if isinstance(element, Variable)
+        )
+
+    def __repr__(self):
+        return "Template({0!r})".format(self.string)
+
+    def check(self, bindings=None, **kwargs):
+        """
+        Returns the Diagnostics of the errors evaluating this template is
+        certain to raise (see dice.diagnostics.check).
+        """
+        if self.variables or kwargs:
+            return dice.diagnostics.check(self.elements, bindings=bindings, **kwargs)
+
+        # Without variables the result never changes
+        diagnostics = getattr(self, "_diagnostics", None)
+
+        if diagnostics is None:
+            diagnostics = self._diagnostics = dice.diagnostics.check(self.elements)
+
+        return diagnostics
+
+    def evaluate(self, bindings=None, single=True, **kwargs):
+        kwargs["results"] = {}
+        stats = dice.profiling.active()
+
+        if stats is not None:
+            dice.trace.observe(kwargs, stats)
+
+        evaluate = evaluator(kwargs)
+
+        with dice.profiling.phase("evaluate"):
+            elements = [
+                evaluate(element, bindings=bindings, **kwargs)
+                for element in self.elements
+            ]
+
+        if single:
+            return dice.utilities.single(elements)
+
+        return elements
+
+    def roll(self, bindings=None, **kwargs):
+        """Evaluates the template with the given variable bindings"""
+        return self.evaluate(bindings, **kwargs)
+
+    def roll_min(self, bindings=None, **kwargs):
+        """Evaluates the template with every die at its lowest value"""
+        return self.evaluate(bindings, force_extreme=DiceExtreme.EXTREME_MIN, **kwargs)
+
+    def roll_max(self, bindings=None, **kwargs):
+        """Evaluates the template with every die at its highest value"""
+        return self.evaluate(bindings, force_extreme=DiceExtreme.EXTREME_MAX, **kwargs)
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile(string):
+    """Returns a (cached) Template for a dice expression"""
+    return Template(string)
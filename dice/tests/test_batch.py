@@ -0,0 +1,68 @@
+import random
+
+from dice import roll_batch
+from dice.constants import DiceExtreme
+from dice.exceptions import DiceException, DiceFatalException
+from dice.template import Template
+
+
+class TestRollBatch:
+    def test_results(self):
+        items = list(roll_batch(["1d1", "2 + 2", "3d1t"]))
+        assert [item.result for item in items] == [[1], 4, 3]
+        assert [item.index for item in items] == [0, 1, 2]
+        assert all(item.ok for item in items)
+
+    def test_repeat(self):
+        (item,) = roll_batch(["1d6"], repeat=10)
+        assert len(item.results) == 10
+
+    def test_errors_are_captured(self):
+        items = list(roll_batch(["1d6", "1d", "d0", "1/0", "2"]))
+        assert [item.ok for item in items] == [True, False, False, False, True]
+        assert isinstance(items[1].error, DiceException)
+        assert isinstance(items[3].error, DiceFatalException)
+        assert items[1].result is None
+        assert [item.diagnostic.code for item in items[1:4]] == [
+            "syntax",
+            "invalid-dice",
+            "division-by-zero",
+        ]
+        assert items[0].diagnostic is None
+
+    def test_unexpected_errors_are_captured(self):
+        nested = "(" * 500 + "1" + ")" * 500
+        items = list(roll_batch(["1d6", nested, "u{x}", "2d1"]))
+        assert [item.ok for item in items] == [True, False, False, True]
+        assert items[1].diagnostic.code == "invalid"
+        assert items[2].diagnostic.code == "unbound-variable"
+        assert items[3].result == [1, 1]
+
+    def test_cache_size(self, monkeypatch):
+        parsed = []
+        monkeypatch.setattr(
+            "dice.batch.Template",
+            lambda string: parsed.append(string) or Template(string),
+        )
+        expressions = ["1", "2", "1", "3", "1", "2"]
+        list(roll_batch(expressions, cache_size=2))
+        assert parsed == ["1", "2", "3", "1", "2"]
+
+    def test_generator(self):
+        def expressions():
+            yield "1d1"
+            raise RuntimeError("should not be reached")
+
+        assert next(roll_batch(expressions())).result == [1]
+
+    def test_shared_random(self):
+        expressions = ["4d6", "1d20 + 4", "4d6"]
+        first = [i.result for i in roll_batch(expressions, random=random.Random(1))]
+        second = [i.result for i in roll_batch(expressions, random=random.Random(1))]
+        assert first == second
+
+    def test_kwargs(self):
+        (item,) = roll_batch(
+            ["1d6 + {x}"], bindings={"x": 10}, force_extreme=DiceExtreme.EXTREME_MAX
+        )
+        assert item.result == 16
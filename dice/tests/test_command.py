@@ -45,3 +45,36 @@ def test_main_error2():
     """Test placing the error on the left"""
     with raises(SystemExit):
         main(["000000000000000000000000000000000000000001d6, d0"])
+
+
+def test_main_batch(capsys):
+    main(["--batch", "--max", "2d1", "3", "1d6"])
+    assert capsys.readouterr().out.split("\n")[:3] == ["[1, 1]", "3", "[6]"]
+
+
+def test_main_batch_error(capsys):
+    with raises(SystemExit):
+        main(["--batch", "--verbose", "d0", "1d1"])
+    assert "1d1: [1]" in capsys.readouterr().out
+
+
+def test_main_verbose_summary(capsys):
+    main(["--verbose", "--max-items", "4", "10d1"])
+    out = capsys.readouterr().out
+    assert "Result: [1, 1, ... 6 more ..., 1, 1]" in out
+    assert "roll 10d1 -> [1, 1, ... 6 more ..., 1, 1]" in out
+
+
+def test_main_verbose_style(capsys):
+    main(["--verbose", "--summary", "counts", "100d1"])
+    assert "Result: {1: 100}" in capsys.readouterr().out
+
+
+def test_main_verbose_all_items(capsys):
+    main(["--verbose", "--max-items", "0", "100d1"])
+    assert "Result: [%s]" % ", ".join(["1"] * 100) in capsys.readouterr().out
+
+
+def test_main_large(capsys):
+    main(["100d1"])
+    assert capsys.readouterr().out == "[%s]\n" % ", ".join(["1"] * 100)
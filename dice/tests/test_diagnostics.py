@@ -0,0 +1,179 @@
+import random
+
+import dice
+from dice import roll, roll_batch
+from dice.diagnostics import Diagnostic, validate
+from dice.exceptions import DiceBaseException, DiceFatalException, Message
+from dice.parser import Parser
+from pytest import mark, raises
+
+
+class Counted:
+    """Counts how many times it is converted to a string"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return "counted"
+
+
+class TestMessage:
+    def test_lazy(self):
+        value = Counted()
+        message = Message("value is %s", value)
+        assert value.count == 0
+        assert str(message) == "value is counted"
+        assert value.count == 1
+
+    def test_no_args(self):
+        assert str(Message("100%")) == "100%"
+        assert Message("a") == "a"
+
+
+class TestValidate:
+    def test_valid(self):
+        assert validate("4d6h3 + 2") == []
+        assert validate("3d6x", parser=Parser()) == []
+
+    def test_syntax(self):
+        (diagnostic,) = validate("3d6 +")
+        assert diagnostic.code == "syntax"
+        assert diagnostic.span == (4, 4)
+
+    def test_codes(self):
+        assert validate("3d0")[0].code == "invalid-dice"
+        assert validate("3d6d6")[0].code == "stacked-dice"
+        assert validate("3d0", parser=Parser())[0].code == "invalid-dice"
+
+    def test_to_dict(self):
+        (diagnostic,) = validate("3d0")
+        assert diagnostic.to_dict() == {
+            "code": "invalid-dice",
+            "message": "Number of sides must be one or more",
+            "location": 2,
+            "end": 2,
+        }
+
+
+class TestFromException:
+    def test_deferred_message(self):
+        with raises(DiceFatalException) as e:
+            roll("(2d6t)x")
+
+        diagnostic = Diagnostic.from_exception(e.value)
+        assert diagnostic.template == "Cannot explode %s"
+        assert diagnostic.message.startswith("Cannot explode ")
+
+    def test_parse_message(self):
+        with raises(DiceBaseException) as e:
+            roll(")5d6")
+
+        (diagnostic,) = validate(")5d6")
+        assert diagnostic.message == "Expected '-'"
+        assert diagnostic.pretty_print() == e.value.pretty_print()
+        (item,) = roll_batch(["1d"])
+        assert item.diagnostic.pretty_print() == item.error.pretty_print()
+
+    def test_evaluation_codes(self):
+        cases = {
+            "1/0": "division-by-zero",
+            "(0-1)d6": "negative-dice",
+            "1d1x": "explode-one-sided",
+            "4d6x1": "explode-threshold",
+            "4d6e7": "success-threshold",
+        }
+
+        for expression, code in cases.items():
+            with raises(DiceBaseException) as e:
+                roll(expression)
+            assert Diagnostic.from_exception(e.value).code == code, expression
+
+    def test_pretty_print(self):
+        with raises(DiceBaseException) as e:
+            roll("3d0")
+
+        diagnostic = Diagnostic.from_exception(e.value)
+        assert diagnostic.pretty_print() == e.value.pretty_print()
+        assert diagnostic.exception().code == "invalid-dice"
+
+
+class TestCheck:
+    @mark.parametrize(
+        "expression,code,location",
+        [
+            ("1d1x", "explode-one-sided", 0),
+            ("4d6x1", "explode-threshold", 4),
+            ("(2d6t)x", "not-a-roll", 0),
+            ("3r", "not-a-roll", 0),
+            ("4d6e7", "success-threshold", 0),
+            ("4d6f7", "success-threshold", 0),
+            ("(0-1)d6", "negative-dice", 0),
+            ("2000000d6", "too-many-dice", 0),
+            ("3d(1-1)", "invalid-range", 0),
+            ("2 + 6 / (2 - 2)", "division-by-zero", 9),
+            ("5 % 0", "division-by-zero", 4),
+            ("3h", "not-a-list", 0),
+            ("3s", "not-a-list", 0),
+        ],
+    )
+    def test_errors(self, expression, code, location):
+        (diagnostic,) = validate(expression)
+        assert diagnostic.code == code
+        assert diagnostic.location == location
+
+        with raises(DiceBaseException) as e:
+            roll(expression)
+
+        assert e.value.loc == location
+
+    @mark.parametrize(
+        "expression",
+        ["4d6h3", "(1d2)d6x2", "3d6x(1d2)", "2 / (1d2)", "{a}d6", "4d6e6", "d6x"],
+    )
+    def test_valid(self, expression):
+        assert validate(expression) == []
+
+    def test_bindings(self):
+        assert validate("{a}d6", bindings={})[0].code == "unbound-variable"
+        assert validate("{a}d6x1", bindings={"a": 2})[0].code == "explode-threshold"
+        assert validate("6 / {a}", bindings={"a": 1}) == []
+
+    def test_several(self):
+        codes = [d.code for d in validate("4d6x1 + 2 / (1 - 1)")]
+        assert codes == ["explode-threshold", "division-by-zero"]
+
+    def test_template(self):
+        template = dice.compile("1d1x + {a}")
+        assert template.check({"a": 1})[0].code == "explode-one-sided"
+        template = dice.compile("1 / 0")
+        assert template.check() is template.check()
+        assert dice.compile("3d6").check() == []
+
+    def test_fuzz(self):
+        rnd = random.Random(43)
+        atoms = ["0", "1", "2", "6", "d1", "d6", "2d6", "(1-1)", "(0-1)", "(1d2)"]
+        operators = ["x", "x1", "x2", "r", "rr", "e6", "e7", "f7", "h", "l1", "t"]
+        operators += ["s", " / ", " % ", " + ", " - ", "d"]
+
+        for i in range(300):
+            string = rnd.choice(atoms)
+
+            for j in range(rnd.randint(1, 3)):
+                operator = rnd.choice(operators)
+
+                # The grammar only allows a few levels of parentheses
+                if operator.endswith(" ") or operator == "d":
+                    string += operator + rnd.choice(atoms)
+                else:
+                    string += operator
+
+            diagnostics = validate(string)
+
+            if not diagnostics or diagnostics[0].code in ("syntax", "invalid-dice"):
+                continue
+
+            # Every error found statically is raised when rolling
+            with raises(DiceBaseException):
+                roll(string)
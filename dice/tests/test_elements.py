@@ -1,11 +1,15 @@
 from dice.constants import DiceExtreme
 from dice.exceptions import DiceException, DiceFatalException
+import copy
 import pickle
 from pytest import raises
 import random
 
 from dice.elements import (
+    FaceDice,
+    Faces,
     Integer,
+    IntegerList,
     Roll,
     WildRoll,
     Dice,
@@ -92,6 +96,21 @@ class TestElements:
 
         assert WildRoll.roll(1, 1, 1) == [1]
 
+    def test_wild_cap(self):
+        class High(random.Random):
+            def random(self):
+                return 0.999999
+
+        with raises(ValueError):
+            WildRoll.roll(2, 1, 2, random=High(), max_explosions=5)
+
+        assert len(WildRoll.roll(2, 1, 2, random=High())) == 21
+
+    def test_wild_seed_compat(self):
+        a = WildRoll.roll(5, 1, 6, random=random.Random(2), seed_compat=True)
+        b = WildRoll.roll(5, 1, 6, random=random.Random(2), seed_compat=True)
+        assert a == b and len(a) >= 5
+
     def test_wild_success(self):
         while True:
             if len(WildRoll.roll(1, 1, 2)) > 1:
@@ -199,6 +218,143 @@ class TestSystemRandom:
         roll("6d6", random=self.sysrandom)
 
 
+class TestReroll:
+    def test_reroll_pool(self):
+        result = roll("10000d6r3", random=random.Random(0))
+        assert len(result) == 10000
+        assert 0 < result.count(1) < 1000
+
+    def test_force_reroll_pool(self):
+        result = roll("10000d6rr3", random=random.Random(0))
+        assert len(result) == 10000 and min(result) == 4
+
+    def test_seed_compat(self):
+        random.seed(4)
+        expected = [x if x > 2 else random.randint(1, 6) for x in roll("20d6")]
+        random.seed(4)
+        assert roll("20d6r2", seed_compat=True) == expected
+
+    def test_extreme(self):
+        assert roll("4d6rr", force_extreme=DiceExtreme.EXTREME_MIN) == [1] * 4
+
+
+class TestFaceDice:
+    def test_parse(self):
+        d = roll("3d{2, 3:2, 7}", raw=True)
+        assert type(d) is FaceDice and d.faces == Faces(2, (3, 2), 7)
+        assert d.min_value == 2 and d.max_value == 7
+        assert str(d) == "3d{2,3:2,7}"
+        assert roll("d{-1,1}", raw=True).faces.weighted == ((-1, 1), (1, 1))
+
+    def test_values(self):
+        result = roll("1000d{2,3,5,7}", random=random.Random(0))
+        assert sorted(set(result)) == [2, 3, 5, 7]
+
+    def test_weights(self):
+        result = roll("10000d{1:3,6}", random=random.Random(0))
+        assert 7000 < result.count(1) < 8000
+        assert result.count(1) + result.count(6) == 10000
+
+    def test_reroll(self):
+        assert min(roll("1000d{1,2,4}rr2", random=random.Random(0))) == 4
+        result = roll("1000d{1,2,4}r", random=random.Random(0), seed_compat=True)
+        assert set(result) == {1, 2, 4} and result.count(1) < 200
+
+    def test_explode(self):
+        result = roll("1000d{1:2,3}x", random=random.Random(0))
+        assert len(result) > 1000 and set(result) == {1, 3}
+
+    def test_extreme(self):
+        assert roll_min("3d{2,5}") == [2] * 3
+        assert roll_max("3d{2,5}") == [5] * 3
+
+    def test_invalid(self):
+        for expr in ("d{1:0}", "3w{1,2}", "3d{1,2}d6"):
+            with raises(DiceFatalException):
+                roll(expr)
+
+
+class TestInPlace:
+    EXPRESSIONS = ["(10d6.+2)s", "-10d6h5", "(20d6a) .- 1", "+-(10d6 s)", "3d6m1, 4d6a"]
+
+    def count_lists(self, monkeypatch, expr, **kwargs):
+        init = IntegerList.__init__
+        calls = []
+
+        def counted(self, *args, **kw):
+            calls.append(self)
+            init(self, *args, **kw)
+
+        monkeypatch.setattr(IntegerList, "__init__", counted)
+        roll(expr, **kwargs)
+        return len(calls)
+
+    def test_same_result(self):
+        for expr in self.EXPRESSIONS:
+            expected = roll(expr, random=random.Random(0))
+            result = roll(expr, random=random.Random(0), in_place=True)
+            assert result == expected and type(result) is type(expected)
+
+    def test_no_copies(self, monkeypatch):
+        assert self.count_lists(monkeypatch, "(10d6.+2)s", in_place=True) == 1
+        assert self.count_lists(monkeypatch, "-(10d6h3)", in_place=True) == 1
+        assert self.count_lists(monkeypatch, "(10d6.+2)s") == 3
+
+    def test_cached_operands(self):
+        element = roll("(10d6 .+ 1)s", raw=True)
+        result = element.evaluate_cached(in_place=True)
+        added = element.original_operands[0].result
+        assert result == sorted(added) and result is not added
+
+    def test_shared_operands(self):
+        bound = IntegerList([3, 1, 2])
+        assert roll("{x}s", bindings={"x": bound}, in_place=True) == [1, 2, 3]
+        assert roll("+-{x}", bindings={"x": bound}, in_place=True) == [-3, -1, 2]
+        assert bound == [3, 1, 2]
+
+    def test_ownership_is_reset(self):
+        assert roll("-(3d1)", in_place=True) == [-1, -1, -1]
+        bound = IntegerList([1, 2, 3])
+        assert roll("(-{x})t", bindings={"x": bound}, stream=True) == -6
+        assert roll("(-{x})t", bindings={"x": bound}, stream=True, in_place=True) == -6
+        assert bound == [1, 2, 3]
+
+    def test_streamed_dice_are_owned(self, monkeypatch):
+        assert self.count_lists(monkeypatch, "(-10d6)t", stream=True) == 2
+        assert (
+            self.count_lists(monkeypatch, "(-10d6)t", stream=True, in_place=True) == 1
+        )
+
+
+class TestIntegerListTotal:
+    def test_running_total(self):
+        values = IntegerList()
+        values.append(3)
+        values.extend([4, 5])
+        values += IntegerList([1, 1])
+        assert values._total == 14 and int(values) == 14
+
+    def test_mutation(self):
+        values = IntegerList([1, 2, 3])
+        assert values.total == 6
+        values[0] = 10
+        assert values.total == 15
+        del values[1]
+        values.insert(0, 2)
+        values.remove(3)
+        values.pop()
+        assert values.total == 2
+        values.clear()
+        assert values.total == 0
+
+    def test_copies(self):
+        values = roll("10d6")
+        total = values.total
+        for clone in (copy.copy(values), copy.deepcopy(values), values.copy()):
+            assert clone.total == total
+        assert pickle.loads(pickle.dumps(values)).total == total
+
+
 class TestPickle:
     for expr in ["-d20", "4d6t", "+-(1,2,3)", "2d20h", "4d6h3s", "4dF - 2", "4*d%"]:
         value = roll(expr, raw=True, single=False)
@@ -0,0 +1,85 @@
+import dice
+from dice.constants import MAX_EXPLOSIONS
+from dice.extremes import Extremes, extremes, increasing
+from pytest import mark, raises
+
+
+@mark.parametrize(
+    "expression, lo, hi",
+    [
+        ("4", 4, 4),
+        ("3d6t", 3, 18),
+        ("d6 - d6", -5, 5),
+        ("2 * d6 + 1", 3, 13),
+        ("-d4 * 2", -8, -2),
+        ("4d6h3t", 3, 18),
+        ("4d6l1t", 1, 6),
+        ("4d6ht", 3, 18),
+        ("(1d4)d6t", 1, 24),
+        ("4d6e5", 0, 4),
+        ("4d6e1", 4, 4),
+        ("3d6rr2t", 9, 18),
+        ("10 / d5", 2, 10),
+        ("(1, 2d6)t", 3, 13),
+        ("(d4 | 2d6)t", 3, 16),
+    ],
+)
+def test_bounds(expression, lo, hi):
+    ext = extremes(expression)
+    assert (ext.lo, ext.hi) == (lo, hi)
+
+
+def test_list():
+    assert extremes("2d6") == Extremes(2, 12, (2, 2), (1, 6))
+    assert extremes("-2d6").items == (-6, -1)
+
+
+def test_explode():
+    cap = MAX_EXPLOSIONS - 2
+    ext = extremes("2d6x")
+    assert ext.lo == 2 and ext.hi == 2 * (cap * 6 + 5)
+    assert ext.count == (2, 2 * (cap + 1))
+
+
+def test_unsupported():
+    for expression in ("2w6", "d6 % 2", "10 / (d6 - 1)", "4d6e7"):
+        with raises(NotImplementedError):
+            extremes(expression)
+
+
+def test_roll_extremes():
+    assert dice.roll_min("1048576d6t - 2") == 1048574
+    assert dice.roll_min("3d6") == [1, 1, 1]
+
+
+def test_roll_extremes_force_every_die():
+    for expression, lo, hi in [
+        ("d6 - d6", 0, 0),
+        ("(d6 - d6), 0", [0, 0], [0, 0]),
+        ("-(3d6)t", -3, -18),
+        ("4d6h3 + 2", 5, 20),
+        ("10d6e5", 0, 10),
+        ("(1d6)d6t", 1, 36),
+    ]:
+        assert dice.roll_min(expression) == lo
+        assert dice.roll_max(expression) == hi
+        assert dice.roll_min(expression, trace=dice.trace.Trace()) == lo
+        assert dice.roll_max(expression, trace=dice.trace.Trace()) == hi
+
+
+def test_increasing():
+    for expression in ("1048576d6t - 2", "4d6h3 + 2", "10d6e5", "3"):
+        assert increasing(dice.roll(expression, raw=True))
+
+    for expression in ("d6 - d6", "-(3d6)t", "(1d6)d6t", "2d6 * 2"):
+        assert not increasing(dice.roll(expression, raw=True))
+
+
+def test_bindings():
+    template = dice.compile("{n}d6t + {bonus}")
+    assert template.roll_max({"n": 2, "bonus": 3}) == 15
+
+
+def test_fallback_errors():
+    with raises(dice.DiceFatalException):
+        dice.roll_min("4d6e7")
@@ -1,8 +1,11 @@
-from pyparsing import Word, opAssoc
-from dice.elements import Integer, Roll, WildRoll, ExplodedRoll
+import random
+
+from pyparsing import ParseBaseException, Word, opAssoc
+from dice.elements import Element, Integer, Roll, WildRoll, ExplodedRoll
 from dice.exceptions import DiceException, DiceFatalException
 from dice import roll, roll_min, roll_max, grammar
-from pytest import raises
+from dice.utilities import children
+from pytest import mark, raises
 
 
 class TestInteger:
@@ -85,6 +88,7 @@ class TestOperators:
     def test_negate(self):
         assert roll("-2") == -2
         assert roll("-(1, 2)") == [-1, -2]
+        assert roll("-(2 + 1)") == -3
 
     def test_aeso(self):
         assert roll("+-1") == -1
@@ -298,3 +302,76 @@ class TestBadPrecedence:
             grammar.operatorPrecedence(
                 grammar.integer, [(Word("0"), 2, None, Integer.parse)]
             )
+
+
+def describe(element):
+    """Every attribute of a tree the grammar sets, for comparing trees"""
+    attrs = tuple(getattr(element, x, None) for x in ("string", "location", "end"))
+    tokens = tuple(
+        describe(x) if isinstance(x, Element) else (type(x).__name__, x)
+        for x in getattr(element, "tokens", ())
+    )
+    operands = tuple(describe(x) for x in children(element))
+    return type(element).__name__, repr(element), str(element), attrs, tokens, operands
+
+
+class TestSimpleExpressions:
+    def full_parse(self, string):
+        try:
+            return list(grammar.expression.parseString(string, parseAll=True))
+        except ParseBaseException:
+            return None
+
+    @mark.parametrize(
+        "string", ["3d6", "d20", " 4D6H3 ", "2d20l1", "4d6^3+2", "10d6 - 2", "4d6h"]
+    )
+    def test_matches(self, string):
+        elements = grammar.parse_simple(string)
+        assert elements is not None
+        assert [describe(x) for x in elements] == [
+            describe(x) for x in self.full_parse(string)
+        ]
+
+    @mark.parametrize("string", ["3d6x", "2d6+1d4", "3d6+{bonus}", "3w6", "1+2"])
+    def test_falls_back(self, string):
+        assert grammar.parse_simple(string) is None
+        assert len(grammar.parse_string(string)) == 1
+
+    def test_errors_fall_back(self):
+        assert grammar.parse_simple("3d0") is None
+        with raises(DiceFatalException):
+            roll("3d0")
+
+    def test_fuzz(self):
+        rnd = random.Random(41)
+        spaces = ["", "", " ", "  ", "\t", "\n"]
+        numbers = ["", "0", "1", "3", "6", "12", "20", "007"]
+        keeps = ["", "", "h", "H", "^", "l", "L", "v", "V", "x"]
+        ops = ["", "", "+", "-", "*", "+-"]
+        matched = 0
+
+        for i in range(3000):
+            parts = [
+                rnd.choice(numbers),
+                rnd.choice("dDdDw"),
+                rnd.choice(numbers),
+                rnd.choice(keeps),
+                rnd.choice(numbers),
+                rnd.choice(ops),
+                rnd.choice(numbers),
+            ]
+            string = "".join(rnd.choice(spaces) + x for x in parts)
+            string += rnd.choice(spaces)
+            elements = grammar.parse_simple(string)
+
+            if elements is None:
+                continue
+
+            matched += 1
+            expected = self.full_parse(string)
+            assert expected is not None, string
+            assert [describe(x) for x in elements] == [
+                describe(x) for x in expected
+            ], string
+
+        assert matched > 500
@@ -0,0 +1,96 @@
+import random
+
+from pytest import raises
+
+from dice import parse_expression
+from dice.exceptions import DiceException, DiceFatalException
+from dice.incremental import IncrementalParser, split_segments
+from dice.utilities import children
+
+SEGMENTS = [
+    "1",
+    "d6",
+    " 4d6h3 ",
+    "(1, 2)",
+    "-d4",
+    "u(d6)",
+    "(2|3)",
+    "6d6x5 + 2",
+    "3d{1,2:3}",
+]
+
+
+def describe(element):
+    ret = [(repr(element), element.location, element.end, element.string)]
+    for child in children(element):
+        ret.extend(describe(child))
+    return ret
+
+
+def assert_same_tree(parser):
+    expected = parse_expression(parser.string)[0]
+    assert describe(parser.tree[0]) == describe(expected)
+
+
+class TestIncrementalParser:
+    def test_split_segments(self):
+        segments, separators = split_segments("1, (2, 3) | 4")
+        assert segments == [(0, 1), (2, 10), (11, 13)]
+        assert separators == [",", "|"]
+
+        assert split_segments("d{1,2}, 3") == ([(0, 6), (7, 9)], [","])
+
+    def test_same_tree(self):
+        rng = random.Random(0)
+        for i in range(50):
+            parts = rng.sample(SEGMENTS, rng.randint(1, 5))
+            string = parts[0]
+            for part in parts[1:]:
+                string += rng.choice(",|") + part
+            assert_same_tree(IncrementalParser(string))
+
+    def test_edit(self):
+        parser = IncrementalParser("1d6, 2d8, 3d10")
+        parser.edit(5, 3, "4d12")
+        assert parser.string == "1d6, 4d12, 3d10"
+        assert_same_tree(parser)
+
+        parser.edit(0, 0, "2 | ")
+        assert parser.string == "2 | 1d6, 4d12, 3d10"
+        assert_same_tree(parser)
+
+    def test_reuse(self):
+        parser = IncrementalParser("1d6, 2d8")
+        cached = dict(parser.cache)
+        parser.edit(8, 0, ", 3")
+        assert all(parser.cache[k] is v for k, v in cached.items())
+        assert parser.tree[0].original_operands[0] is not cached["1d6"]
+
+    def test_errors(self):
+        parser = IncrementalParser("1d6, 2d8")
+
+        with raises(DiceFatalException) as e:
+            parser.edit(5, 3, "2d0")
+        assert e.value.loc == 7 and e.value.pstr == "1d6, 2d0"
+
+        with raises(DiceException) as e:
+            parser.edit(3, 0, ",")
+        assert e.value.pretty_print() == "1d6,, 2d8\n    ^ Expected '-'"
+
+        with raises(ValueError):
+            parser.edit(100, 1, "")
+
+    def test_error_keeps_state(self):
+        parser = IncrementalParser("1d6, 2d8")
+        tree = parser.tree
+
+        with raises(DiceException):
+            parser.edit(0, 0, ")")
+        assert parser.string == "1d6, 2d8" and parser.tree is tree
+        assert_same_tree(parser)
+
+    def test_cache_size(self):
+        parser = IncrementalParser(cache_size=2)
+        for string in ("1", "2", "3"):
+            parser.parse(string)
+        assert list(parser.cache) == ["2", "3"]
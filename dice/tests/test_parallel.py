@@ -0,0 +1,93 @@
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from pytest import raises
+
+from dice import compile, grammar, parallel, roll
+from dice.exceptions import DiceFatalException
+from dice.trace import Trace
+
+
+class RefusingExecutor:
+    def submit(self, *args, **kwargs):
+        raise AssertionError("nothing should be sent to a worker")
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+def roll_parallel(expr, executor, **kwargs):
+    kwargs.setdefault("min_dice", 1000)
+    return roll(expr, parallel=True, executor=executor, **kwargs)
+
+
+class TestEvaluate:
+    def test_array(self):
+        with ThreadPoolExecutor(2) as executor:
+            assert roll_parallel("5000d1t, 5000d1t, 3", executor) == [5000, 5000, 3]
+
+    def test_nested(self):
+        expr = "(5000d1t, 5000d1t) | 5000d1t"
+
+        with ThreadPoolExecutor(2) as executor:
+            assert roll_parallel(expr, executor) == [5000, 5000, 5000]
+
+    def test_bindings(self):
+        with ThreadPoolExecutor(2) as executor:
+            result = roll_parallel("{n}d1t, {n}d1t", executor, bindings={"n": 2000})
+        assert result == [2000, 2000]
+
+    def test_seeded(self):
+        expr = "2000d6t, 2000d6t"
+
+        with ThreadPoolExecutor(2) as executor:
+            threads = roll_parallel(expr, executor, random=random.Random(7))
+
+        with ProcessPoolExecutor(1) as executor:
+            processes = roll_parallel(expr, executor, random=random.Random(7))
+
+        assert threads == processes
+
+    def test_template(self):
+        template = compile("{n}d1t, {n}d1t")
+
+        with CountingExecutor(2) as executor:
+            result = template.roll(
+                {"n": 2000}, parallel=True, executor=executor, min_dice=1000
+            )
+
+        assert result == [2000, 2000]
+        assert executor.submitted == 2
+
+    def test_light_subtrees(self):
+        executor = RefusingExecutor()
+        assert roll_parallel("5000d1t, 3d1t", executor) == [5000, 3]
+        assert roll_parallel("5000d1t", executor) == 5000
+
+    def test_trace(self):
+        executor = RefusingExecutor()
+        assert roll_parallel("5000d1t, 5000d1t", executor, trace=Trace()) == [
+            5000,
+            5000,
+        ]
+
+    def test_error_location(self):
+        with ThreadPoolExecutor(2) as executor:
+            with raises(DiceFatalException) as e:
+                roll_parallel("2000d6t, 2000d6t / (1 - 1)", executor)
+
+        assert e.value.code == "division-by-zero"
+        assert e.value.loc == 20
+
+
+class TestCost:
+    def test_cost(self):
+        assert parallel.cost(grammar.parse_string("3")[0]) == 0
+        assert parallel.cost(grammar.parse_string("4d6 + 2d8")[0]) == 6
+        assert parallel.cost(grammar.parse_string("(1d4)d6")[0]) == 5
+        assert parallel.cost(grammar.parse_string("{n}d6")[0], bindings={"n": 9}) == 9
@@ -0,0 +1,85 @@
+import threading
+
+import dice
+from dice.elements import Dice, RandomElement
+from dice.exceptions import DiceFatalException
+from dice.parser import Parser, local_parser
+from dice.template import Template
+from pytest import raises
+
+
+class MaxDice(Dice):
+    SEPARATOR = "m"
+
+    def evaluate(self, **kwargs):
+        return dice.elements.Roll(self, rolled=[self.max_value] * self.amount)
+
+
+class TestParser:
+    def test_parse(self):
+        parser = Parser()
+        assert dice.roll("4d1 + 2", parser=parser) == 6
+
+    def test_register(self):
+        parser = Parser()
+        parser.register_dice(MaxDice)
+        assert dice.roll("3m6", parser=parser) == [6, 6, 6]
+        assert "m" not in RandomElement.DICE_MAP
+
+        with raises(DiceFatalException):
+            dice.roll("3m6")
+
+        with raises(DiceFatalException):
+            dice.roll("3m6", parser=Parser())
+
+    def test_reregister(self):
+        parser = Parser()
+        with raises(RuntimeError):
+            parser.register_dice(Dice)
+
+    def test_fresh_trees(self):
+        parser = Parser()
+        first = parser.parse("2d6")
+        assert parser.parse("2d6") is not first
+        assert first[0].location == 0
+
+    def test_shared_trees(self, monkeypatch):
+        parser = Parser()
+        cached = parser.parse("(4d1 .+ 1)s", copy=False)
+        assert parser.parse("(4d1 .+ 1)s", copy=False) is cached
+
+        def no_copy(x):
+            raise AssertionError("the tree should not be copied")
+
+        monkeypatch.setattr(dice.parser, "deepcopy", no_copy)
+        assert dice.roll("(4d1 .+ 1)s", parser=parser) == [2] * 4
+        assert dice.roll("(4d1 .+ 1)s", parser=parser, in_place=True) == [2] * 4
+        assert Template("(4d1 .+ 1)s", parser=parser).roll() == [2] * 4
+        assert not any(hasattr(x, "result") for x in dice.utilities.walk(cached))
+
+    def test_cache_size(self):
+        parser = Parser(cache_size=2)
+        for expression in ("1", "2", "3"):
+            parser.parse(expression)
+        assert list(parser.cache) == ["2", "3"]
+
+    def test_template(self):
+        parser = Parser()
+        parser.register_dice(MaxDice)
+        assert Template("2m4", parser=parser).roll() == [4, 4]
+
+
+def test_local_parser():
+    parsers = []
+
+    def run():
+        parsers.append(local_parser())
+        assert local_parser() is parsers[-1]
+
+    threads = [threading.Thread(target=run) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert parsers[0] is not parsers[1]
@@ -0,0 +1,53 @@
+import json
+
+import dice
+from dice import profiling
+from dice.trace import Trace
+
+
+class TestProfile:
+    def test_inactive(self):
+        assert profiling.active() is None
+        assert profiling.phase("parse") is profiling.phase("evaluate")
+
+    def test_phases(self):
+        with profiling.profile() as stats:
+            dice.roll("4d6h3")
+            dice.compile("{n}d6 + 1").roll({"n": 2})
+
+        assert profiling.active() is None
+        assert stats.phases["parse"].calls == 1
+        assert stats.phases["compile"].calls == 1
+        assert stats.phases["evaluate"].calls == 2
+
+    def test_nodes(self):
+        with profiling.profile() as stats:
+            dice.roll("10d6 + 5d4")
+
+        assert stats.nodes["Dice"].calls == 2
+        assert stats.nodes["Add"].seconds >= 0
+        assert stats.dice == 15
+        assert stats.stack == []
+
+    def test_with_trace(self):
+        trace = Trace()
+        with profiling.profile() as stats:
+            dice.roll("2d6", trace=trace)
+            trace.to_text()
+
+        assert len(trace) == 3
+        assert stats.nodes["Dice"].calls == 1
+        assert stats.phases["render"].calls == 1
+
+    def test_export(self):
+        with profiling.profile() as stats:
+            dice.roll("3d6")
+
+        data = json.loads(stats.to_json())
+        assert data["dice"] == 3
+        assert "Dice" in data["nodes"]
+
+        text = stats.to_prometheus()
+        assert "# TYPE dice_phase_seconds_total counter" in text
+        assert 'dice_node_calls_total{kind="Dice"} 1' in text
+        assert "dice_dice_rolled_total 3" in text
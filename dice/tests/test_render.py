@@ -0,0 +1,60 @@
+import io
+
+from pytest import raises
+
+from dice import roll
+from dice.elements import IntegerList
+from dice.render import render, render_items, write
+
+
+class TestRender:
+    def test_short_lists(self):
+        values = IntegerList([3, 1, 2])
+        assert render(values, max_items=3) == str(values) == "[3, 1, 2]"
+        assert render(values) == "[3, 1, 2]"
+
+    def test_edges(self):
+        values = list(range(1, 11))
+        assert render_items(values, 4) == "[1, 2, ... 6 more ..., 9, 10]"
+        assert render_items(values, 1) == "[1, ... 9 more ...]"
+
+    def test_counts(self):
+        values = [2, 1, 2, 6, 2, 1]
+        assert render_items(values, 3, "counts") == "{1: 2, 2: 3, 6: 1}"
+        assert render_items(values, 2, "counts") == "{1: 2, ... 1 more ..., 6: 1}"
+
+    def test_runs(self):
+        values = [1, 1, 1, 4, 5, 5]
+        assert render_items(values, 3, "runs") == "[1*3, 4, 5*2]"
+        assert render_items(values, 2, "runs") == "[1*3, ... 1 more ..., 5*2]"
+
+    def test_unknown_style(self):
+        with raises(ValueError):
+            render_items([1, 2, 3], 2, "histogram")
+
+    def test_total(self):
+        values = IntegerList([1] * 9)
+        int(values)
+        assert str(values).endswith(" -> 9")
+        assert render(values, max_items=2) == "[1, ... 7 more ..., 1] -> 9"
+
+    def test_scalars(self):
+        assert render(roll("3d1t"), max_items=1) == "3"
+
+
+class TestWrite:
+    def write(self, value, **kwargs):
+        file = io.StringIO()
+        write(file, value, **kwargs)
+        return file.getvalue()
+
+    def test_chunks(self):
+        values = roll("1000d6")
+        assert self.write(values, chunk_size=7) == str(values)
+
+    def test_summary(self):
+        values = roll("1000d6")
+        assert self.write(values, max_items=6) == render(values, max_items=6)
+
+    def test_scalars(self):
+        assert self.write(roll("3d1t")) == "3"
@@ -0,0 +1,94 @@
+import random
+
+from pytest import raises
+
+import dice
+from dice.exceptions import DiceFatalException
+from dice.replay import DrawLog, record, replay
+from dice.trace import Trace
+
+
+def recorded(expr, seed=0, **kwargs):
+    return record(expr, source=random.Random(seed), **kwargs)
+
+
+class TestReplay:
+    def test_same_result(self):
+        for expr in ["4d6h3", "10d6x", "(20d10 .+ 1) e 8", "3d{1:2,5}h2", "5d6r1"]:
+            result, log = recorded(expr)
+            assert replay(log) == result
+
+    def test_same_as_seeded_roll(self):
+        result, log = recorded("10d6x", seed=3)
+        assert result == dice.roll("10d6x", random=random.Random(3), breakdown=True)
+
+    def test_breakdown(self):
+        result, log = recorded("4d6h3")
+        trace = Trace()
+        assert replay(log, trace=trace) == result
+        assert [e.kind for e in trace][:2] == ["Highest", "Dice"]
+
+    def test_successes_are_rolled(self):
+        _, log = recorded("(100d10 .+ 1) e 8")
+        assert len(log) >= 100
+
+    def test_bindings(self):
+        result, log = recorded("{n}d6t", bindings={"n": 5})
+        assert replay(log, bindings={"n": 5}) == result
+
+        with raises(DiceFatalException) as e:
+            replay(log, bindings={"n": 6})
+        assert e.value.code == "replay-mismatch"
+
+    def test_node_ids(self):
+        _, log = recorded("1d6 + 1d20")
+        template = dice.compile("1d6 + 1d20")
+        ids = dice.replay.node_ids(template.elements)
+        dice_ids = sorted(ids[id(x)] for x in template.elements[0].original_operands)
+        assert sorted({node for node, _ in log.draws()}) == dice_ids
+
+    def test_big_dice(self):
+        expr = "3d%i" % 10**30
+        result, log = recorded(expr)
+        assert replay(log) == result
+
+    def test_mismatch(self):
+        _, log = recorded("3d6")
+
+        with raises(DiceFatalException) as e:
+            replay(DrawLog("4d6", log.nodes, log.words, log.floats))
+        assert e.value.code == "replay-mismatch"
+
+        with raises(DiceFatalException) as e:
+            replay(DrawLog("2d6", log.nodes, log.words, log.floats))
+        assert e.value.code == "replay-mismatch"
+
+    def test_exhausted_arrays(self):
+        _, log = recorded("3d6")
+
+        with raises(DiceFatalException) as e:
+            replay(DrawLog(log.expression, log.nodes, log.words[:2], log.floats))
+        assert e.value.code == "replay-mismatch"
+
+
+class TestDrawLog:
+    def test_bytes(self):
+        result, log = recorded("10d6x + 3d{1:2,5}")
+        loaded = DrawLog.from_bytes(log.to_bytes())
+        assert loaded == log
+        assert replay(loaded) == result
+
+    def test_invalid_bytes(self):
+        with raises(ValueError):
+            DrawLog.from_bytes(b"\0" * 16)
+
+    def test_truncated_bytes(self):
+        _, log = recorded("3d6 + 1d{1:2,5}")
+        data = log.to_bytes()
+
+        for end in (8, len(data) - 8, len(data) - 1):
+            with raises(ValueError):
+                DrawLog.from_bytes(data[:end])
+
+        with raises(ValueError):
+            DrawLog.from_bytes(data + b"\0")
@@ -0,0 +1,98 @@
+import pickle
+
+from pytest import importorskip, raises
+
+from dice import roll, roll_max, serialize
+from dice.elements import ExplodedRoll, Integer, IntegerList, Roll
+from dice.exceptions import DiceFatalException
+
+EXPRESSIONS = ["-d20", "4d6t", "+-(1,2,3)", "2d20h", "4d6h3s", "4dF - 2", "4*d%"]
+
+
+class TestElements:
+    def test_roundtrip(self):
+        for expr in EXPRESSIONS + [
+            "u(d6)",
+            "2w6x5",
+            "(1,2,3)|4",
+            "6d(6d6)t",
+            "3d{1:2,5}h2",
+        ]:
+            element = roll(expr, raw=True)
+            clone = serialize.loads(serialize.dumps(element))
+            assert repr(clone) == repr(element)
+
+    def test_smaller_than_pickle(self):
+        for expr in EXPRESSIONS:
+            element = roll(expr, raw=True)
+            assert len(serialize.dumps(element)) < len(pickle.dumps(element))
+
+    def test_no_tokens(self):
+        assert "tokens" not in serialize.dumps(roll("4d6h3", raw=True))
+
+    def test_spans(self):
+        expr = "1 / (1 - 1)"
+        data = serialize.dumps(roll(expr, raw=True), source=expr, spans=True)
+        clone = serialize.loads(data)
+        assert clone.string == expr
+        assert clone.original_operands[1].location == 5
+
+        with raises(DiceFatalException) as e:
+            clone.evaluate_cached()
+        assert e.value.loc == 5
+
+    def test_evaluate(self):
+        clone = serialize.loads(serialize.dumps(roll("4d1 + 2", raw=True)))
+        assert clone.evaluate_cached() == 6
+
+
+class TestResults:
+    def test_integer(self):
+        clone = serialize.loads(serialize.dumps(roll("3d6t")))
+        assert isinstance(clone, Integer)
+
+    def test_list(self):
+        clone = serialize.loads(serialize.dumps(roll("1, 2, 3")))
+        assert type(clone) is IntegerList and clone == [1, 2, 3]
+
+    def test_roll(self):
+        result = roll("6d6x")
+        clone = serialize.loads(serialize.dumps(result))
+        assert type(clone) is ExplodedRoll and clone == result
+        assert repr(clone.random_element) == repr(result.random_element)
+
+    def test_force_extreme(self):
+        clone = serialize.loads(serialize.dumps(roll_max("3d6")))
+        assert isinstance(clone, Roll) and clone.force_extreme == "MAX"
+
+    def test_packed(self):
+        result = roll("1000d6")
+        doc = serialize.dump(result)
+        assert "q" in doc["data"]["d"]
+        assert serialize.dice_array(doc["data"]).tolist() == result
+        assert serialize.load(doc) == result
+
+    def test_unpacked(self):
+        doc = serialize.dump(roll("1000d6"), packed=False)
+        assert isinstance(doc["data"]["d"], list)
+
+
+class TestFormats:
+    def test_msgpack(self):
+        msgpack = importorskip("msgpack")
+        result = roll("2000d6")
+        data = serialize.dumps(result, format="msgpack")
+        doc = msgpack.unpackb(data)
+        view = serialize.dice_array(doc["data"])
+        assert isinstance(view, memoryview) and view.tolist() == result
+        assert serialize.loads(data, format="msgpack") == result
+
+    def test_bad_documents(self):
+        with raises(ValueError):
+            serialize.load({"format": "other"})
+        with raises(ValueError):
+            serialize.load({"format": "dice", "version": 0})
+        with raises(ValueError):
+            serialize.load_element({"k": "NotAnElement", "o": []})
+        with raises(ValueError):
+            serialize.dumps(1, format="yaml")
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from dice.server import (
+    SharedCache,
+    SharedMetrics,
+    RollService,
+    bind,
+    start_server,
+)
+
+
+@pytest.fixture
+def shared():
+    cache, metrics = SharedCache(slots=16, slot_size=1024), SharedMetrics(2)
+    yield cache, metrics
+    for block in (cache, metrics):
+        block.close()
+        block.unlink()
+
+
+@pytest.fixture
+def service(shared):
+    return RollService(*shared)
+
+
+class TestSharedCache:
+    def test_get_set(self, shared):
+        cache, _ = shared
+        assert cache.get(b"a") is None
+        assert cache.set(b"a", b"value")
+        assert cache.get(b"a") == b"value"
+        assert cache.set(b"a", b"other")
+        assert cache.get(b"a") == b"other"
+
+    def test_too_large(self, shared):
+        cache, _ = shared
+        assert not cache.set(b"big", b"x" * 2048)
+        assert cache.get(b"big") is None
+
+    def test_collision(self, shared):
+        cache, _ = shared
+        keys = [b"key%i" % i for i in range(64)]
+        for key in keys:
+            cache.set(key, key)
+        assert all(cache.get(key) in (None, key) for key in keys)
+
+
+class TestMetrics:
+    def test_totals(self, shared):
+        _, metrics = shared
+        metrics.observe(0, 0.002)
+        metrics.observe(1, 0.2, error=True)
+        totals = metrics.to_dict()
+        assert totals["requests"] == 2 and totals["errors"] == 1
+        assert totals["latency_buckets"]["0.0025"] == 1
+        assert totals["latency_buckets"]["1.0"] == 2
+
+    def test_prometheus(self, shared):
+        _, metrics = shared
+        metrics.observe(0, 0.002)
+        text = metrics.to_prometheus()
+        assert 'dice_server_request_seconds_bucket{le="+Inf"} 1' in text
+
+
+class TestRollService:
+    def test_roll(self, service):
+        assert service.handle({"id": 1, "expr": "3d1"}) == {"id": 1, "result": [1] * 3}
+        response = service.handle({"expr": "d1 + {x}", "bindings": {"x": 2}})
+        assert response["result"] == 3
+
+    def test_repeat(self, service):
+        assert service.handle({"expr": "1d1t", "repeat": 3})["result"] == [1, 1, 1]
+        assert "error" in service.handle({"expr": "1d1", "repeat": 0})
+        assert "error" in service.handle({"expr": "1d1", "repeat": True})
+
+    def test_extremes(self, service):
+        assert service.handle({"op": "min", "expr": "2d6"})["result"] == [1, 1]
+        assert service.handle({"op": "max", "expr": "2d6"})["result"] == [6, 6]
+
+    def test_distribution(self, service):
+        result = service.handle({"op": "distribution", "expr": "1d2"})["result"]
+        assert result == [[1, 0.5], [2, 0.5]]
+
+    def test_distribution_time_limit(self, shared):
+        service = RollService(*shared, distribution_seconds=0.1)
+        response = service.handle({"op": "distribution", "expr": "200d100"})
+        assert "longer than 0.1 seconds" in response["error"]
+
+    def test_nested_too_deeply(self, service):
+        expr = "(" * 400 + "1" + ")" * 400
+        response = json.loads(service.handle_line(json.dumps({"expr": expr})))
+        assert response["code"] == "invalid"
+        assert response["error"].startswith("RecursionError")
+        assert service.metrics.to_dict()["errors"] == 1
+
+    def test_rejected_before_rolling(self, service):
+        response = service.handle({"id": 3, "expr": "1d1x"})
+        assert response["code"] == "explode-one-sided"
+        assert service.handle({"op": "max", "expr": "3d(1-1)"})["result"] == [0, 0, 0]
+
+    def test_errors(self, service):
+        response = service.handle({"id": 2, "expr": "1d"})
+        assert response["id"] == 2 and response["location"] == 1
+        assert response["code"] == "syntax"
+        assert "error" in service.handle({"op": "nope", "expr": "1"})
+        assert "error" in service.handle({"expr": 5})
+        assert "error" in service.handle({"op": "distribution", "expr": ["1d6"]})
+        assert "error" in service.handle({"expr": "{x}", "bindings": [1]})
+        assert "error" in json.loads(service.handle_line(b'{"expr": 5}'))
+        assert "error" in json.loads(service.handle_line(b"[1]"))
+        assert "error" in json.loads(service.handle_line(b"{"))
+
+    def test_shared_cache(self, shared):
+        first = RollService(*shared, worker=0)
+        second = RollService(*shared, worker=1)
+        first.handle({"expr": "4d6h3"})
+        second.handle({"expr": "4d6h3"})
+        second.handle({"expr": "4d6h3"})
+
+        totals = shared[1].to_dict()
+        assert totals["parses"] == 1
+        assert totals["shared_hits"] == 1 and totals["local_hits"] == 1
+
+
+def test_localhost(service):
+    async def run():
+        sock = bind("127.0.0.1", 0)
+        server = await start_server(service, sock)
+        reader, writer = await asyncio.open_connection(*sock.getsockname()[:2])
+
+        writer.write(b'{"id": 1, "expr": "2d1"}\n\n{"id": 2, "op": "metrics"}\n')
+        first = json.loads(await reader.readline())
+        second = json.loads(await reader.readline())
+
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"id": 1, "result": [1, 1]}
+    assert second["result"]["requests"] == 1
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+def test_prefork():
+    process = subprocess.Popen(
+        [sys.executable, "-m", "dice.server", "--port", "0", "--workers", "2"],
+        stdout=subprocess.PIPE,
+        env=dict(os.environ, PYTHONPATH=os.getcwd()),
+    )
+
+    try:
+        line = process.stdout.readline().decode()
+        host, port = line.split()[-1].rsplit(":", 1)
+
+        async def run():
+            responses = []
+            for i in range(4):
+                reader, writer = await asyncio.open_connection(host, int(port))
+                writer.write(b'{"expr": "10d1"}\n{"op": "metrics"}\n')
+                responses.append(json.loads(await reader.readline()))
+                responses.append(json.loads(await reader.readline()))
+                writer.close()
+            return responses
+
+        responses = asyncio.run(run())
+    finally:
+        process.terminate()
+        process.wait(10)
+
+    assert responses[0]["result"] == [1] * 10
+    metrics = responses[-1]["result"]
+    assert metrics["workers"] == 2 and metrics["requests"] == 7
@@ -0,0 +1,216 @@
+import itertools
+import random
+
+import dice
+from dice.constants import MAX_EXPLOSIONS
+from dice.elements import Highest, Lowest, Middle, WildRoll
+from dice.utilities import verbose_print
+from dice.stats import (
+    Distribution,
+    distribution,
+    explode_distribution,
+    wild_distribution,
+)
+from pytest import approx, mark, raises
+
+
+class TestDistribution:
+    def test_uniform(self):
+        dist = Distribution.uniform(1, 4)
+        assert dist == {1: 0.25, 2: 0.25, 3: 0.25, 4: 0.25}
+        assert dist.mean() == 2.5
+
+    def test_repeat(self):
+        dist = Distribution.uniform(1, 6).repeat(3)
+        assert dist.min() == 3 and dist.max() == 18
+        assert dist.probability(3) == approx(1 / 216)
+        assert sum(dist.values()) == approx(1)
+
+    def test_cdf(self):
+        assert Distribution.uniform(1, 6).cdf(2) == approx(1 / 3)
+
+
+class TestExpressions:
+    def test_arithmetic(self):
+        assert distribution("2d6 + 3").mean() == approx(10)
+        assert distribution("-d4").max() == -1
+        assert distribution("2 * d2") == approx({2: 0.5, 4: 0.5})
+
+    def test_random_amount(self):
+        assert distribution("(d2)d6").mean() == approx(1.5 * 3.5)
+
+    def test_fudge(self):
+        assert distribution("4u1").mean() == approx(0)
+
+    def test_unsupported(self):
+        with raises(NotImplementedError):
+            distribution("4d6xh3")
+
+
+class TestExplode:
+    def test_mean(self):
+        assert distribution("d6x").mean() == approx(3.5 / (5 / 6))
+        assert distribution("2d6x5").mean() == approx(2 * 3.5 / (2 / 3))
+
+    def test_truncated(self):
+        dist = explode_distribution(1, 2, 2)
+        assert dist.max() == 2 * (MAX_EXPLOSIONS - 2) + 1
+        assert sum(dist.values()) == approx(1)
+
+    def test_high_threshold(self):
+        assert distribution("d6x7") == Distribution.uniform(1, 6)
+
+    def test_sampled(self):
+        template = dice.compile("d6x")
+        rnd = random.Random(1)
+        totals = [sum(template.roll(random=rnd)) for i in range(20000)]
+        assert sum(totals) / len(totals) == approx(4.2, abs=0.1)
+
+    def test_seed_compat(self):
+        a = dice.roll("20d6x", random=random.Random(3), seed_compat=True)
+        b = dice.roll("20d6x", random=random.Random(3), seed_compat=True)
+        assert a == b
+        assert len(a) >= 20
+
+
+class TestSuccesses:
+    def test_binomial(self):
+        dist = distribution("10d10e8")
+        assert dist.mean() == approx(10 * 0.3)
+        assert dist.variance() == approx(10 * 0.3 * 0.7)
+        assert dist == approx(Distribution.binomial(10, 0.3))
+
+    def test_random_pool(self):
+        dist = distribution("(1d6+4)d10e8")
+        assert dist.mean() == approx(7.5 * 0.3)
+        assert dist.max() == 10
+
+    def test_success_fail(self):
+        dist = distribution("12d6f5")
+        assert dist.mean() == approx(12 * (2 / 6 - 1 / 6))
+        assert dist.min() == -12 and dist.max() == 12
+
+    def test_scalar(self):
+        assert distribution("1f2") == {-1: 1.0}
+        assert distribution("3e2") == {1: 1.0}
+
+    def test_threshold_too_high(self):
+        with raises(ValueError):
+            distribution("4d6e7")
+
+    def test_sampled(self):
+        template = dice.compile("1000d10f8")
+        rnd = random.Random(2)
+        totals = [template.roll(random=rnd, sample_pools=True) for i in range(2000)]
+        assert sum(totals) / len(totals) == approx(1000 * 0.2, abs=1)
+        assert all(-1000 <= x <= 1000 for x in totals)
+
+    def test_breakdown(self):
+        trace = dice.trace.Trace()
+        dice.roll("10d10e8", trace=trace, sample_pools=True)
+        assert len([x for x in trace if x.dice is not None]) == 1
+
+    def test_verbose_print_matches_result(self):
+        for seed in range(20):
+            random.seed(seed)
+            element = dice.roll("10d10e8", raw=True)
+            element.evaluate_cached()
+            rolled = element.original_operands[0].result
+            assert len(rolled) == 10
+            assert element.result == sum(x >= 8 for x in rolled)
+            assert verbose_print(element).endswith(") -> %i" % element.result)
+
+    def test_seed_compat(self):
+        a = dice.roll("20d10e8", random=random.Random(3), seed_compat=True)
+        b = dice.roll("20d10e8", random=random.Random(3), seed_compat=True)
+        assert a == b
+
+
+def brute_force(num, sides, kept):
+    outcomes = itertools.product(range(1, sides + 1), repeat=num)
+    totals = [sum(sorted(x)[kept.start : kept.stop]) for x in outcomes]
+    return {t: totals.count(t) / len(totals) for t in set(totals)}
+
+
+class TestKeep:
+    @mark.parametrize(
+        "cls,num,sides,n",
+        [
+            (Highest, 4, 6, 3),
+            (Highest, 3, 4, None),
+            (Highest, 1, 6, None),
+            (Lowest, 2, 20, 1),
+            (Lowest, 3, 6, 5),
+            (Middle, 5, 4, 3),
+            (Middle, 4, 6, None),
+            (Middle, 3, 5, 1),
+        ],
+    )
+    def test_brute_force(self, cls, num, sides, n):
+        expression = "%dd%d%s" % (num, sides, cls.__name__[0].lower())
+        if n is not None:
+            expression += str(n)
+        expected = brute_force(num, sides, cls.kept(num, n))
+        assert distribution(expression) == approx(expected)
+
+    def test_random_amount(self):
+        dist = distribution("(1d2+2)d6h2")
+        expected = Distribution.mixture(
+            [(0.5, distribution("3d6h2")), (0.5, distribution("4d6h2"))]
+        )
+        assert dist == approx(expected)
+
+    def test_large_pool(self):
+        dist = distribution("50d6h25")
+        assert sum(dist.values()) == approx(1)
+        assert dist.min() == 25 and dist.max() == 150
+
+    def test_keep_none(self):
+        assert distribution("3d6l0") == approx({0: 1.0})
+
+
+class TestWild:
+    def test_sampled(self):
+        dist = wild_distribution(3, 1, 6)
+        rnd = random.Random(4)
+        totals = [sum(WildRoll.roll(3, 1, 6, random=rnd)) for i in range(20000)]
+        assert sum(totals) / len(totals) == approx(dist.mean(), abs=0.1)
+        assert totals.count(0) / len(totals) == approx(dist[0], abs=0.01)
+
+    def test_single_die(self):
+        dist = wild_distribution(1, 1, 2)
+        assert dist[0] == approx(0.5)
+        assert dist[3] == approx(0.25)
+
+    def test_cap(self):
+        assert wild_distribution(1, 1, 6, cap=2).max() == 6 + 5
+        assert distribution("w1") == {1: 1.0}
+
+    def test_random_amount(self):
+        expected = Distribution.mixture(
+            [(0.5, wild_distribution(1, 1, 6)), (0.5, wild_distribution(2, 1, 6))]
+        )
+        assert distribution("(1d2)w6") == approx(expected)
+
+
+class TestFaces:
+    def test_weighted(self):
+        assert distribution("d{1:3,6}") == approx({1: 0.75, 6: 0.25})
+        assert distribution("2d{0,1,1}") == approx({0: 1 / 9, 1: 4 / 9, 2: 4 / 9})
+
+    def test_keep(self):
+        faces = [1, 1, 2, 5]
+        outcomes = [sorted(x)[1:] for x in itertools.product(faces, repeat=3)]
+        totals = [sum(x) for x in outcomes]
+        expected = {t: totals.count(t) / len(totals) for t in set(totals)}
+        assert distribution("3d{1:2,2,5}h2") == approx(expected)
+
+    def test_successes(self):
+        assert distribution("2d{1,4:3}e4") == approx({0: 1 / 16, 1: 6 / 16, 2: 9 / 16})
+        assert distribution("d{1,2,4:2}f4") == approx({-1: 0.25, 0: 0.25, 1: 0.5})
+
+    def test_explode(self):
+        assert distribution("d{1,3}x").mean() == approx(4)
+        result = dice.roll("20000d{1:3,2,6}x2", random=random.Random(1))
+        expected = distribution("d{1:3,2,6}x2").mean()
+        assert sum(result) / 20000 == approx(expected, abs=0.1)
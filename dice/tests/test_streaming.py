@@ -0,0 +1,74 @@
+import random
+
+import dice
+from pytest import approx, raises
+
+from dice import roll, streaming
+from dice.constants import MAX_ROLL_DICE, DiceExtreme
+from dice.exceptions import DiceFatalException
+
+HUGE = MAX_ROLL_DICE * 2
+
+
+class TestEvaluate:
+    def test_same_as_roll(self):
+        for expr in ["4d1t", "(10d1 .+ 2) e 3", "-3d1t", "3d1f1 + 1", "(2, 3) e 3"]:
+            assert roll(expr, stream=True) == roll(expr)
+
+    def test_huge_total(self):
+        assert roll("%id1t" % HUGE, stream=True) == HUGE
+
+        with raises(DiceFatalException):
+            roll("%id1t" % HUGE)
+
+    def test_huge_successes(self):
+        result = roll(
+            "(%id{1,2} .+ 1) e 3" % HUGE, stream=True, random=random.Random(0)
+        )
+        assert result == approx(HUGE / 2, rel=0.01)
+
+    def test_nested(self):
+        assert roll("(%id1t)d1t" % HUGE, stream=True) == HUGE
+
+    def test_lists_are_limited(self):
+        with raises(DiceFatalException) as e:
+            roll("%id6" % HUGE, stream=True)
+        assert e.value.code == "too-many-dice"
+
+    def test_template(self):
+        template = dice.compile("%id1t" % HUGE)
+        assert template.roll(stream=True) == HUGE
+        (item,) = dice.roll_batch(["%id1t" % HUGE], stream=True)
+        assert item.results == [HUGE]
+
+    def test_max_stream_dice(self):
+        with raises(DiceFatalException) as e:
+            roll("11d6t", stream=True, max_stream_dice=10)
+        assert e.value.code == "too-many-dice"
+
+    def test_threshold(self):
+        with raises(DiceFatalException) as e:
+            roll("%id6e7" % HUGE, stream=True)
+        assert e.value.code == "success-threshold"
+
+    def test_extreme(self):
+        result = roll(
+            "%id6t" % HUGE, stream=True, force_extreme=DiceExtreme.EXTREME_MAX
+        )
+        assert result == HUGE * 6
+        assert roll_streamed_min("5d6t") == 5
+
+
+def roll_streamed_min(expr):
+    return roll(expr, stream=True, force_extreme=DiceExtreme.EXTREME_MIN)
+
+
+class TestChunks:
+    def test_chunk_size(self):
+        chunks = list(streaming.chunks("-10d1 .+ 3", chunk_size=4))
+        assert [len(x) for x in chunks] == [4, 4, 2]
+        assert [x for chunk in chunks for x in chunk] == [2] * 10
+
+    def test_not_streamed(self):
+        assert list(streaming.chunks("(1, 2, 3)")) == [[1, 2, 3]]
+        assert list(streaming.chunks("2 + 3")) == [[5]]
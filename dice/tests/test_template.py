@@ -0,0 +1,98 @@
+import threading
+
+import dice
+from dice.exceptions import DiceException, DiceFatalException
+from dice.serialize import dumps, loads
+from dice.template import Template
+from pytest import raises
+
+
+class TestTemplate:
+    def test_variables(self):
+        template = dice.compile("1d20 + {str_mod} + {prof}")
+        assert template.variables == {"str_mod", "prof"}
+
+    def test_roll(self):
+        template = dice.compile("{n}d1 + {bonus}")
+        assert template.roll({"n": 3, "bonus": 2}) == 5
+        assert template.roll({"n": 1, "bonus": 0}) == 1
+
+    def test_extremes(self):
+        template = dice.compile("{n}d6")
+        assert template.roll_min({"n": 2}) == [1, 1]
+        assert template.roll_max({"n": 3}) == [6, 6, 6]
+
+    def test_fresh_results(self):
+        template = dice.compile("100d6t")
+        results = set(template.roll() for i in range(20))
+        assert len(results) > 1
+        assert not hasattr(template.elements[0], "result")
+
+    def test_shared_between_threads(self):
+        template = dice.compile("({a}d1 .+ {b})t, {b}")
+        wrong = []
+
+        def roll(a, b):
+            for i in range(200):
+                result = template.roll({"a": a, "b": b}, in_place=i % 2)
+
+                if result != [a * (1 + b), b]:
+                    wrong.append(result)
+
+        threads = [threading.Thread(target=roll, args=(i + 1, i)) for i in range(8)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert wrong == []
+        assert not hasattr(template.elements[0], "operands")
+
+    def test_cached(self):
+        assert dice.compile("1d20 + {x}") is dice.compile("1d20 + {x}")
+
+    def test_element_binding(self):
+        template = Template("{pool}h1")
+        bound = dice.roll("4d1", raw=True)
+        assert template.roll({"pool": bound}) == [1]
+
+    def test_reroll(self):
+        assert dice.compile("{n}d{s}r").roll({"n": 3, "s": 1}) == [1, 1, 1]
+
+    def test_unbound(self):
+        with raises(DiceFatalException):
+            dice.compile("{x} + 1").roll()
+
+        with raises(DiceFatalException):
+            dice.compile("{x} + 1").roll({"x": "one"})
+
+    def test_syntax_error(self):
+        with raises(DiceException):
+            dice.compile("{x +")
+
+
+class TestVariable:
+    def test_roll(self):
+        assert dice.roll("{a} * {b}", bindings={"a": 6, "b": 7}) == 42
+
+    def test_fudge(self):
+        assert dice.roll_min("3u{x}", bindings={"x": 2}) == [-2, -2, -2]
+        assert dice.roll_max("3u{x}", bindings={"x": 2}) == [2, 2, 2]
+        assert -2 <= dice.compile("u{x}t").roll({"x": 2}) <= 2
+        assert (
+            loads(dumps(dice.roll("u{x}", raw=True))).min_value.evaluate(
+                bindings={"x": 3}
+            )
+            == -3
+        )
+
+    def test_spans(self):
+        element = dice.roll("1 + { x }", raw=True)
+        variable = element.original_operands[1]
+        assert (variable.location, variable.end) == (4, 9)
+        assert str(variable) == "{x}"
+
+    def test_serialize(self):
+        element = loads(dumps(dice.roll("1d20 + {x}", raw=True)))
+        assert element.evaluate_cached(bindings={"x": 100}) > 100
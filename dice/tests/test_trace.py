@@ -0,0 +1,89 @@
+import io
+import json
+import random
+
+from dice import roll
+from dice.trace import Trace
+from dice.utilities import verbose_print
+
+
+def _traced(expr, **kwargs):
+    trace = Trace()
+    result = roll(expr, trace=trace, **kwargs)
+    return result, trace
+
+
+class TestTrace:
+    def test_entries(self):
+        result, trace = _traced("4d6h3 + 1")
+        kinds = [e.kind for e in trace]
+        assert kinds == ["Add", "Highest", "Dice"] + ["Integer"] * 4
+        assert trace.entries[0].output == result
+        assert trace.entries[0].parent is None
+        assert trace.entries[2].parent == 1
+        assert trace.entries[2].depth == 2
+
+    def test_span(self):
+        _, trace = _traced("1 + 2d6")
+        assert trace.entries[0].span == (0, 7)
+        assert [e.span for e in trace if e.kind == "Dice"] == [(4, 7)]
+
+    def test_inputs_and_dice(self):
+        _, trace = _traced("3d6t")
+        total, dice = trace.entries[0], trace.entries[1]
+        assert trace.inputs(total) == [dice.output]
+        assert dice.dice == list(dice.output)
+        assert total.dice is None
+
+    def test_text_matches_verbose_print(self):
+        for expr in ("6d(6d6)t", "4d6h3+2", "d(d6)", "u(d6)", "1,2|3d6", "6a6"):
+            random.seed(expr)
+            element = roll(expr, raw=True)
+            element.evaluate_cached()
+            expected = verbose_print(element)
+
+            random.seed(expr)
+            _, trace = _traced(expr)
+            assert trace.to_text() == expected
+
+    def test_summarized_text(self):
+        for expr in ("(100d6 .+ 1)h3", "50d6s, 20d6"):
+            for style in ("edges", "counts", "runs"):
+                options = {"max_items": 5, "style": style}
+                random.seed(expr)
+                element = roll(expr, raw=True)
+                element.evaluate_cached()
+                expected = verbose_print(element, **options)
+
+                random.seed(expr)
+                _, trace = _traced(expr)
+                assert trace.to_text(**options) == expected
+                assert len(expected) < len(trace.to_text())
+
+    def test_write_text(self):
+        _, trace = _traced("1,2|3d6")
+        file = io.StringIO()
+        trace.write_text(file)
+        assert file.getvalue() == trace.to_text()
+
+    def test_json(self):
+        result, trace = _traced("2d6 + 3")
+        entries = json.loads(trace.to_json())
+        assert entries[0]["output"] == result
+        assert entries[1]["kind"] == "Dice"
+        assert len(entries[1]["dice"]) == 2
+
+    def test_html(self):
+        _, trace = _traced("2d6 - 1")
+        html = trace.to_html()
+        assert html.startswith('<ul class="dice-trace">')
+        assert html.count("<li>") == len(trace)
+
+    def test_error(self):
+        trace = Trace()
+        try:
+            roll("1/0", trace=trace)
+        except Exception:
+            pass
+        assert trace.stack == []
+        assert trace.entries[0].output is None
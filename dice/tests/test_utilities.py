@@ -4,15 +4,33 @@ import random
 import string
 
 from dice import roll, utilities
-from dice.utilities import verbose_print
+from dice.utilities import AliasTable, alias_table, verbose_print
 from dice.elements import RandomElement, FudgeDice
 
 
-def test_enable_pyparsing_packrat_parsing():
-    """Test that packrat parsing was enabled"""
+def test_packrat_memo():
+    """Test that the grammar is memoized without pyparsing's global packrat"""
     import pyparsing
+    from dice import grammar
 
-    assert pyparsing.ParserElement._packratEnabled is True
+    assert pyparsing.ParserElement._packratEnabled is False
+
+    grammar.memo.reset_stats()
+    roll("4d6h3 + 1d4")
+    assert grammar.memo.parses == 1
+    assert grammar.memo.hits > 0 and grammar.memo.misses > 0
+    assert not grammar.memo.cache
+
+
+def test_packrat_memo_size():
+    from dice.grammar import Memo, build_expression
+
+    memo = Memo(size=16, clear_after_parse=False)
+    expression = build_expression(memo=memo)
+    tokens = expression.parseString("(1d6 + 2) * 3", parseAll=True)
+
+    assert str(tokens[0]) == "Mul(Add(1d6, 2), 3)"
+    assert len(memo.cache) <= 16 and memo.evictions > 0
 
 
 class TestVerbosePrint:
@@ -49,6 +67,20 @@ class TestVerbosePrint:
         assert len(v.split("\n")) == 1
 
 
+class TestAliasTable:
+    def test_frequencies(self):
+        weighted = ((1, 1), (2, 6), (5, 3))
+        values = AliasTable(weighted).sample(random.Random(0), 20000)
+        for value, weight in weighted:
+            assert abs(values.count(value) / 20000 - weight / 10) < 0.01
+
+    def test_single_value(self):
+        assert AliasTable(((4, 2),)).sample(random.Random(0), 3) == [4, 4, 4]
+
+    def test_cached(self):
+        assert alias_table(((1, 1), (2, 1))) is alias_table(((1, 1), (2, 1)))
+
+
 class TestDiceSwitch:
     def test_separator_map(self):
         for sep, cls in RandomElement.DICE_MAP.items():
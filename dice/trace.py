@@ -0,0 +1,273 @@
+"""
+Structured traces of an evaluation
+
+A Trace is passed to the evaluation functions as the ``trace`` keyword
+argument, and records one flat entry per evaluated element during the same
+pass that produces the result. Nothing is recorded (and nothing is paid for)
+when no trace is given.
+
+    >>> trace = dice.trace.Trace()
+    >>> dice.roll("4d6h3", trace=trace)
+    >>> print(trace.to_text())
+"""
+
+import html
+import json
+
+import dice.elements
+import dice.profiling
+import dice.render
+from dice.constants import VERBOSE_INDENT
+from dice.utilities import classname
+
+
+class Observer:
+    """Receives a callback before and after each element is evaluated"""
+
+    # Whether every element must be evaluated for this observer, rather than
+    # shortcuts such as drawing a count of successes without rolling the dice
+    breakdown = True
+
+    def enter(self, element):
+        """Called before an element is evaluated, returns a token for exit()"""
+        return None
+
+    def exit(self, token, result):
+        """Called after an element is evaluated (result is None on errors)"""
+        pass
+
+
+class Tee(Observer):
+    """Passes callbacks on to several observers"""
+
+    def __init__(self, *observers):
+        self.observers = observers
+
+    @property
+    def breakdown(self):
+        return any(getattr(x, "breakdown", True) for x in self.observers)
+
+    def enter(self, element):
+        return [observer.enter(element) for observer in self.observers]
+
+    def exit(self, token, result):
+        for observer, t in zip(self.observers, token):
+            observer.exit(t, result)
+
+
+def observe(kwargs, observer):
+    """Adds an observer to the ``trace`` keyword argument of an evaluation"""
+    trace = kwargs.get("trace")
+    kwargs["trace"] = observer if trace is None else Tee(trace, observer)
+    return kwargs
+
+
+class TraceEntry:
+    """A single evaluated element in a trace"""
+
+    __slots__ = ("index", "parent", "depth", "element", "children", "output")
+
+    def __init__(self, index, parent, depth, element):
+        self.index = index
+        self.parent = parent
+        self.depth = depth
+        self.element = element
+        self.children = []
+        self.output = None
+
+    @property
+    def kind(self):
+        return classname(self.element)
+
+    @property
+    def text(self):
+        return str(self.element)
+
+    @property
+    def span(self):
+        """The (start, end) offsets of the element in the parsed string"""
+        if not hasattr(self.element, "end"):
+            return None
+        return self.element.location, self.element.end
+
+    @property
+    def dice(self):
+        """The individual dice rolled by this element, if any"""
+        if isinstance(self.output, dice.elements.Roll):
+            return list(self.output)
+        return None
+
+    def __repr__(self):
+        return "TraceEntry({0}, {1!r} -> {2!s})".format(
+            self.index, self.kind, self.output
+        )
+
+
+def plain(value):
+    """Converts a result into plain JSON-compatible values"""
+    if isinstance(value, list):
+        return [plain(x) for x in value]
+    elif isinstance(value, bool) or value is None:
+        return value
+    elif isinstance(value, int):
+        return int(value)
+    return str(value)
+
+
+class Trace(Observer):
+    """Records a flat list of entries, in the order elements were entered"""
+
+    def __init__(self):
+        self.entries = []
+        self.stack = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def enter(self, element):
+        index = len(self.entries)
+        parent = self.stack[-1] if self.stack else None
+        self.entries.append(TraceEntry(index, parent, len(self.stack), element))
+
+        if parent is not None:
+            self.entries[parent].children.append(index)
+
+        self.stack.append(index)
+        return index
+
+    def exit(self, token, result):
+        self.stack.pop()
+        self.entries[token].output = result
+
+    def clear(self):
+        self.entries = []
+        self.stack = []
+
+    @property
+    def roots(self):
+        return [e for e in self.entries if e.parent is None]
+
+    def inputs(self, entry):
+        """Returns the outputs of the elements an entry was evaluated from"""
+        return [self.entries[i].output for i in entry.children]
+
+    def to_list(self):
+        return [
+            {
+                "index": e.index,
+                "parent": e.parent,
+                "depth": e.depth,
+                "kind": e.kind,
+                "text": e.text,
+                "span": e.span,
+                "inputs": plain(self.inputs(e)),
+                "output": plain(e.output),
+                "dice": e.dice,
+            }
+            for e in self.entries
+        ]
+
+    def to_json(self, **kwargs):
+        with dice.profiling.phase("render"):
+            return json.dumps(self.to_list(), **kwargs)
+
+    def operands(self, entry):
+        """Pairs the original operands of an entry with their child entries"""
+        children = {}
+
+        for i in entry.children:
+            children.setdefault(id(self.entries[i].element), i)
+
+        return [
+            (operand, children.get(id(operand)))
+            for operand in getattr(entry.element, "original_operands", ())
+        ]
+
+    def is_leaf(self, entry):
+        element = entry.element
+
+        if isinstance(element, dice.elements.Operator):
+            return False
+        elif isinstance(element, dice.elements.Dice):
+            return all(
+                isinstance(op, (dice.elements.Integer, int))
+                for op in element.original_operands
+            )
+        return True
+
+    def text_lines(self, entry, depth=0, **options):
+        """Builds the lines for an entry, in the format of verbose_print()"""
+        if self.is_leaf(entry):
+            if isinstance(entry.element, dice.elements.RandomElement):
+                output = dice.render.render(entry.output, **options)
+                return [[depth, "roll %s -> %s" % (entry.element, output)]]
+            return [[depth, str(entry.element)]]
+
+        lines = [[depth, entry.kind + "("]]
+        operands = self.operands(entry)
+        num_ops = len(operands)
+
+        for i, (operand, child) in enumerate(operands):
+            if child is None:
+                newlines = [[depth + 1, str(operand)]]
+            else:
+                newlines = self.text_lines(self.entries[child], depth + 1, **options)
+
+            if len(newlines) > 1 or num_ops > 1:
+                if i + 1 < num_ops:
+                    newlines[-1].append(",")
+                lines.extend(newlines)
+            else:
+                lines[-1].extend(newlines[0][1:])
+
+        closing = ") -> %s" % dice.render.render(entry.output, **options)
+
+        if num_ops > 1 or len(lines) > 1 and lines[-1][0] < lines[-2][0]:
+            lines.append([depth, closing])
+        else:
+            lines[-1].append(closing)
+
+        return lines
+
+    def to_text(self, **options):
+        """
+        Renders the trace in the format of verbose_print(). Lists longer than
+        ``max_items`` are summarized in the given ``style`` (see dice.render).
+        """
+        lines = []
+        with dice.profiling.phase("render"):
+            for root in self.roots:
+                lines.extend(self.text_lines(root, **options))
+        return "\n".join(" " * (VERBOSE_INDENT * t[0]) + "".join(t[1:]) for t in lines)
+
+    def write_text(self, file, **options):
+        """Writes the text of the trace to a file object, a root at a time"""
+        with dice.profiling.phase("render"):
+            for i, root in enumerate(self.roots):
+                for j, t in enumerate(self.text_lines(root, **options)):
+                    if i or j:
+                        file.write("\n")
+                    file.write(" " * (VERBOSE_INDENT * t[0]) + "".join(t[1:]))
+
+    def html_item(self, entry):
+        parts = [
+            '<li><span class="kind">%s</span> <code>%s</code>'
+            % (html.escape(entry.kind), html.escape(entry.text)),
+            ' &rarr; <span class="output">%s</span>' % html.escape(str(entry.output)),
+        ]
+
+        if entry.children:
+            parts.append("<ul>")
+            parts.extend(self.html_item(self.entries[i]) for i in entry.children)
+            parts.append("</ul>")
+
+        parts.append("</li>")
+        return "".join(parts)
+
+    def to_html(self):
+        with dice.profiling.phase("render"):
+            items = "".join(self.html_item(root) for root in self.roots)
+        return '<ul class="dice-trace">%s</ul>' % items
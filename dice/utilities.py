@@ -1,5 +1,9 @@
+import functools
+import math
+
 import dice.elements
-from dice.constants import VERBOSE_INDENT
+import dice.render
+from dice.constants import ALIAS_CACHE_SIZE, VERBOSE_INDENT
 
 
 def classname(obj):
@@ -12,6 +16,24 @@ def single(iterable):
     return iterable[0] if len(iterable) == 1 else iterable
 
 
+def children(element):
+    """Returns the elements an element was built from"""
+    ret = list(getattr(element, "original_operands", ()))
+    if isinstance(element, dice.elements.RandomElement):
+        ret.extend((element.amount, element.min_value, element.max_value))
+    return [x for x in ret if isinstance(x, dice.elements.Element)]
+
+
+def walk(elements):
+    """Yields every element in a list of element trees"""
+    stack = list(elements)
+
+    while stack:
+        element = stack.pop()
+        yield element
+        stack.extend(children(element))
+
+
 def wrap_string(cls, *args, **kwargs):
     suppress = kwargs.pop("suppress", True)
     e = cls(*args, **kwargs)
@@ -34,12 +56,95 @@ def add_even_sub_odd(operator, operand):
         return operand
 
 
-def dice_switch(amount, dice_type, kind="d"):
+def binomial_variate(rnd_engine, n, p):
+    """Draws the number of successes in n trials with probability p each"""
+    if n <= 0 or p <= 0:
+        return 0
+    elif p >= 1:
+        return n
+    elif p > 0.5:
+        return n - binomial_variate(rnd_engine, n, 1 - p)
+
+    # Skips from one success to the next with geometric gaps, drawing one
+    # number per success rather than one per trial
+    log_q = math.log(1.0 - p)
+    successes = position = 0
+
+    while True:
+        position += int(math.log(1.0 - rnd_engine.random()) / log_q) + 1
+
+        if position > n:
+            return successes
+
+        successes += 1
+
+
+class AliasTable:
+    """
+    Draws values with probabilities proportional to their weights, using
+    Walker's alias method: building the table takes time proportional to
+    the number of values, then each draw takes one random number.
+    """
+
+    __slots__ = ("values", "cutoffs", "aliases")
+
+    def __init__(self, weighted):
+        values = [value for value, weight in weighted]
+        total = sum(weight for value, weight in weighted)
+        cutoffs = [weight * len(values) / total for value, weight in weighted]
+        aliases = list(values)
+        small = [i for i, x in enumerate(cutoffs) if x < 1.0]
+        large = [i for i, x in enumerate(cutoffs) if x >= 1.0]
+
+        # Each small bucket is topped up by a large one, which becomes its
+        # alias and may in turn become small
+        while small and large:
+            less, more = small.pop(), large.pop()
+            aliases[less] = values[more]
+            cutoffs[more] -= 1.0 - cutoffs[less]
+            (small if cutoffs[more] < 1.0 else large).append(more)
+
+        # What is left over is only off by rounding errors
+        for i in small + large:
+            cutoffs[i] = 1.0
+
+        self.values = tuple(values)
+        self.cutoffs = tuple(cutoffs)
+        self.aliases = tuple(aliases)
+
+    def sample(self, rnd_engine, k):
+        values, cutoffs, aliases = self.values, self.cutoffs, self.aliases
+        n = len(values)
+        draw = rnd_engine.random
+        ret = []
+
+        for _ in range(k):
+            x = draw() * n
+            i = int(x)
+            ret.append(values[i] if x - i < cutoffs[i] else aliases[i])
+
+        return ret
+
+
+@functools.lru_cache(maxsize=ALIAS_CACHE_SIZE)
+def alias_table(weighted):
+    """Returns the AliasTable of a tuple of (value, weight) pairs"""
+    return AliasTable(weighted)
+
+
+def dice_switch(amount, dice_type, kind="d", dice_map=None):
+    if dice_map is None:
+        dice_map = dice.elements.RandomElement.DICE_MAP
+
     kind = kind.lower()
     if len(kind) != 1:
         raise ValueError("Dice operator must be 1 letter", 1)
 
-    if isinstance(dice_type, int) and int(dice_type) < 1:
+    if isinstance(dice_type, dice.elements.Faces):
+        if kind != "d":
+            raise ValueError("can only use d with a list of faces", 2)
+        return dice.elements.FaceDice(amount, dice_type)
+    elif isinstance(dice_type, int) and int(dice_type) < 1:
         raise ValueError("Number of sides must be one or more", 2)
     elif isinstance(dice_type, str):
         dice_type = dice_type.lower()
@@ -48,10 +153,10 @@ def dice_switch(amount, dice_type, kind="d"):
         if kind not in ("d", "u"):
             raise ValueError("can only use dF or uF", 2)
         return dice.elements.FudgeDice(amount, 1)
-    elif kind not in dice.elements.RandomElement.DICE_MAP:
+    elif kind not in dice_map:
         raise ValueError("unknown dice kind: %s" % kind, 1)
 
-    random_element = dice.elements.RandomElement.DICE_MAP[kind]
+    random_element = dice_map[kind]
 
     if str(dice_type) == "%":
         dice_type = 100
@@ -59,12 +164,12 @@ def dice_switch(amount, dice_type, kind="d"):
     return random_element(amount, dice_type)
 
 
-def verbose_print_op(element, depth=0):
+def verbose_print_op(element, depth=0, **options):
     lines = [[depth, classname(element) + "("]]
     num_ops = len(element.original_operands)
 
     for i, e in enumerate(element.original_operands):
-        newlines = verbose_print_sub(e, depth + 1)
+        newlines = verbose_print_sub(e, depth + 1, **options)
 
         if len(newlines) > 1 or num_ops > 1:
             if i + 1 < num_ops:
@@ -73,7 +178,7 @@ def verbose_print_op(element, depth=0):
         else:
             lines[-1].extend(newlines[0][1:])
 
-    closing = ") -> %s" % element.result
+    closing = ") -> %s" % dice.render.render(element.result, **options)
 
     if num_ops > 1 or len(lines) > 1 and lines[-1][0] < lines[-2][0]:
         lines.append([depth, closing])
@@ -83,22 +188,27 @@ def verbose_print_op(element, depth=0):
     return lines
 
 
-def verbose_print_sub(element, indent=0, **kwargs):
+def verbose_print_sub(element, indent=0, max_items=None, style="edges", **kwargs):
     lines = []
+    options = {"max_items": max_items, "style": style}
+
     if isinstance(element, dice.elements.Element) and not hasattr(element, "result"):
-        element.evaluate_cached(**kwargs)
+        element.evaluate_cached(**dict(kwargs, breakdown=True))
 
     if isinstance(element, dice.elements.Operator):
-        return verbose_print_op(element, indent)
+        return verbose_print_op(element, indent, **options)
 
-    elif isinstance(element, dice.elements.Dice):
+    elif isinstance(element, (dice.elements.Dice, dice.elements.FaceDice)):
         if any(
-            not isinstance(op, (dice.elements.Integer, int))
+            not isinstance(op, (dice.elements.Integer, int, dice.elements.Faces))
             for op in element.original_operands
         ):
-            return verbose_print_op(element, indent)
+            return verbose_print_op(element, indent, **options)
 
-        line = "roll %s -> %s" % (element, element.result)
+        line = "roll %s -> %s" % (
+            element,
+            dice.render.render(element.result, **options),
+        )
     else:
         line = str(element)
 
@@ -107,6 +217,10 @@ def verbose_print_sub(element, indent=0, **kwargs):
 
 
 def verbose_print(element, **kwargs):
+    """
+    Renders the breakdown of an element. Lists longer than ``max_items``
+    are summarized in the given ``style`` (see dice.render).
+    """
     lines = verbose_print_sub(element, **kwargs)
     lines = [(" " * (VERBOSE_INDENT * t[0]) + "".join(t[1:])) for t in lines]
     return "\n".join(lines)